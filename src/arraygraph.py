@@ -0,0 +1,424 @@
+import networkx as nx
+import numpy as np
+import time
+from scipy import sparse
+from xml.sax.saxutils import quoteattr
+
+'''
+Array graph - compact undirected weighted graph stored in NumPy arrays.
+
+    names = node names, node ids are their list indexes
+    attributes = node attribute name -> list or array with value of every node (None if missing)
+    source = edge source node ids
+    target = edge target node ids (source <= target)
+    weight = edge weights
+    edge_attributes = edge attribute name -> array with value of every edge
+
+Edges are sorted by (source, target). Graph is converted to NetworkX only when needed.
+Graphs are handed off between pipeline stages as binary .npz files and written to GEXF only for Gephi.
+Graphs can also be built as projections of sparse incidence matrices (SciPy CSR) - rows sharing
+columns are linked with weight equal to the number of shared columns.
+'''
+
+def init_graph(names, attributes = None):
+    return dict(names = list(names),
+                attributes = dict(attributes or dict()),
+                source = np.zeros(0, dtype = np.int64),
+                target = np.zeros(0, dtype = np.int64),
+                weight = np.zeros(0, dtype = np.int64),
+                edge_attributes = dict())
+
+def incidence_pairs(ptr, ids, rows):
+    # all pairs of ids in each of the given CSR rows - (first, second) arrays, row lists keep their order
+    counts = ptr[rows + 1] - ptr[rows]
+    first = [np.zeros(0, dtype = np.int64)]
+    second = [np.zeros(0, dtype = np.int64)]
+
+    # rows with the same number of ids are expanded together
+    for count in np.unique(counts):
+        if count < 2:
+            continue
+        members = ids[ptr[rows[counts == count]][:, None] + np.arange(count)]
+        i, j = np.triu_indices(count, 1)
+        first.append(members[:, i].ravel())
+        second.append(members[:, j].ravel())
+
+    return np.concatenate(first).astype(np.int64), np.concatenate(second).astype(np.int64)
+
+def pair_codes(first, second, nodes):
+    # encode undirected pairs as single integers
+    return np.minimum(first, second) * nodes + np.maximum(first, second)
+
+def add_pairs(graph, first, second):
+    # add each pair as an edge of weight 1, weights of repeated pairs are summed
+    add_edges(graph, first, second, np.ones(len(first), dtype = np.int64))
+
+def add_edges(graph, first, second, weights):
+    # add weighted edges, weights of existing and repeated edges are summed and edges with weight 0 are removed,
+    # edges are renumbered so edge attributes are dropped
+    nodes = len(graph['names'])
+    codes = np.concatenate([pair_codes(graph['source'], graph['target'], nodes),
+                            pair_codes(first, second, nodes)])
+    weights = np.concatenate([graph['weight'], weights])
+
+    codes, inverse = np.unique(codes, return_inverse = True)
+    weights = np.bincount(inverse, weights = weights, minlength = len(codes)).astype(np.int64)
+    kept = weights != 0
+    graph['weight'] = weights[kept]
+    graph['source'] = codes[kept] // nodes
+    graph['target'] = codes[kept] % nodes
+    graph['edge_attributes'] = dict()
+
+def attribute_value(value):
+    # NumPy scalars to Python values
+    return value.item() if isinstance(value, np.generic) else value
+
+def to_networkx(graph):
+    nx_graph = nx.Graph()
+    names = graph['names']
+    attributes = {key : (values.tolist() if isinstance(values, np.ndarray) else values)
+                  for (key, values) in graph['attributes'].items()}
+
+    for (node, name) in enumerate(names):
+        nx_graph.add_node(name)
+        for (key, values) in attributes.items():
+            if values[node] != None:
+                nx_graph.nodes[name][key] = attribute_value(values[node])
+
+    edge_attributes = {key : values.tolist() for (key, values) in graph['edge_attributes'].items()}
+    for (edge, (source, target, weight)) in enumerate(zip(graph['source'].tolist(), graph['target'].tolist(),
+                                                          graph['weight'].tolist())):
+        nx_graph.add_edge(names[source], names[target], weight = weight)
+        for (key, values) in edge_attributes.items():
+            nx_graph[names[source]][names[target]][key] = values[edge]
+
+    return nx_graph
+
+def incidence_matrix(rows, cols, shape):
+    # binary sparse incidence matrix, repeated entries are counted once
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype = np.int64), (rows, cols)), shape = shape)
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+def projection(matrix):
+    # row x row projection of the incidence matrix - weight is the number of shared columns,
+    # diagonal is dropped and each pair is listed once (source < target)
+    return upper_edges(matrix @ matrix.T)
+
+def projection_delta(matrix, delta):
+    # change of the projection when new entries (delta, disjoint with matrix) are added to the incidence matrix
+    return upper_edges(delta @ matrix.T + matrix @ delta.T + delta @ delta.T)
+
+def new_entries(matrix, entries):
+    # entries not yet in the binary matrix of the same shape
+    entries = entries - entries.multiply(matrix)
+    entries.eliminate_zeros()
+    return entries.tocsr()
+
+def upper_edges(product):
+    product = sparse.triu(product, k = 1).tocsr()
+    product.eliminate_zeros()
+    product = product.tocoo()
+    order = np.lexsort((product.col, product.row))
+    return (product.row[order].astype(np.int64), product.col[order].astype(np.int64), product.data[order])
+
+def project_graph(names, attributes, matrix):
+    graph = init_graph(names, attributes)
+    graph['source'], graph['target'], graph['weight'] = projection(matrix)
+    return graph
+
+def subgraph(graph, nodes):
+    # graph induced by the node ids, nodes keep their relative order
+    nodes = np.sort(np.asarray(nodes, dtype = np.int64))
+    node_map = np.full(len(graph['names']), -1, dtype = np.int64)
+    node_map[nodes] = np.arange(len(nodes))
+
+    kept = (node_map[graph['source']] >= 0) & (node_map[graph['target']] >= 0)
+    names = graph['names']
+    attributes = {key : (values[nodes] if isinstance(values, np.ndarray) else [values[node] for node in nodes.tolist()])
+                  for (key, values) in graph['attributes'].items()}
+
+    sub = init_graph([names[node] for node in nodes.tolist()], attributes)
+    sub['source'] = node_map[graph['source'][kept]]
+    sub['target'] = node_map[graph['target'][kept]]
+    sub['weight'] = graph['weight'][kept]
+    sub['edge_attributes'] = {key : values[kept] for (key, values) in graph['edge_attributes'].items()}
+    return sub
+
+def partition(graph, node_groups, groups):
+    # induced subgraphs of disjoint node groups in a single pass - node_groups holds the group id of every node
+    # (-1 for none), nodes and edges are reordered by group once and subgraph arrays are views of the reordered arrays
+    node_groups = np.asarray(node_groups, dtype = np.int64)
+    order = np.argsort(node_groups, kind = "stable")
+    sorted_groups = node_groups[order]
+    node_bounds = np.searchsorted(sorted_groups, np.arange(groups + 1))
+
+    # node ids inside their groups, relative node order is kept so edges stay sorted
+    local = np.empty(len(node_groups), dtype = np.int64)
+    local[order] = np.arange(len(order)) - np.searchsorted(sorted_groups, sorted_groups)
+
+    # edges inside a group belong to it, other edges to none
+    source_groups = node_groups[graph['source']]
+    edge_groups = np.where(source_groups == node_groups[graph['target']], source_groups, -1)
+    edge_order = np.argsort(edge_groups, kind = "stable")
+    edge_bounds = np.searchsorted(edge_groups[edge_order], np.arange(groups + 1))
+    source = local[graph['source'][edge_order]]
+    target = local[graph['target'][edge_order]]
+    weight = graph['weight'][edge_order]
+    edge_attributes = {key : values[edge_order] for (key, values) in graph['edge_attributes'].items()}
+
+    names = graph['names']
+    attributes = {key : (values if isinstance(values, np.ndarray) else np.array(values, dtype = object))[order]
+                  for (key, values) in graph['attributes'].items()}
+    subgraphs = []
+    for group in range(groups):
+        nodes = slice(node_bounds[group], node_bounds[group + 1])
+        edges = slice(edge_bounds[group], edge_bounds[group + 1])
+
+        sub = init_graph([names[node] for node in order[nodes].tolist()],
+                         {key : values[nodes] for (key, values) in attributes.items()})
+        sub['source'], sub['target'], sub['weight'] = source[edges], target[edges], weight[edges]
+        sub['edge_attributes'] = {key : values[edges] for (key, values) in edge_attributes.items()}
+        subgraphs.append(sub)
+
+    return subgraphs
+
+def degrees(graph):
+    # weighted node degrees
+    nodes = len(graph['names'])
+    return (np.bincount(graph['source'], weights = graph['weight'], minlength = nodes) +
+            np.bincount(graph['target'], weights = graph['weight'], minlength = nodes)).astype(graph['weight'].dtype)
+
+'''
+Hyperedges - paper -> node incidence kept as the primary structure instead of pairwise edges:
+    hyperedge_ptr = offsets of hyperedge nodes in hyperedge_nodes (CSR)
+    hyperedge_nodes = node ids of every hyperedge
+    hyperedge_weights = weight of every node pair in the hyperedge
+
+Memory and build time are proportional to the number of incidences. Pair weights are sums of the
+weights of shared hyperedges and are derived only on demand, from incidence matrices built on the
+first query and kept in the graph (hyperedge_matrices) until its hyperedges change.
+
+Weighting schemes for a hyperedge with k nodes:
+    count = 1, pair weight is the number of shared hyperedges
+    newman = 1 / (k - 1), Newman's collaboration weight
+'''
+WEIGHTINGS = {
+    "count" : lambda sizes : np.ones(len(sizes), dtype = np.int64),
+    "newman" : lambda sizes : 1 / np.maximum(sizes - 1, 1)
+}
+
+def init_hyperedges(graph, ptr, ids, rows, weighting = "count", cap = None):
+    # hyperedges of the given CSR rows, hyperedges with more than cap nodes get weight 0
+    starts = ptr[rows]
+    sizes = ptr[rows + 1] - starts
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+
+    graph['hyperedge_ptr'] = offsets
+    graph['hyperedge_nodes'] = ids[np.repeat(starts - offsets[:-1], sizes) + np.arange(offsets[-1])]
+    graph['hyperedge_weights'] = weights = WEIGHTINGS[weighting](sizes)
+    if cap != None:
+        weights[sizes > cap] = 0
+    graph.pop('hyperedge_matrices', None)
+
+def hyperedge_matrix(graph):
+    # hyperedges x nodes incidence matrix
+    ptr = graph['hyperedge_ptr']
+    matrix = sparse.csr_matrix((np.ones(len(graph['hyperedge_nodes']), dtype = np.int64),
+                                graph['hyperedge_nodes'], ptr), shape = (len(ptr) - 1, len(graph['names'])))
+    matrix.sum_duplicates()
+    return matrix
+
+def hyperedge_matrices(graph):
+    # (hyperedges x nodes, nodes x hyperedges) incidence matrices, built once per hyperedges
+    if 'hyperedge_matrices' not in graph:
+        matrix = hyperedge_matrix(graph)
+        graph['hyperedge_matrices'] = (matrix, matrix.T.tocsr())
+    return graph['hyperedge_matrices']
+
+def pair_weights(graph, first, second):
+    # weights of the given node pairs
+    memberships = hyperedge_matrices(graph)[1]
+    shared = memberships[first].multiply(memberships[second])
+    return np.asarray(shared @ graph['hyperedge_weights']).ravel()
+
+def neighbors(graph, node):
+    # neighbor node ids and pair weights of the node, only the hyperedges of the node are visited
+    (matrix, memberships) = hyperedge_matrices(graph)
+    weights = sparse.csr_matrix(memberships[node].multiply(graph['hyperedge_weights']) @ matrix)
+    weights.sum_duplicates()
+    kept = (weights.indices != node) & (weights.data != 0)
+    return weights.indices[kept].astype(np.int64), weights.data[kept]
+
+def hyperedge_degrees(graph):
+    # weighted node degrees - every hyperedge adds its weight times (k - 1) to each of its k nodes
+    sizes = np.diff(graph['hyperedge_ptr'])
+    values = np.repeat(graph['hyperedge_weights'] * (sizes - 1), sizes)
+    return np.bincount(graph['hyperedge_nodes'], weights = values,
+                       minlength = len(graph['names'])).astype(graph['hyperedge_weights'].dtype)
+
+def project_hyperedges(graph):
+    # pairwise edges of the hyperedges
+    matrix = hyperedge_matrices(graph)[0]
+    weights = graph['hyperedge_weights']
+    weighted = sparse.diags(weights, dtype = weights.dtype) @ matrix
+    graph['source'], graph['target'], graph['weight'] = upper_edges(matrix.T @ weighted)
+    graph['edge_attributes'] = dict()
+
+'''
+Binary graph file - NumPy .npz archive with:
+    names = node names as null separated UTF-8 strings
+    source, target, weight = edge arrays
+    attributes = attribute names as null separated UTF-8 strings
+    attribute_<i> = values of the i-th attribute, numeric array or null separated UTF-8 strings
+    missing_<i> = nodes without the i-th attribute
+    edge_attributes = edge attribute names as null separated UTF-8 strings
+    edge_attribute_<i> = values of the i-th edge attribute
+    hyperedge_ptr, hyperedge_nodes, hyperedge_weights = hyperedge arrays (only graphs with hyperedges)
+'''
+SEPARATOR = "\0"
+HYPEREDGE_KEYS = ("hyperedge_ptr", "hyperedge_nodes", "hyperedge_weights")
+LAYOUT_KEYS = ("positions",) # (n, 2) node positions of laid out graphs
+
+def pack_strings(strings):
+    return np.frombuffer(SEPARATOR.join(strings).encode(), dtype = np.uint8)
+
+def unpack_strings(data, count):
+    return data.tobytes().decode().split(SEPARATOR) if (count > 0) else []
+
+def save_graph(graph, path):
+    arrays = dict(names = pack_strings(graph['names']), source = graph['source'], target = graph['target'],
+                  weight = graph['weight'], attributes = pack_strings(graph['attributes']))
+
+    for (i, values) in enumerate(graph['attributes'].values()):
+        values = [attribute_value(value) for value in values]
+        missing = np.array([value == None for value in values], dtype = bool)
+
+        # string attributes are packed, numeric attributes are stored as arrays with 0 for missing values
+        if any(isinstance(value, str) for value in values):
+            arrays['attribute_' + str(i)] = pack_strings(value or "" for value in values)
+        else:
+            arrays['attribute_' + str(i)] = np.array([value or 0 for value in values])
+        arrays['missing_' + str(i)] = missing
+
+    arrays['edge_attributes'] = pack_strings(graph['edge_attributes'])
+    for key in HYPEREDGE_KEYS + LAYOUT_KEYS:
+        if key in graph:
+            arrays[key] = graph[key]
+    for (i, values) in enumerate(graph['edge_attributes'].values()):
+        arrays['edge_attribute_' + str(i)] = values
+
+    with open(path, "wb") as file:
+        np.savez(file, **arrays)
+
+def load_graph(path):
+    with np.load(path) as data:
+        arrays = {key : data[key] for key in data.files}
+
+    graph = init_graph([])
+    graph['names'] = names = unpack_strings(arrays['names'], len(arrays['names']))
+    for key in ("source", "target", "weight"):
+        graph[key] = arrays[key]
+
+    keys = unpack_strings(arrays['attributes'], len(arrays['attributes']))
+    for (i, key) in enumerate(keys):
+        values = arrays['attribute_' + str(i)]
+        missing = arrays['missing_' + str(i)]
+        if values.dtype == np.uint8:
+            values = unpack_strings(values, len(names))
+
+        # attributes with missing values are lists with None for missing values
+        if missing.any():
+            values = [None if miss else value for (value, miss) in zip(list(values), missing.tolist())]
+        graph['attributes'][key] = values
+
+    # graphs saved without edge attributes have no edge attribute names
+    keys = unpack_strings(arrays.get('edge_attributes', np.zeros(0, dtype = np.uint8)),
+                          len(arrays.get('edge_attributes', ())))
+    for (i, key) in enumerate(keys):
+        graph['edge_attributes'][key] = arrays['edge_attribute_' + str(i)]
+
+    for key in HYPEREDGE_KEYS + LAYOUT_KEYS:
+        if key in arrays:
+            graph[key] = arrays[key]
+
+    return graph
+
+GEXF_TYPES = {bool : "boolean", int : "long", float : "double", str : "string"}
+
+def gexf_type(values):
+    for value in values:
+        if value != None:
+            return GEXF_TYPES[type(attribute_value(value))]
+    return "string"
+
+def write_gexf(graph, path):
+    # GEXF is written line by line, without building the XML tree in memory
+    names = graph['names']
+    attributes = [(key, values.tolist() if isinstance(values, np.ndarray) else values)
+                  for (key, values) in graph['attributes'].items()]
+    edge_attributes = [(key, values.tolist()) for (key, values) in graph['edge_attributes'].items()]
+    labels = [quoteattr(name) for name in names]
+    positions = graph['positions'].tolist() if ('positions' in graph) else None
+
+    with open(path, "w", encoding = "utf-8") as file:
+        file.write("<?xml version='1.0' encoding='utf-8'?>\n")
+        file.write('<gexf xmlns="http://www.gexf.net/1.2draft" '
+                   + ('xmlns:viz="http://www.gexf.net/1.2draft/viz" ' if positions != None else '') +
+                   'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                   'xsi:schemaLocation="http://www.gexf.net/1.2draft http://www.gexf.net/1.2draft/gexf.xsd" '
+                   'version="1.2">\n')
+        file.write('  <meta lastmodifieddate="{0}" />\n'.format(time.strftime("%Y-%m-%d")))
+        file.write('  <graph defaultedgetype="undirected" mode="static" name="">\n')
+
+        if attributes:
+            file.write('    <attributes mode="static" class="node">\n')
+            for (i, (key, values)) in enumerate(attributes):
+                file.write('      <attribute id="{0}" title={1} type="{2}" />\n'.format(i, quoteattr(key),
+                                                                                       gexf_type(values)))
+            file.write('    </attributes>\n')
+
+        if edge_attributes:
+            file.write('    <attributes mode="static" class="edge">\n')
+            for (i, (key, values)) in enumerate(edge_attributes):
+                file.write('      <attribute id="{0}" title={1} type="{2}" />\n'.format(i, quoteattr(key),
+                                                                                       gexf_type(values)))
+            file.write('    </attributes>\n')
+
+        file.write('    <nodes>\n')
+        for (node, label) in enumerate(labels):
+            values = [(i, values[node]) for (i, (key, values)) in enumerate(attributes) if values[node] != None]
+            if not values and positions == None:
+                file.write('      <node id={0} label={0} />\n'.format(label))
+                continue
+
+            file.write('      <node id={0} label={0}>\n'.format(label))
+            if values:
+                file.write('        <attvalues>\n')
+                for (i, value) in values:
+                    value = attribute_value(value)
+                    value = str(value).lower() if isinstance(value, bool) else str(value)
+                    file.write('          <attvalue for="{0}" value={1} />\n'.format(i, quoteattr(value)))
+                file.write('        </attvalues>\n')
+            if positions != None:
+                file.write('        <viz:position x="{0}" y="{1}" z="0.0" />\n'.format(*positions[node]))
+            file.write('      </node>\n')
+        file.write('    </nodes>\n')
+
+        file.write('    <edges>\n')
+        for (edge, (source, target, weight)) in enumerate(zip(graph['source'].tolist(), graph['target'].tolist(),
+                                                              graph['weight'].tolist())):
+            edge_tag = '      <edge source={0} target={1} id="{2}" weight="{3}"'.format(labels[source], labels[target],
+                                                                                        edge, weight)
+            if not edge_attributes:
+                file.write(edge_tag + ' />\n')
+                continue
+
+            file.write(edge_tag + '>\n        <attvalues>\n')
+            for (i, (key, values)) in enumerate(edge_attributes):
+                file.write('          <attvalue for="{0}" value="{1}" />\n'.format(i, values[edge]))
+            file.write('        </attvalues>\n      </edge>\n')
+        file.write('    </edges>\n')
+
+        file.write('  </graph>\n</gexf>\n')
@@ -0,0 +1,685 @@
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import xlrd
+import xlsxwriter
+import networkx as nx
+import numpy as np
+from scipy import sparse
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import arraygraph
+import centrality
+import cleaner
+import community
+import dataset
+import generator
+import graph_authors
+import graph_journals
+import loader
+import network_analysis
+import query
+import readers
+
+FILE_DIR = Path(__file__).parent
+
+DATA_DIR = (FILE_DIR/"../data").resolve()
+RESULTS_DIR = (FILE_DIR/"../results").resolve()
+
+BENCHMARK_OUTPUT = (FILE_DIR/"../results/benchmark.json").resolve()
+
+BENCHMARK_SIZES = [10000, 100000, 1000000]
+
+MODULES = [cleaner, graph_authors, graph_journals, network_analysis, loader, query]
+
+'''
+Pipeline stages - (stage name, process group, stage function).
+Stages of the same group share in-memory state and run in the same process,
+every group runs in a new process so peak memory is measured separately.
+'''
+STAGES = [
+    ("clean", "clean", lambda options : cleaner.clean(cleaner.EXCEL_PAPERS, options['processes'])),
+    ("create_graph", "graph_authors", lambda options : graph_authors.create_graph()),
+    ("create_subgraphs", "graph_authors", lambda options : graph_authors.create_subgraphs()),
+    ("journals_create_graph", "graph_journals", lambda options : graph_journals.create_graph()),
+    ("authors_analysis", "authors_analysis", lambda options : network_analysis.authors_analysis()),
+    ("modules_analysis", "modules_analysis", lambda options : network_analysis.modules_analysis()),
+    ("journals_analysis", "journals_analysis", lambda options : network_analysis.journals_analysis())
+]
+
+def relocate(directory):
+    # redirect data and results paths of all pipeline modules to the directory
+    for module in MODULES:
+        for (name, value) in vars(module).items():
+            if isinstance(value, Path) and value.parent in (DATA_DIR, RESULTS_DIR):
+                setattr(module, name, directory/value.parent.name/value.name)
+
+def peak_rss():
+    # peak resident set size of the current process in kB
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if (sys.platform == "darwin") else rss
+
+def run_group(directory, group, options, queue):
+    relocate(directory)
+    results = []
+
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for (name, stage_group, function) in STAGES:
+            if stage_group != group:
+                continue
+
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            function(options)
+            results.append(dict(stage = name,
+                                wall_time = time.perf_counter() - wall,
+                                cpu_time = time.process_time() - cpu,
+                                peak_rss_kb = peak_rss()))
+
+    queue.put(results)
+
+def run_process(target, args):
+    # run target in a new process, target puts its results to the queue passed as the last argument
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    process = context.Process(target = target, args = args + (queue,))
+    process.start()
+    process.join()
+
+    if process.exitcode != 0:
+        raise RuntimeError("Benchmark process failed: " + str(args[1]))
+    return queue.get()
+
+def run_stages(directory, options):
+    groups = []
+    for (name, group, function) in STAGES:
+        if group not in groups:
+            groups.append(group)
+
+    # every group runs in a fresh process
+    results = []
+    for group in groups:
+        results.extend(run_process(run_group, (directory, group, options)))
+
+    return results
+
+def prepare(directory, papers, seed):
+    for folder in ("data", "results"):
+        (directory/folder).mkdir(parents = True, exist_ok = True)
+
+    # bundled dataset or synthetic dataset of the given size
+    if papers == None:
+        for name in ("UB_cs_authors.xlsx", "UB_cs_papers_scopus.xlsx"):
+            shutil.copy(DATA_DIR/name, directory/"data"/name)
+    else:
+        generator.generate(directory/"data", papers, seed = seed)
+
+def benchmark(papers, seed, options):
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        print("Generating dataset: " + (str(papers) + " papers" if (papers != None) else "bundled"))
+        prepare(directory, papers, seed)
+
+        input_papers = sum(1 for _ in readers.read_papers(directory/"data/UB_cs_papers_scopus.xlsx")) - 1
+        cleaned = None
+
+        results = run_stages(directory, options)
+        for result in results:
+            if cleaned == None and result['stage'] != "clean":
+                cleaned = dataset.load_dataset(directory/"data/UB_cs_papers_cleaned.npz")['papers']
+            count = input_papers if (result['stage'] == "clean") else cleaned
+            result['papers'] = count
+            result['throughput'] = count / result['wall_time'] if (result['wall_time'] > 0) else None
+            print("  {stage:24} {wall_time:9.3f} s {peak_rss_kb:10} kB".format(**result))
+
+        return dict(papers = input_papers, seed = seed, stages = results)
+
+'''
+Checks that optimized code paths produce the same results as reference code paths on the bundled dataset.
+Every check returns a list of difference descriptions.
+'''
+def read_sheet(path):
+    wb = xlrd.open_workbook(path, on_demand = True)
+    sheet = wb.sheet_by_index(0)
+    rows = [sheet.row_values(row) for row in range(sheet.nrows)]
+    wb.release_resources()
+    return rows
+
+def read_dataset(path):
+    data = dataset.load_dataset(path)
+    return {key : value for (key, value) in data.items() if key != "papers"}
+
+def same_dataset(first, second):
+    return first.keys() == second.keys() and all(np.array_equal(first[key], second[key]) for key in first)
+
+def clean_outputs(directory, papers = None, processes = 1, incremental = False):
+    relocate(directory)
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        cleaner.clean(papers or cleaner.EXCEL_PAPERS, processes, incremental)
+    return read_sheet(cleaner.EXCEL_OUTPUT), read_dataset(cleaner.DATASET_OUTPUT)
+
+'''
+Reference name parsing of the original cleaner - regular expression normalization and binary search
+of the author list sorted by last names for every name format.
+'''
+REFERENCE_DIACRITICS = [("[àáâǎãäåăā]", "a"), ("[èéêëėęěĕē]", "e"), ("[ìíîï]", "i"), ("[òóôǒõöōŏő]", "o"),
+                        ("[ùúûüũūŭůűǔ]", "u"), ("[šśŝş]", "s"), ("[đð]", "dj"), ("[čćĉċ]", "c"), ("[žźż]", "z")]
+REFERENCE_FORMATS = [(r"[a-z ]+ [a-z]\.[a-z]\.", "{2} {1}.{3}.", 2), (r"[a-z ]+ [a-z]\.", "{2} {1}.", 0),
+                     (r"[a-z ]+ [a-z]+ [a-z]\.", "{2} {0} {3}.", 3), (r"[a-z ]+ [a-z]+ [a-z]", "{2} {0} {3}", 2),
+                     (r"[a-z ]+ [a-z]+", "{2} {0}", 0)]
+
+def reference_normalize(name):
+    name = name.lower()
+    for (pattern, letter) in REFERENCE_DIACRITICS:
+        name = re.sub(pattern, letter, name)
+    return name.replace(",", "")
+
+def reference_search(name, format):
+    left = 0
+    right = len(cleaner.author_database) - 1
+    while (left <= right):
+        middle = left + ((right - left) // 2)
+        variant = cleaner.format_name(cleaner.author_database[middle], format)
+        if name == variant:
+            return cleaner.author_database[middle]
+        if (name > variant):
+            left = middle + 1
+        else:
+            right = middle - 1
+
+    return None
+
+def reference_parse(name):
+    # formats are tried in order, names that don't match a format are shortened to the next one
+    name = reference_normalize(name)
+    for (pattern, format, trim) in REFERENCE_FORMATS:
+        if re.fullmatch(pattern, name):
+            author = reference_search(name, format)
+            if author != None:
+                return author
+            if trim > 0:
+                name = name[:-trim]
+
+    return None
+
+def check_name_parsing(directory):
+    relocate(directory)
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        cleaner.init_database()
+
+    # every author name of the bundled export
+    names = set()
+    for row in readers.read_papers(directory/"data/UB_cs_papers_scopus.xlsx"):
+        names.update(name.strip() for name in (re.sub("N/A", "", row[1]) + " and " + row[4]).split(" and "))
+    names.discard("")
+
+    # marks missing from the reference table are also trimmed now, which must not change parsed authors,
+    # ambiguous variants are left out by the new index instead of resolved to an arbitrary author
+    differences = []
+    ambiguous = {variant for variants in cleaner.ambiguous_names.values() for variant in variants}
+    for name in sorted(names):
+        normalized = reference_normalize(name)
+        if normalized.isascii() and cleaner.normalize_name(name) != normalized:
+            differences.append("name {0} normalized differently".format(name))
+        if normalized not in ambiguous and normalized[:-2] not in ambiguous:
+            if cleaner.parse_name(name) is not reference_parse(name):
+                differences.append("name {0} parsed differently".format(name))
+    return differences
+
+def check_duplicate_authors(directory):
+    relocate(directory)
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        cleaner.init_database()
+    ambiguous = {format : set(variants) for (format, variants) in cleaner.ambiguous_names.items()}
+
+    # every author listed twice, on another sheet as in workbooks of several departments
+    rows = loader.load_authors(cleaner.EXCEL_AUTHORS)
+    cleaner.EXCEL_AUTHORS = directory/"data/UB_cs_authors_twice.xlsx"
+    wb = xlsxwriter.Workbook(cleaner.EXCEL_AUTHORS)
+    for sheet in (wb.add_worksheet(), wb.add_worksheet()):
+        sheet.write_row(0, 0, ["Name", "Lastname", "Middlename", "Department", "Faculty"])
+        for (row, author) in enumerate(rows):
+            sheet.write_row(row + 1, 0, author)
+    wb.close()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        cleaner.init_database()
+
+    differences = []
+    if len(cleaner.author_database) != len({row[:3] for row in rows}):
+        differences.append("authors listed twice are not inserted once")
+    if {format : set(variants) for (format, variants) in cleaner.ambiguous_names.items()} != ambiguous:
+        differences.append("authors listed twice make their names ambiguous")
+    return differences
+
+# misspelled names of the bundled authors - (name, author full name or None if it must not be matched)
+FUZZY_NAMES = [
+    ("Nlkolić, B.", "Bosko Nikolic"), # OCR confusion of l and i
+    ("Zlvković, M.", "Miodrag Zivkovic"),
+    ("Milutlnovic, V.", "Veljko Milutinovic"),
+    ("Maliković, M.", None), # other surnames - substituted, added or dropped letters
+    ("Milanović, M.", None),
+    ("Martić, M.", None),
+    ("Jankovic, M.", None) # different first letter
+]
+
+def check_fuzzy_matching(directory):
+    relocate(directory)
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        cleaner.init_database()
+    cleaner.fuzzy_threshold = cleaner.FUZZY_THRESHOLD
+
+    differences = []
+    for (name, expected) in FUZZY_NAMES:
+        author, score = cleaner.match_name(name)
+        matched = None if (author == None) else author['name'] + " " + author['lastname']
+        if matched != expected:
+            differences.append("name {0} matched to {1} instead of {2}".format(name, matched, expected))
+    return differences
+
+def check_parallel_clean(directory):
+    reference = clean_outputs(directory)
+    parallel = clean_outputs(directory, processes = 2)
+
+    differences = []
+    if reference[0] != parallel[0]:
+        differences.append("parallel cleaned workbook differs from serial")
+    if not same_dataset(reference[1], parallel[1]):
+        differences.append("parallel cleaned dataset differs from serial")
+    return differences
+
+def check_papers_reading(directory):
+    relocate(directory)
+    papers = directory/"data/UB_cs_papers_scopus.xlsx"
+    reference = list(readers.read_papers(papers))
+
+    # shared strings indexed on disk, rows read through the row cache and without it
+    memory = readers.SHARED_STRINGS_MEMORY
+    readers.SHARED_STRINGS_MEMORY = 0
+    indexed = list(readers.read_papers(papers))
+    readers.SHARED_STRINGS_MEMORY = memory
+    uncached = list(loader.load_papers(papers, cache = False))
+    cached = list(loader.load_papers(papers, cache = True))
+    from_cache = list(loader.load_papers(papers, cache = False))
+
+    differences = []
+    if indexed != reference:
+        differences.append("rows with shared strings indexed on disk differ")
+    if uncached != reference:
+        differences.append("rows read without the row cache differ")
+    if cached != reference or from_cache != reference:
+        differences.append("rows read through the row cache differ")
+
+    # malformed BibTeX entries are skipped, not raised
+    bibtex = directory/"data/malformed.bib"
+    bibtex.write_text("@article{a,\n title={Unclosed,\n}\n@article{b,\n title=\"Unclosed}\n"
+                      "@article{c,\n title={Read}, year={2020}}\n@article{d,\n title={Truncated\n", encoding = "utf-8")
+    if list(readers.read_papers(bibtex))[1:] != [("", "", "2020", "Read", "", "")]:
+        differences.append("malformed BibTeX entries not skipped")
+    return differences
+
+def write_part(directory):
+    # first half of the export
+    rows = list(readers.read_xlsx(DATA_DIR/"UB_cs_papers_scopus.xlsx"))
+    part = directory/"data/UB_cs_papers_part.xlsx"
+    wb = xlsxwriter.Workbook(part)
+    sheet = wb.add_worksheet(readers.sheet_name(DATA_DIR/"UB_cs_papers_scopus.xlsx"))
+    for row in range(0, len(rows) // 2):
+        sheet.write_row(row, 0, rows[row])
+    wb.close()
+    return part
+
+def check_incremental_clean(directory):
+    reference = clean_outputs(directory)
+
+    # clean first half of the export, then the whole export incrementally
+    part = write_part(directory)
+    clean_outputs(directory, papers = part)
+    incremental = clean_outputs(directory, incremental = True)
+
+    differences = []
+    if reference[0] != incremental[0]:
+        differences.append("incrementally cleaned workbook differs from full cleaning")
+    if not same_dataset(reference[1], incremental[1]):
+        differences.append("incrementally cleaned dataset differs from full cleaning")
+    return differences
+
+def write_csv(directory, name, count = None):
+    # bundled export, or its first count papers, as a Scopus CSV export
+    rows = list(readers.read_papers(DATA_DIR/"UB_cs_papers_scopus.xlsx"))[1:]
+    path = directory/"data"/name
+    with open(path, "w", newline = "", encoding = "utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(readers.CSV_COLUMNS)
+        for row in rows[:count]:
+            writer.writerow(row[:4] + (row[4].replace(" and ", "; "),) + row[5:])
+    return path
+
+def check_incremental_csv(directory):
+    papers = write_csv(directory, "UB_cs_papers.csv")
+    reference = clean_outputs(directory, papers = papers)
+
+    # clean the first papers of the export, then the appended rows read from the end of the last run
+    part = write_csv(directory, "UB_cs_papers_part.csv", len(read_sheet(cleaner.EXCEL_OUTPUT)) // 2)
+    clean_outputs(directory, papers = part)
+    output = io.StringIO()
+    with redirect_stdout(output):
+        cleaner.clean(papers, 1, True)
+    incremental = read_sheet(cleaner.EXCEL_OUTPUT), read_dataset(cleaner.DATASET_OUTPUT)
+
+    differences = []
+    if "Reading papers export from byte" not in output.getvalue():
+        differences.append("appended CSV rows not read from the end of the last run")
+    if reference[0] != incremental[0]:
+        differences.append("incrementally cleaned CSV workbook differs from full cleaning")
+    if not same_dataset(reference[1], incremental[1]):
+        differences.append("incrementally cleaned CSV dataset differs from full cleaning")
+    return differences
+
+def check_dataset(directory):
+    sheet = clean_outputs(directory)[0]
+    data = dataset.load_dataset(cleaner.DATASET_OUTPUT)
+
+    # dataset decoded to cleaned rows must match the cleaned workbook
+    titles = dataset.paper_titles(data)
+    rows = [[data['type_names'][data['types'][paper]], str(data['years'][paper]), titles[paper],
+             ", ".join(authors), data['doc_names'][data['docs'][paper]]]
+            for (paper, authors) in enumerate(dataset.paper_authors(data))]
+
+    differences = [] if (rows == sheet[1:]) else ["cleaned dataset differs from cleaned workbook"]
+
+    # papers without resolved authors have no authors, not an author named ""
+    empty = dataset.init_dataset()
+    dataset.add_paper(empty, ["Article", "2020", "Title", "", "Journal"])
+    if len(empty['author_ids']) > 0 or "" in empty['author_codes']:
+        differences.append("paper without authors encoded with an empty author name")
+    return differences
+
+def same_graph(first, second):
+    return (dict(first.nodes(data = True)) == dict(second.nodes(data = True)) and
+            {frozenset((u, v)) : d for (u, v, d) in first.edges(data = True)} ==
+            {frozenset((u, v)) : d for (u, v, d) in second.edges(data = True)})
+
+def graph_structure(graph):
+    # NetworkX graph without detected communities, references accumulate the structure only
+    attributes = {key : values for (key, values) in graph['attributes'].items() if key != 'community'}
+    return arraygraph.to_networkx(dict(graph, attributes = attributes))
+
+def reference_author_graph(papers):
+    # per pair NetworkX accumulation of the authors graph
+    graph = nx.Graph()
+    graph_authors.init_nodes()
+    for (name, module) in zip(graph_authors.author_arrays['names'],
+                              graph_authors.author_arrays['attributes']['module']):
+        graph.add_node(name, count = 0, module = module)
+
+    paper_set = set()
+    title_keys = papers['title_keys'].tolist()
+    for (paper, authors) in enumerate(dataset.paper_authors(papers)):
+        if title_keys[paper] in paper_set:
+            continue
+        paper_set.add(title_keys[paper])
+
+        for i in range(0, len(authors)):
+            for j in range(i + 1, len(authors)):
+                if graph.has_edge(authors[i], authors[j]):
+                    graph[authors[i]][authors[j]]['weight'] += 1
+                else:
+                    graph.add_edge(authors[i], authors[j], weight = 1)
+            graph.nodes[authors[i]]['count'] += 1
+
+    return graph
+
+def check_author_graph(directory):
+    clean_outputs(directory)
+    papers = dataset.load_dataset(graph_authors.DATASET_PAPERS)
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        graph_authors.create_graph()
+
+    if not same_graph(graph_structure(graph_authors.author_arrays), reference_author_graph(papers)):
+        return ["authors graph differs from per pair accumulation"]
+    return []
+
+def check_betweenness(directory):
+    clean_outputs(directory)
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        graph_authors.create_graph()
+    graph = graph_authors.author_arrays
+    reference = nx.Graph()
+    reference.add_nodes_from(range(len(graph['names'])))
+    reference.add_edges_from(zip(graph['source'].tolist(), graph['target'].tolist()))
+    reference = nx.betweenness_centrality(reference, normalized = False)
+    exact = centrality.centralities(graph)['betweenness']
+
+    differences = []
+    if not np.allclose(exact, [reference[node] for node in range(len(exact))]):
+        differences.append("exact betweenness differs from NetworkX")
+
+    # sampled betweenness is within the error bounds of every node
+    for samples in (len(exact) // 10, len(exact) // 2):
+        paths = centrality.centralities(graph, samples)
+        if (np.abs(paths['betweenness'] - exact) > paths['betweenness_errors'] + 1e-9).any():
+            differences.append("betweenness from {0} sources exceeds its error bounds".format(samples))
+    return differences
+
+MODULARITY_MARGIN = 0.01 # largest modularity shortfall of the communities behind NetworkX Louvain
+
+def modularity_graphs():
+    # small NetworkX reference graphs, the karate club with and without its weights
+    karate = nx.karate_club_graph()
+    unweighted = nx.Graph(karate.edges())
+    return [("karate club", karate), ("unweighted karate club", unweighted),
+            ("Les Miserables", nx.les_miserables_graph()), ("Davis southern women", nx.davis_southern_women_graph())]
+
+def check_modularity(directory):
+    clean_outputs(directory)
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        graph_authors.create_graph()
+    graphs = modularity_graphs() + [("authors graph", arraygraph.to_networkx(graph_authors.author_arrays))]
+
+    differences = []
+    for (name, reference) in graphs:
+        nodes = {node : index for (index, node) in enumerate(reference.nodes())}
+        edges = [(nodes[u], nodes[v], data.get("weight", 1)) for (u, v, data) in reference.edges(data = True)]
+        graph = dict(names = [str(node) for node in nodes], attributes = dict(), edge_attributes = dict(),
+                     source = np.array([edge[0] for edge in edges], dtype = np.int64),
+                     target = np.array([edge[1] for edge in edges], dtype = np.int64),
+                     weight = np.array([edge[2] for edge in edges], dtype = np.float64))
+
+        quality = community.modularity(graph, community.louvain(graph))
+        expected = nx.community.modularity(reference, nx.community.louvain_communities(reference, seed = 0))
+        if quality < expected - MODULARITY_MARGIN:
+            differences.append("modularity of {0} communities {1:.3f} below NetworkX {2:.3f}".format(name, quality,
+                                                                                                  expected))
+    return differences
+
+def reference_journal_graph(papers):
+    # per author journal pairs NetworkX accumulation of the journals graph
+    graph = nx.Graph()
+    author_journals = dict()
+    journals = [docname.title() for docname in papers['doc_names']]
+
+    for (paper, authors) in enumerate(dataset.paper_authors(papers)):
+        if papers['type_names'][papers['types'][paper]] not in graph_journals.PAPER_TYPES:
+            continue
+        journal = journals[papers['docs'][paper]]
+        if graph.has_node(journal):
+            graph.nodes[journal]['count'] += 1
+        else:
+            graph.add_node(journal, count = 1)
+        for author in authors:
+            author_journals.setdefault(author, set()).add(journal)
+
+    for author_set in author_journals.values():
+        author_set = list(author_set)
+        for i in range(0, len(author_set)):
+            for j in range(i + 1, len(author_set)):
+                if graph.has_edge(author_set[i], author_set[j]):
+                    graph[author_set[i]][author_set[j]]['weight'] += 1
+                else:
+                    graph.add_edge(author_set[i], author_set[j], weight = 1)
+
+    return graph
+
+def check_journal_graph(directory):
+    clean_outputs(directory)
+    papers = dataset.load_dataset(graph_journals.DATASET_PAPERS)
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        graph_journals.create_graph()
+
+    if not same_graph(graph_structure(graph_journals.journal_arrays), reference_journal_graph(papers)):
+        return ["journals graph differs from per author accumulation"]
+    return []
+
+def check_incremental_graphs(directory):
+    clean_outputs(directory)
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        graph_authors.create_graph(gexf = False)
+        graph_journals.create_graph(gexf = False)
+    reference = (arraygraph.to_networkx(graph_authors.author_arrays),
+                 arraygraph.to_networkx(graph_journals.journal_arrays))
+
+    # graphs of the first half of the export, then updated with the rest
+    clean_outputs(directory, papers = write_part(directory))
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        graph_authors.create_graph(gexf = False)
+        graph_journals.create_graph(gexf = False)
+    clean_outputs(directory, incremental = True)
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        graph_authors.update_graph(gexf = False)
+        graph_journals.update_graph(gexf = False)
+
+    differences = []
+    if not same_graph(arraygraph.to_networkx(graph_authors.author_arrays), reference[0]):
+        differences.append("updated authors graph differs from whole graph")
+    if not same_graph(arraygraph.to_networkx(graph_journals.journal_arrays), reference[1]):
+        differences.append("updated journals graph differs from whole graph")
+    return differences
+
+def check_hypergraph(directory):
+    clean_outputs(directory)
+    papers = dataset.load_dataset(graph_authors.DATASET_PAPERS)
+
+    # on demand pair weights, neighbors and degrees must match the projected pairs
+    differences = []
+    for (weighting, cap) in (("count", None), ("newman", None), ("count", 3)):
+        graph = graph_authors.author_nodes()
+        authors = graph_authors.map_authors(graph, papers)
+        arraygraph.init_hyperedges(graph, papers['author_ptr'], authors, graph_authors.paper_rows(papers),
+                                   weighting, cap)
+        arraygraph.project_hyperedges(graph)
+        adjacency = sparse.csr_matrix((graph['weight'], (graph['source'], graph['target'])),
+                                      shape = (len(graph['names']), len(graph['names'])))
+        adjacency = (adjacency + adjacency.T).tocsr()
+
+        scheme = "{0} weighting{1}".format(weighting, ", cap {0}".format(cap) if (cap != None) else "")
+        if not np.allclose(arraygraph.pair_weights(graph, graph['source'], graph['target']), graph['weight']):
+            differences.append("pair weights differ from projection with " + scheme)
+        for node in range(len(graph['names'])):
+            nodes, weights = arraygraph.neighbors(graph, node)
+            order = np.argsort(nodes)
+            row = adjacency[node]
+            if not (np.array_equal(nodes[order], row.indices) and np.allclose(weights[order], row.data)):
+                differences.append("neighbors differ from projection with " + scheme)
+                break
+        if not np.allclose(arraygraph.hyperedge_degrees(graph), np.asarray(adjacency.sum(axis = 1)).ravel()):
+            differences.append("degrees differ from projection with " + scheme)
+    return differences
+
+def check_query(directory):
+    clean_outputs(directory)
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        graph_authors.create_graph(gexf = False)
+        graph_journals.create_graph(gexf = False)
+    query.load_index()
+    papers = dataset.load_dataset(query.DATASET_PAPERS)
+    titles = dataset.paper_titles(papers)
+    modules = dict(zip(graph_authors.author_arrays['names'], graph_authors.author_arrays['attributes']['module']))
+
+    # papers queries with only some filters given, as passed by the command line
+    differences = []
+    authors = list(dataset.paper_authors(papers))
+    for author in papers['author_names']:
+        expected = [titles[paper] for (paper, names) in enumerate(authors) if author in names]
+        response, status = query.run_query("papers", dict(author = author, module = None, year = None))
+        if status != 200 or [paper['title'] for paper in response['result']] != expected:
+            differences.append("papers of author {0} differ from dataset scan".format(author))
+    for module in sorted(set(modules[author] for author in papers['author_names'])):
+        expected = [titles[paper] for (paper, names) in enumerate(authors)
+                    if any(modules[name] == module for name in names)]
+        response, status = query.run_query("papers", dict(author = None, module = module, year = None))
+        if status != 200 or [paper['title'] for paper in response['result']] != expected:
+            differences.append("papers of module {0} differ from dataset scan".format(module))
+    return differences
+
+CHECKS = [
+    ("name_parsing", check_name_parsing),
+    ("duplicate_authors", check_duplicate_authors),
+    ("fuzzy_matching", check_fuzzy_matching),
+    ("papers_reading", check_papers_reading),
+    ("parallel_clean", check_parallel_clean),
+    ("incremental_clean", check_incremental_clean),
+    ("incremental_csv", check_incremental_csv),
+    ("dataset", check_dataset),
+    ("author_graph", check_author_graph),
+    ("betweenness", check_betweenness),
+    ("modularity", check_modularity),
+    ("journal_graph", check_journal_graph),
+    ("incremental_graphs", check_incremental_graphs),
+    ("hypergraph", check_hypergraph),
+    ("query", check_query)
+]
+
+def run_check(directory, name, queue):
+    prepare(directory, None, 0)
+    queue.put(dict(CHECKS)[name](directory))
+
+def run_checks():
+    results = dict()
+
+    for (name, check) in CHECKS:
+        with tempfile.TemporaryDirectory() as tmp:
+            differences = run_process(run_check, (Path(tmp), name))
+
+        results[name] = differences
+        print("  {0:24} {1}".format(name, "identical" if not differences else "; ".join(differences)))
+
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmarks pipeline stages on synthetic datasets.")
+    parser.add_argument("-n", "--sizes", type = int, nargs = "*", default = BENCHMARK_SIZES,
+                        help = "number of papers in synthetic datasets (default: %(default)s)")
+    parser.add_argument("-b", "--bundled", action = "store_true", help = "benchmark the bundled dataset too")
+    parser.add_argument("-s", "--seed", type = int, default = 0, help = "random seed (default: %(default)s)")
+    parser.add_argument("-j", "--processes", type = int, default = 1,
+                        help = "number of cleaning processes, 0 uses all cores (default: %(default)s)")
+    parser.add_argument("-o", "--output", type = Path, default = BENCHMARK_OUTPUT,
+                        help = "results file (default: %(default)s)")
+    parser.add_argument("--no-checks", action = "store_true", help = "skip equivalence checks")
+    args = parser.parse_args()
+
+    options = dict(processes = args.processes or os.cpu_count())
+    results = dict(python = platform.python_version(), cpus = os.cpu_count(), options = options, runs = [])
+
+    if not args.no_checks:
+        print("Checking optimized code paths on the bundled dataset")
+        results['checks'] = run_checks()
+
+    sizes = ([None] if args.bundled else []) + args.sizes
+    for papers in sizes:
+        results['runs'].append(benchmark(papers, args.seed, options))
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent = 2)
+    print("Benchmark results written to: " + str(args.output))
@@ -0,0 +1,185 @@
+import math
+import multiprocessing
+import numpy as np
+
+import metrics
+
+'''
+Shortest path centralities of unweighted graphs - betweenness (Brandes), closeness, eccentricity,
+diameter and average path length.
+
+Every source node is expanded with a level synchronous BFS over the CSR adjacency, all edges of a BFS
+level are processed at once. Distances from every source are accumulated for all nodes, so in exact mode
+(all nodes are sources) closeness and eccentricity of every node are exact.
+
+In approximate mode only k sampled sources are expanded:
+    betweenness = dependencies of sampled sources scaled by n / k, with an error bound of every node
+                  holding for all nodes at once with probability 1 - CONFIDENCE_DELTA
+    closeness = inverse average distance to sampled sources in the same component
+    eccentricity = largest distance to a sampled source (lower bound), diameter likewise
+
+Betweenness error bound of a node is the smaller of two bounds of its mean dependency for sources
+sampled without replacement, each holding with probability 1 - CONFIDENCE_DELTA / 2 (Bardenet and
+Maillard, Concentration inequalities for sampling without replacement, 2015):
+    Hoeffding-Serfling           = R sqrt(rho log(4 n / delta) / (2 k))
+    empirical Bernstein-Serfling = s sqrt(2 rho log(20 n / delta) / k) + KAPPA R log(20 n / delta) / k
+where R is the dependency range of the node (size of its component - 2), s the standard deviation of its
+sampled dependencies and rho the finite population correction, so the bounds are 0 for nodes of
+components with up to 2 nodes and shrink to 0 as k approaches n. Bounds are scaled by n / 2 as the
+betweenness, the summary betweenness error is the largest bound of all nodes.
+
+Closeness is computed within the node's connected component, as in Gephi.
+'''
+
+CHUNK_SOURCES = 64 # number of sources expanded by a worker at once
+CONFIDENCE_DELTA = 0.05 # probability that the approximate betweenness error exceeds the bound
+BERNSTEIN_KAPPA = 7 / 3 + 3 / math.sqrt(2) # range term constant of the empirical Bernstein-Serfling bound
+
+indptr = None # CSR adjacency shared with worker processes
+indices = None
+
+def init_worker(adjacency_ptr, adjacency_indices):
+    global indptr
+    global indices
+    indptr = adjacency_ptr
+    indices = adjacency_indices
+
+def level_edges(nodes):
+    # (node, neighbor) arrays of all edges of the nodes
+    starts = indptr[nodes]
+    counts = indptr[nodes + 1] - starts
+    offsets = np.cumsum(counts) - counts
+    neighbors = indices[np.repeat(starts - offsets, counts) + np.arange(counts.sum())]
+    return np.repeat(nodes, counts), neighbors
+
+def source_paths(source):
+    # distances, shortest path counts and dependencies of all nodes for one source
+    nodes = len(indptr) - 1
+    distance = np.full(nodes, -1, dtype = np.int64)
+    sigma = np.zeros(nodes)
+    distance[source] = 0
+    sigma[source] = 1
+
+    levels = [np.array([source])]
+    while True:
+        parents, children = level_edges(levels[-1])
+        depth = len(levels)
+        children_new = children[distance[children] == -1]
+        distance[children_new] = depth
+
+        # shortest paths reaching the next level
+        tree = distance[children] == depth
+        sigma += np.bincount(children[tree], weights = sigma[parents[tree]], minlength = nodes)
+
+        level = np.unique(children_new)
+        if len(level) == 0:
+            break
+        levels.append(level)
+
+    # dependency accumulation from the farthest level
+    delta = np.zeros(nodes)
+    for level in reversed(levels[1:]):
+        children, parents = level_edges(level)
+        tree = distance[parents] == distance[children] - 1
+        children, parents = children[tree], parents[tree]
+        delta += np.bincount(parents, weights = sigma[parents] / sigma[children] * (1 + delta[children]),
+                             minlength = nodes)
+    delta[source] = 0
+
+    return distance, delta
+
+def expand_sources(sources):
+    # accumulated betweenness dependencies and distance statistics of the sources
+    nodes = len(indptr) - 1
+    betweenness = np.zeros(nodes)
+    squares = np.zeros(nodes)
+    distance_sum = np.zeros(nodes, dtype = np.int64)
+    reached = np.zeros(nodes, dtype = np.int64)
+    eccentricity = np.zeros(nodes, dtype = np.int64)
+
+    for source in sources:
+        distance, delta = source_paths(source)
+        betweenness += delta
+        squares += delta ** 2
+        reachable = distance >= 0
+        distance_sum[reachable] += distance[reachable]
+        reached += reachable
+        np.maximum(eccentricity, distance, out = eccentricity)
+
+    return betweenness, squares, distance_sum, reached, eccentricity
+
+def betweenness_errors(graph, dependencies, squares, samples):
+    # per node bounds of the betweenness error from the sums of sampled dependencies and of their squares
+    nodes = len(graph['names'])
+    component = metrics.components(graph)
+    span = np.maximum(metrics.component_sizes(component)[component] - 2, 0)
+    mean = dependencies / samples
+    deviation = np.sqrt(np.maximum(squares / samples - mean ** 2, 0))
+
+    # finite population correction of sampling without replacement
+    if samples <= nodes / 2:
+        rho = 1 - (samples - 1) / nodes
+    else:
+        rho = (1 - samples / nodes) * (1 + 1 / samples)
+
+    hoeffding = span * math.sqrt(rho * math.log(4 * nodes / CONFIDENCE_DELTA) / (2 * samples))
+    log = math.log(20 * nodes / CONFIDENCE_DELTA)
+    bernstein = deviation * math.sqrt(2 * rho * log / samples) + BERNSTEIN_KAPPA * span * log / samples
+    return nodes / 2 * np.minimum(hoeffding, bernstein)
+
+def centralities(graph, samples = None, processes = 1, seed = 0):
+    # exact centralities if samples is None, otherwise approximation from sampled sources
+    matrix = metrics.adjacency(graph)
+    nodes = matrix.shape[0]
+    if samples == None or samples >= nodes:
+        sources = np.arange(nodes)
+    else:
+        sources = np.sort(np.random.default_rng(seed).choice(nodes, samples, replace = False))
+    chunks = [sources[i:i + CHUNK_SOURCES] for i in range(0, len(sources), CHUNK_SOURCES)]
+
+    # sources are expanded in worker processes over the same read-only adjacency
+    adjacency = (matrix.indptr.astype(np.int64), matrix.indices.astype(np.int64))
+    if processes == 1:
+        init_worker(*adjacency)
+        results = [expand_sources(chunk) for chunk in chunks]
+    else:
+        with multiprocessing.Pool(processes, init_worker, adjacency) as pool:
+            results = pool.map(expand_sources, chunks)
+
+    betweenness = np.zeros(nodes)
+    squares = np.zeros(nodes)
+    distance_sum = np.zeros(nodes, dtype = np.int64)
+    reached = np.zeros(nodes, dtype = np.int64)
+    eccentricity = np.zeros(nodes, dtype = np.int64)
+    for (chunk_betweenness, chunk_squares, chunk_distances, chunk_reached, chunk_eccentricity) in results:
+        betweenness += chunk_betweenness
+        squares += chunk_squares
+        distance_sum += chunk_distances
+        reached += chunk_reached
+        np.maximum(eccentricity, chunk_eccentricity, out = eccentricity)
+
+    # betweenness error bounds of the mean dependencies, see the module description
+    exact = len(sources) == nodes
+    errors = np.zeros(nodes)
+    if not exact and len(sources) > 0:
+        errors = betweenness_errors(graph, betweenness, squares, len(sources))
+
+    # every undirected pair is counted from both ends, sampled dependencies are scaled to all sources
+    scale = nodes / len(sources) if (len(sources) > 0) else 0
+    betweenness *= scale / 2
+
+    # sampled sources do not count themselves as reached
+    sampled = np.zeros(nodes, dtype = np.int64)
+    sampled[sources] = 1
+    others = reached - sampled
+    closeness = np.divide(others, distance_sum, out = np.zeros(nodes), where = distance_sum > 0)
+
+    return dict(betweenness = betweenness,
+                closeness = closeness,
+                eccentricity = eccentricity,
+                diameter = int(eccentricity.max(initial = 0)),
+                average_path_length = distance_sum.sum() / others.sum() if (others.sum() > 0) else 0,
+                exact = exact,
+                sources = len(sources),
+                betweenness_errors = errors,
+                betweenness_error = errors.max(initial = 0))
@@ -1,8 +1,23 @@
-import xlrd
 import xlsxwriter
+import argparse
+import csv
+import hashlib
+import multiprocessing
+import os
+import pickle
 import re
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
 
+import dataset
+import fuzzy
+import instrument
+import loader
+import readers
+
 FILE_DIR = Path(__file__).parent
 
 EXCEL_AUTHORS = (FILE_DIR/"../data/UB_cs_authors.xlsx").resolve()
@@ -10,74 +25,171 @@ EXCEL_PAPERS = (FILE_DIR/"../data/UB_cs_papers_scopus.xlsx").resolve()
 
 EXCEL_OUTPUT = (FILE_DIR/"../data/UB_cs_papers_cleaned.xlsx").resolve()
 
+DATASET_OUTPUT = (FILE_DIR/"../data/UB_cs_papers_cleaned.npz").resolve()
+FUZZY_OUTPUT = (FILE_DIR/"../data/UB_cs_papers_fuzzy.csv").resolve()
+
+# incremental cleaning state and already cleaned rows
+STATE_OUTPUT = (FILE_DIR/"../data/UB_cs_papers_cleaned.state").resolve()
+ROWS_OUTPUT = (FILE_DIR/"../data/UB_cs_papers_cleaned.rows").resolve()
+
 PAPER_TYPES = {"Article", "Conference Paper", "Article in Press", "Review", "Book Chapter"}
 
+# supported author name formats - (format, middlename required)
+# format arguments: {0} first name, {1} first letter of name, {2} last name, {3} middle name
+NAME_FORMATS = [
+    ("{2} {1}.{3}.", True),  # lastname n.m.
+    ("{2} {1}.", False),     # lastname n.
+    ("{2} {0} {3}.", True),  # lastname name m.
+    ("{2} {0} {3}", True),   # lastname name m
+    ("{2} {0}", False)       # lastname name
+]
+
+# number of words after the last name in name formats
+NAME_GIVEN_WORDS = {
+    "{2} {1}.{3}." : 1,
+    "{2} {1}." : 1,
+    "{2} {0} {3}." : 2,
+    "{2} {0} {3}" : 2,
+    "{2} {0}" : 1
+}
+
+# regular expressions for recognizing name formats
+PATTERN_INITIALS_MIDDLE = re.compile(r"[a-z ]+ [a-z]\.[a-z]\.") # lastname n.m.
+PATTERN_INITIALS = re.compile(r"[a-z ]+ [a-z]\.")                # lastname n.
+PATTERN_MIDDLE_DOT = re.compile(r"[a-z ]+ [a-z]+ [a-z]\.")       # lastname name m.
+PATTERN_MIDDLE = re.compile(r"[a-z ]+ [a-z]+ [a-z]")             # lastname name m
+PATTERN_NAME = re.compile(r"[a-z ]+ [a-z]+")                     # lastname name
+
+NAME_PATTERNS = {
+    "{2} {1}.{3}." : PATTERN_INITIALS_MIDDLE,
+    "{2} {1}." : PATTERN_INITIALS,
+    "{2} {0} {3}." : PATTERN_MIDDLE_DOT,
+    "{2} {0} {3}" : PATTERN_MIDDLE,
+    "{2} {0}" : PATTERN_NAME
+}
+
+# translation table for trimming diacritical marks
+DIACRITICS = {
+    "a" : "àáâǎãäåăā",
+    "e" : "èéêëėęěĕē",
+    "i" : "ìíîï",
+    "o" : "òóôǒõöōŏő",
+    "u" : "ùúûüũūŭůűǔ",
+    "s" : "šśŝş",
+    "dj" : "đð",
+    "c" : "čćĉċ",
+    "z" : "žźż"
+}
+DIACRITICS_TABLE = str.maketrans({char : letter for (letter, chars) in DIACRITICS.items() for char in chars})
+
+NAME_CACHE_SIZE = 16384 # maximum number of memoized parsed names
+
+FUZZY_CANDIDATES = 10 # number of authors compared with an unresolved name
+FUZZY_THRESHOLD = 0.9 # default minimum similarity of first names, lower values match more different people
+SURNAME_EDIT_LENGTH = 7 # last names may differ by one edit per this many letters of the shorter name
+SURNAME_INDEL = 2 # edit cost of an added or dropped letter, these mostly give other surnames (Maric, Martic)
+# letters last names may differ in - OCR confusions (Nlkolic), other substituted letters mostly give
+# other surnames (Malikovic, Maljkovic), diacritics are already removed by the name normalization
+SURNAME_SUBSTITUTES = {"li", "il"}
+MATCH_MARGIN = 0.05 # minimum similarity lead of the matched author over the next most similar author
+
+CHUNK_SIZE = 2000 # number of papers cleaned by a worker process at once
+CHUNK_BACKLOG = 4 # maximum number of pending chunks per worker process
+
 author_database = [] # list of all relevant authors
+name_index = dict() # name format -> dict of name variants mapped to authors
+ambiguous_names = dict() # name variants shared by multiple authors
 paper_set = set() # set for skipping duplicate papers
 
+fuzzy_threshold = None # minimum similarity of fuzzy matched names, None disables fuzzy matching
+fuzzy_index = dict() # n-gram blocking index of author names
+fuzzy_matches = dict() # fuzzy matched names - [author, similarity, count]
+
 def init_database():
     global author_database
-    wb = xlrd.open_workbook(EXCEL_AUTHORS, on_demand = True)
+    authors = dict()
 
-    # read and insert all authors from excel file to dict list
-    for sheet in wb.sheets():
-        for row in range(1, sheet.nrows):
-            name = sheet.cell_value(row, 0).title()
-            lastname = sheet.cell_value(row, 1).title()
-            middlename = sheet.cell_value(row, 2) if (sheet.cell_value(row, 2) != "N/A") else ""
+    # insert all authors from excel file to dict list, authors listed more than once
+    # (on multiple sheets or departments) are the same person and are inserted once
+    for (name, lastname, middlename, department, faculty) in loader.load_authors(EXCEL_AUTHORS):
+        name = name.title()
+        lastname = lastname.title()
+        middlename = middlename if (middlename != "N/A") else ""
 
-            author = dict(name = name, lastname = lastname, middlename = middlename)
-            author_database.append(author)
+        authors.setdefault((name, lastname, middlename), dict(name = name, lastname = lastname, middlename = middlename))
 
     # sort database in alphabetical order by lastnames then names and middlenames
-    author_database = sorted(author_database, key = lambda author: "{0} {1} {2}".format(author['lastname'],
-                                                                                        author['name'],
-                                                                                        author['middlename']))
-    wb.release_resources()
-    del wb
+    author_database = sorted(authors.values(), key = lambda author: "{0} {1} {2}".format(author['lastname'],
+                                                                                         author['name'],
+                                                                                         author['middlename']))
+
+    init_index()
+
+def format_name(author, format):
+    # modify author to match name format
+    variant = format.format(author['name'],       # First name
+                            author['name'][0],    # First letter of name
+                            author['lastname'],   # Last name
+                            author['middlename']) # Middle name
+    return variant.lower()
+
+def init_index():
+    global name_index
+    global ambiguous_names
+    global fuzzy_index
+    name_index = {format: dict() for (format, _) in NAME_FORMATS}
+    ambiguous_names = dict()
+
+    # map every supported name variant of every author to the author entry
+    for author in author_database:
+        for (format, middlename) in NAME_FORMATS:
+            if middlename and author['middlename'] == "":
+                continue
+
+            variant = format_name(author, format)
+
+            # variants shared by different authors can't be resolved
+            if variant in ambiguous_names.get(format, dict()):
+                ambiguous_names[format][variant].append(author)
+            elif variant in name_index[format]:
+                ambiguous_names.setdefault(format, dict())[variant] = [name_index[format].pop(variant), author]
+            else:
+                name_index[format][variant] = author
+
+    # report ambiguous name variants
+    for format in ambiguous_names:
+        for (variant, authors) in ambiguous_names[format].items():
+            fullnames = ", ".join("{0} {1}".format(author['name'], author['lastname']) for author in authors)
+            print("Ambiguous author name '" + variant + "' skipped, matches: " + fullnames)
+
+    # blocking index for fuzzy matching of unresolved names
+    fuzzy_index = fuzzy.build_index([format_name(author, "{2} {0}") for author in author_database])
+
+    # memoized names may be resolved differently by the new index
+    parse_name.cache_clear()
+    match_name.cache_clear()
 
 def search_name(name, format):
-    left = 0
-    right = len(author_database) - 1
-    while (left <= right):
-        middle = left + ((right - left) // 2)
-        author = author_database[middle]
-
-        # modify author to match name format
-        format_author = format.format(author['name'],       # First name
-                                      author['name'][0],    # First letter of name
-                                      author['lastname'],   # Last name
-                                      author['middlename']) # Middle name
-        format_author = format_author.lower()
-
-        if name == format_author:
-            return author
-
-        if (name > format_author):
-            left = middle + 1
-        else:
-            right = middle - 1
+    return name_index[format].get(name)
 
-    return None
+def normalize_name(name):
+    name = name.lower()
+    # trim diacritical marks
+    name = name.translate(DIACRITICS_TABLE)
+    if not name.isascii():
+        # trim remaining diacritical marks by unicode decomposition
+        name = unicodedata.normalize("NFKD", name)
+        name = "".join(char for char in name if not unicodedata.combining(char))
 
+    return name.replace(",", "") # char ',' interferes with string comparison
+
+@lru_cache(maxsize = NAME_CACHE_SIZE)
 def parse_name(name):
     # name normalization
-    name = name.lower()
-    # trim diacritical marks
-    name = re.sub("[àáâǎãäåăā]", "a", name);
-    name = re.sub("[èéêëėęěĕē]", "e", name);
-    name = re.sub("[ìíîï]", "i", name);
-    name = re.sub("[òóôǒõöōŏő]", "o", name);
-    name = re.sub("[ùúûüũūŭůűǔ]", "u", name);
-    name = re.sub("[šśŝş]", "s", name);
-    name = re.sub("[đð]", "dj", name);
-    name = re.sub("[čćĉċ]", "c", name);
-    name = re.sub("[žźż]", "z", name);
-
-    name = name.replace(",", "") # char ',' interferes with binary search and string comparison
+    name = normalize_name(name)
 
     # check format "name middlename lastname" -> "lastname n.m."
-    if re.fullmatch(r"[a-z ]+ [a-z]\.[a-z]\.", name):
+    if PATTERN_INITIALS_MIDDLE.fullmatch(name):
         format = "{2} {1}.{3}."
         fullname = search_name(name, format)
         if fullname != None:
@@ -85,14 +197,14 @@ def parse_name(name):
         name = name[:-2] # lastname n.m. -> lastname n.
 
     # check format "name lastname" -> "lastname n."
-    if re.fullmatch(r"[a-z ]+ [a-z]\.", name):
+    if PATTERN_INITIALS.fullmatch(name):
         format = "{2} {1}."
         fullname = search_name(name, format)
         if fullname != None:
             return fullname
 
     # check format "name middlename lastname" -> "lastname name m."
-    if re.fullmatch(r"[a-z ]+ [a-z]+ [a-z]\.", name):
+    if PATTERN_MIDDLE_DOT.fullmatch(name):
         format = "{2} {0} {3}."
         fullname = search_name(name, format)
         if fullname != None:
@@ -100,7 +212,7 @@ def parse_name(name):
         name = name[:-3] # lastname name m. -> lastname name
 
     # check format "name middlename lastname" -> "lastname name m"
-    if re.fullmatch(r"[a-z ]+ [a-z]+ [a-z]", name):
+    if PATTERN_MIDDLE.fullmatch(name):
         format = "{2} {0} {3}"
         fullname = search_name(name, format)
         if fullname != None:
@@ -108,7 +220,7 @@ def parse_name(name):
         name = name[:-2] # lastname name m -> lastname name
 
     # check format "name lastname" -> "lastname name"
-    if re.fullmatch(r"[a-z ]+ [a-z]+", name):
+    if PATTERN_NAME.fullmatch(name):
         format = "{2} {0}"
         fullname = search_name(name, format)
         if fullname != None:
@@ -116,24 +228,100 @@ def parse_name(name):
 
     return None
 
+def given_similarity(words, variant):
+    # initials must be equal, first names must start with the same letter
+    variant = variant.split(" ")
+    if len(words) != len(variant):
+        return 0
+
+    scores = []
+    for (word, other) in zip(words, variant):
+        if "." in word or "." in other or len(word) == 1 or len(other) == 1:
+            scores.append(1.0 if (word.rstrip(".") == other.rstrip(".")) else 0)
+        else:
+            scores.append(fuzzy.similarity(word, other) if (word[0] == other[0]) else 0)
+
+    return min(scores)
+
+def surname_similarity(name, lastname):
+    # 0 for last names with different first letters (Jankovic, Bankovic), substituted letters
+    # other than OCR confusions or differing by more than the edits allowed for their length
+    edits = min(len(name), len(lastname)) // SURNAME_EDIT_LENGTH
+    if name[:1] != lastname[:1] or fuzzy.edit_distance(name, lastname, SURNAME_INDEL, SURNAME_SUBSTITUTES) > edits:
+        return 0
+    return fuzzy.similarity(name, lastname)
+
+@lru_cache(maxsize = NAME_CACHE_SIZE)
+def match_name(name):
+    # name normalization, hyphenated last names are compared as separate words
+    name = " ".join(normalize_name(name).replace("-", " ").split())
+
+    # compare only with name formats of the same shape
+    formats = [format for (format, pattern) in NAME_PATTERNS.items() if pattern.fullmatch(name)]
+    formats = formats or list(NAME_PATTERNS)
+    if any(name in ambiguous_names.get(format, dict()) for format in formats):
+        return None, 0
+
+    # compare with the most similar candidates from the blocking index
+    author_scores = []
+    tokens = name.split(" ")
+    for author_id in fuzzy.candidates(fuzzy_index, name, FUZZY_CANDIDATES):
+        author = author_database[author_id]
+        lastname = author['lastname'].lower().replace("-", " ")
+
+        # last names and first names/initials are compared separately,
+        # name is as similar as its least similar part
+        scores = []
+        for (format, middlename) in NAME_FORMATS:
+            given = NAME_GIVEN_WORDS[format]
+            if format not in formats or (middlename and author['middlename'] == "") or len(tokens) <= given:
+                continue
+
+            variant = format_name(author, format)[len(author['lastname']) + 1:]
+            given_score = given_similarity(tokens[-given:], variant)
+            if given_score >= fuzzy_threshold:
+                scores.append(min(surname_similarity(" ".join(tokens[:-given]), lastname), given_score))
+        author_scores.append((max(scores, default = 0), author_id))
+
+    # names about as similar to another author are not matched
+    author_scores.sort(reverse = True)
+    (best_score, best_id) = author_scores[0] if author_scores else (0, None)
+    second_score = author_scores[1][0] if (len(author_scores) > 1) else 0
+    if best_score == 0 or best_score - second_score < MATCH_MARGIN:
+        return None, best_score
+
+    return author_database[best_id], best_score
+
 def parse_authors(authors):
     fullnames = []
     names = authors.split(" and ")
 
     for name in names:
         author = parse_name(name.strip())
+
+        # fuzzy match names that couldn't be resolved
+        if author == None and fuzzy_threshold != None and name.strip() != "":
+            author, score = match_name(name.strip())
+            if author != None:
+                match = fuzzy_matches.setdefault(name.strip(), ["{0} {1}".format(author['name'], author['lastname']), score, 0])
+                match[2] += 1
+                instrument.count("names_fuzzy_matched")
+
         if author != None:
             fullnames.append("{0} {1}".format(author['name'], author['lastname']))
+        elif name.strip() != "":
+            instrument.count("names_unresolved")
  
     return ", ".join(fullnames)
 
-def parse_line(line):
+def check_line(line):
     global paper_set
 
     # Check paper type
     ptype = line[0]
     if ptype not in PAPER_TYPES:
-        return None
+        instrument.count("rows_rejected_type")
+        return False
 
     year = line[2]
     title = line[3]
@@ -142,10 +330,14 @@ def parse_line(line):
     # Check duplicate papers - leave duplicates that were published separately
     paper = year + " " + title.lower() + " " + docname.lower()
     if paper in paper_set:
-        return None
+        instrument.count("duplicates_skipped")
+        return False
     else:
         paper_set.add(paper)
 
+    return True
+
+def parse_paper(line):
     # Parse main author
     main_author = parse_authors(re.sub("N/A", "", line[1]))
 
@@ -154,56 +346,253 @@ def parse_line(line):
     if (authors.find(main_author) == -1):
         authors = (main_author + ", " + authors) if (authors != "") else (main_author)
 
-    return [ptype, year, title, authors, docname]
+    return [line[0], line[2], line[3], authors, line[5]]
+
+def parse_line(line):
+    if not check_line(line):
+        return None
+
+    return parse_paper(line)
+
+def init_worker(index, fuzzy_state):
+    global name_index
+    global fuzzy_threshold
+    global author_database
+    global ambiguous_names
+    global fuzzy_index
+
+    # read-only name indexes shared by the cleaning process
+    name_index = index
+    fuzzy_threshold, author_database, ambiguous_names, fuzzy_index = fuzzy_state
+    parse_name.cache_clear()
+    match_name.cache_clear()
+    instrument.init_worker()
+
+def parse_chunk(lines):
+    fuzzy_matches.clear()
+    return [parse_paper(line) for line in lines], fuzzy_matches, instrument.take_counters()
+
+def merge_chunk(chunk):
+    lines, matches, counters = chunk
+    instrument.add_counters(counters)
+
+    # merge worker fuzzy matches
+    for (name, (author, score, count)) in matches.items():
+        match = fuzzy_matches.setdefault(name, [author, score, 0])
+        match[2] += count
+
+    return lines
+
+def clean_lines(lines, processes = 1):
+    # serial cleaning
+    if processes == 1:
+        for line in lines:
+            line = parse_line(line)
+            if line != None:
+                yield line
+        return
+
+    # parallel cleaning - duplicates are skipped here in original row order,
+    # worker processes resolve authors of chunks that are merged back in the same order
+    lines = filter(check_line, lines)
+    pending = deque()
+    fuzzy_state = (fuzzy_threshold, author_database, ambiguous_names, fuzzy_index)
+    with multiprocessing.Pool(processes, init_worker, (name_index, fuzzy_state)) as pool:
+        for chunk in iter(lambda: list(islice(lines, CHUNK_SIZE)), []):
+            pending.append(pool.apply_async(parse_chunk, (chunk,)))
+
+            # limit number of chunks waiting in memory
+            if len(pending) >= processes * CHUNK_BACKLOG:
+                yield from merge_chunk(pending.popleft().get())
+
+        while pending:
+            yield from merge_chunk(pending.popleft().get())
+
+def database_fingerprint():
+    digest = hashlib.sha256(repr(fuzzy_threshold).encode())
+    for author in author_database:
+        digest.update("{0}|{1}|{2}\n".format(author['name'], author['lastname'], author['middlename']).encode())
+
+    return digest.hexdigest()
+
+def load_state(fingerprint):
+    if not (STATE_OUTPUT.exists() and ROWS_OUTPUT.exists()):
+        print("No previous cleaning state, cleaning all papers")
+        return None
+
+    with open(STATE_OUTPUT, "rb") as file:
+        state = pickle.load(file)
+
+    # authors could be resolved differently with the changed database or fuzzy matching
+    if state['fingerprint'] != fingerprint:
+        print("Author database or fuzzy matching changed, cleaning all papers")
+        return None
+
+    return state
+
+def save_state(state):
+    with open(STATE_OUTPUT, "wb") as file:
+        pickle.dump(state, file)
+
+def track_rows(rows, digest, state):
+    # hash and count read input rows, rows of resumed exports are not hashed
+    for line in rows:
+        if digest != None:
+            digest.update(repr(line).encode())
+        state['rows'] += 1
+        instrument.count("rows_read")
+        yield line
+
+def save_matches():
+    # fuzzy matches audit report, least similar matches first
+    with open(FUZZY_OUTPUT, "w", newline = "", encoding = "utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Name", "Author", "Similarity", "Count"])
+        for (name, (author, score, count)) in sorted(fuzzy_matches.items(), key = lambda item : item[1][1]):
+            writer.writerow([name, author, "{:.3f}".format(score), count])
+
+def read_rows(file, count):
+    for _ in range(count):
+        yield pickle.load(file)
+
+@instrument.stage("clean")
+def clean(papers = EXCEL_PAPERS, processes = 1, incremental = False, threshold = None, cache = None):
+    global paper_set
+    global fuzzy_threshold
+    fuzzy_threshold = threshold
+    fuzzy_matches.clear()
 
-def clean():
     print("Initializing author database: " + str(EXCEL_AUTHORS))
     init_database()
 
-    # Input
-    wb = xlrd.open_workbook(EXCEL_PAPERS, on_demand = True)
-    sheet = wb.sheet_by_index(0)
-    print("Reading papers data file: " + str(EXCEL_PAPERS))
+    fingerprint = database_fingerprint()
+    state = load_state(fingerprint) if incremental else None
+
+    # Input - rows are streamed one at a time
+    print("Reading papers data file: " + str(papers))
+    offset = readers.resume_offset(papers)
+    digest = hashlib.sha256()
+
+    # CSV/BibTeX exports with unchanged bytes before the offset of the last run are read from that offset
+    resume = state != None and state.get('offset', 0) > 0 and offset >= state['offset'] \
+             and loader.file_hash(papers, state['offset']) == state['prefix']
+    if resume:
+        print("Reading papers export from byte {0}".format(state['offset']))
+        rows = readers.read_papers(papers, state['offset'])
+        header = next(rows)
+        digest = None
+    else:
+        rows = loader.load_papers(papers, cache)
+        header = next(rows)
+
+    # check that already cleaned rows are unchanged - new rows can only be appended to the export
+    if state != None and not resume:
+        prefix = dict(rows = 0)
+        for line in track_rows(islice(rows, state['rows']), digest, prefix):
+            pass
+
+        if prefix['rows'] != state['rows'] or digest.hexdigest() != state['digest']:
+            print("Papers export changed, cleaning all papers")
+            state = None
+            rows = loader.load_papers(papers, cache)
+            next(rows)
+            digest = hashlib.sha256()
+
+    if state != None:
+        print("Skipping {0} already cleaned rows".format(state['rows']))
+        paper_set = state['papers']
+        # matches of already cleaned rows stay in the audit report
+        for (name, match) in state.get('matches', dict()).items():
+            fuzzy_matches[name] = list(match)
+    else:
+        state = dict(fingerprint = fingerprint, rows = 0, lines = 0, size = 0)
+        paper_set = set()
 
-    # Output
-    owb = xlsxwriter.Workbook(EXCEL_OUTPUT)
-    outsheet = owb.add_worksheet(sheet.name)
+    # Output - rows are flushed to disk as they are written
+    owb = xlsxwriter.Workbook(EXCEL_OUTPUT, {'constant_memory' : True})
+    outsheet = owb.add_worksheet(loader.sheet_name(papers))
     outrow = 1
 
-    # Column header titles
-    outsheet.write(0, 0, sheet.cell_value(0, 5)) # Type
-    outsheet.write(0, 1, sheet.cell_value(0, 2)) # Year
-    outsheet.write(0, 2, sheet.cell_value(0, 1)) # Title
-    outsheet.write(0, 3, sheet.cell_value(0, 3)) # Authors
-    outsheet.write(0, 4, sheet.cell_value(0, 9)) # Document Name
-
-    print("Cleaning...")
-    for row in range(1, sheet.nrows):
-        line = [sheet.cell_value(row, 5), # Type
-                sheet.cell_value(row, 0), # Main Author
-                sheet.cell_value(row, 2), # Year
-                sheet.cell_value(row, 1), # Title
-                sheet.cell_value(row, 3), # Authors
-                sheet.cell_value(row, 9)] # Document Name
-
-        line = parse_line(line)
-
-        if line == None:
-            continue
-        
-        outsheet.write_row(outrow, 0, line)
-        outrow += 1
-    print("Cleaned papers data written to: " + str(EXCEL_OUTPUT))
-
     outsheet.set_column(0, 0, 22) # Type column width 22 chars
     outsheet.set_column(1, 1, 8)  # Year column width 8 chars
     outsheet.set_column(2, 2, 90) # Title column width 90 chars
     outsheet.set_column(3, 3, 50) # Authors column width 50 chars
     outsheet.set_column(4, 4, 80) # Document name column width 80 chars
 
-    wb.release_resources()
-    del wb
+    # Column header titles
+    outsheet.write(0, 0, header[0]) # Type
+    outsheet.write(0, 1, header[2]) # Year
+    outsheet.write(0, 2, header[3]) # Title
+    outsheet.write(0, 3, header[4]) # Authors
+    outsheet.write(0, 4, header[5]) # Document Name
+
+    # columnar dataset output
+    data = dataset.init_dataset()
+
+    rows_file = open(ROWS_OUTPUT, "r+b" if (state['size'] > 0) else "w+b")
+
+    # already cleaned rows
+    for line in read_rows(rows_file, state['lines']):
+        outsheet.write_row(outrow, 0, line)
+        dataset.add_paper(data, line)
+        outrow += 1
+    rows_file.seek(state['size'])
+    rows_file.truncate()
+
+    print("Cleaning...")
+    for line in clean_lines(track_rows(rows, digest, state), processes):
+        pickle.dump(line, rows_file)
+        outsheet.write_row(outrow, 0, line)
+        dataset.add_paper(data, line)
+        outrow += 1
+    print("Cleaned {0} new papers".format(outrow - 1 - state['lines']))
+    instrument.count("papers_cleaned", outrow - 1 - state['lines'])
+
     owb.close()
     del owb
+    print("Cleaned papers data written to: " + str(EXCEL_OUTPUT))
 
-clean()
\ No newline at end of file
+    dataset.save_dataset(data, DATASET_OUTPUT)
+    del data
+    print("Cleaned papers dataset written to: " + str(DATASET_OUTPUT))
+
+    # save state for the next incremental run
+    state['lines'] = outrow - 1
+    state['size'] = rows_file.tell()
+    # digest of all rows is known only if they were all read, seekable exports are checked by the prefix hash
+    state['digest'] = digest.hexdigest() if (digest != None) else None
+    state['offset'] = offset
+    state['prefix'] = loader.file_hash(papers, offset) if (offset > 0) else None
+    state['papers'] = paper_set
+    state['matches'] = fuzzy_matches
+    rows_file.close()
+    save_state(state)
+
+    if fuzzy_threshold != None:
+        save_matches()
+        print("{0} fuzzy matched names written to: {1}".format(len(fuzzy_matches), FUZZY_OUTPUT))
+
+    if processes == 1:
+        cache = parse_name.cache_info()
+        print("Name cache: {0} hits, {1} misses".format(cache.hits, cache.misses))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Cleans Scopus papers export (.xlsx, .csv or .bib).")
+    parser.add_argument("papers", nargs = "?", type = Path, default = EXCEL_PAPERS,
+                        help = "papers export file (default: %(default)s)")
+    parser.add_argument("-j", "--processes", type = int, default = 1,
+                        help = "number of cleaning processes, 0 uses all cores (default: %(default)s)")
+    parser.add_argument("-i", "--incremental", action = "store_true",
+                        help = "clean only rows appended to the export since the last run")
+    parser.add_argument("-f", "--fuzzy", type = float, metavar = "THRESHOLD",
+                        help = "fuzzy match unresolved names with first name similarity of at least THRESHOLD "
+                               "(0-1, {0} is the default)".format(FUZZY_THRESHOLD))
+    parser.add_argument("-c", "--cache", action = "store_true", default = None,
+                        help = "cache the read paper rows on disk also for exports larger than "
+                               "{0} MB".format(loader.PAPERS_CACHE_SIZE >> 20))
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    instrument.start(args.metrics, args.profile)
+    clean(args.papers.resolve(), args.processes or os.cpu_count(), args.incremental, args.fuzzy, args.cache)
+    instrument.finish(args.metrics, args.profile)
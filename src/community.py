@@ -0,0 +1,199 @@
+import numpy as np
+from scipy import sparse
+
+import metrics
+
+'''
+Community detection by modularity optimization (Louvain) on weighted array graphs.
+
+Every level moves nodes between communities and then aggregates communities into the nodes of the
+next level, until no node moves. Moves of all nodes are evaluated at once on the edge arrays:
+    gain = weight to community - resolution * strength * community strength / 2m
+and every improving node moves with probability MOVE_PROBABILITY, so neighbors rarely swap
+communities at the same time. Sweeps that do not increase modularity are discarded and the
+probability is halved. Moves are drawn from a generator seeded with SEED, so communities are reproducible.
+
+Parallel moves stop in partitions where single node moves can still improve modularity, mostly on
+small graphs, so the communities of the first level are refined by sequential moves of single nodes
+on the original graph: nodes are visited in random order and move to the neighboring community with
+the highest gain, later sweeps visit only neighbors of moved nodes. A sweep costs a Python loop over
+the edges of the visited nodes.
+
+Communities split into several connected components are divided into their components
+(as in Leiden), which never decreases modularity. Communities are numbered by decreasing size.
+'''
+
+SEED = 0 # random seed of node moves
+MOVE_PROBABILITY = 0.5 # probability that an improving node moves in a sweep
+MIN_PROBABILITY = 1 / 64 # level ends when sweeps with lower probability do not improve modularity
+MAX_SWEEPS = 100 # maximum number of sweeps of a level
+TOLERANCE = 1e-10 # smallest modularity improvement
+REFINE_SWEEPS = 10 # maximum number of sequential refinement sweeps
+
+def strengths(matrix):
+    return np.asarray(matrix.sum(axis = 1)).ravel()
+
+def modularity_matrix(matrix, community, resolution = 1.0):
+    two_m = matrix.sum()
+    if two_m == 0:
+        return 0.0
+
+    coo = matrix.tocoo()
+    internal = coo.data[community[coo.row] == community[coo.col]].sum()
+    totals = np.bincount(community, weights = strengths(matrix))
+    return internal / two_m - resolution * (totals ** 2).sum() / two_m ** 2
+
+def modularity(graph, community, resolution = 1.0):
+    return modularity_matrix(metrics.adjacency(graph).astype(np.float64), np.asarray(community), resolution)
+
+def move_nodes(matrix, resolution, rng):
+    # community of every node after the local moving phase, starting from singletons
+    nodes = matrix.shape[0]
+    coo = matrix.tocoo()
+    loops = coo.row == coo.col
+    rows, cols, weights = coo.row[~loops].astype(np.int64), coo.col[~loops].astype(np.int64), coo.data[~loops]
+    strength = strengths(matrix)
+    two_m = strength.sum()
+
+    community = np.arange(nodes)
+    quality = modularity_matrix(matrix, community, resolution)
+    probability = MOVE_PROBABILITY
+    for sweep in range(MAX_SWEEPS):
+        totals = np.bincount(community, weights = strength, minlength = nodes)
+
+        # weight from every node to every neighboring community
+        keys, inverse = np.unique(rows * nodes + community[cols], return_inverse = True)
+        links = np.bincount(inverse.reshape(-1), weights = weights)
+        key_nodes, key_communities = keys // nodes, keys % nodes
+
+        # score of staying in own community without the node
+        own = key_communities == community[key_nodes]
+        own_links = np.zeros(nodes)
+        own_links[key_nodes[own]] = links[own]
+        stay = own_links - resolution * strength * (totals[community] - strength) / two_m
+
+        # best other community of every node, smallest community on ties
+        score = links - resolution * strength[key_nodes] * totals[key_communities] / two_m
+        score[own] = -np.inf
+        order = np.lexsort((key_communities, -score, key_nodes))
+        first = order[np.flatnonzero(np.diff(key_nodes[order], prepend = -1))]
+        candidates = key_nodes[first]
+        gain = score[first] - stay[candidates]
+        improving = gain > TOLERANCE
+        if not improving.any():
+            break
+
+        moving = improving & (rng.random(len(first)) < probability)
+        moved = community.copy()
+        moved[candidates[moving]] = key_communities[first[moving]]
+        moved_quality = modularity_matrix(matrix, moved, resolution)
+        if moved_quality > quality + TOLERANCE:
+            community, quality = moved, moved_quality
+        else:
+            probability /= 2
+            if probability < MIN_PROBABILITY:
+                break
+
+    return community
+
+def refine(matrix, community, resolution, rng):
+    # community of every node after sequential moves of single nodes
+    nodes = matrix.shape[0]
+    strength = strengths(matrix)
+    two_m = strength.sum()
+    if two_m == 0:
+        return community
+
+    indptr, indices, weights = matrix.indptr.tolist(), matrix.indices.tolist(), matrix.data.tolist()
+    totals = np.bincount(community, weights = strength, minlength = nodes).tolist()
+    strength = strength.tolist()
+    community = community.tolist()
+
+    pending = rng.permutation(nodes).tolist()
+    for sweep in range(REFINE_SWEEPS):
+        moved = set()
+        for node in pending:
+            # weight from the node to every neighboring community
+            links = dict()
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbor = indices[edge]
+                if neighbor != node:
+                    links[community[neighbor]] = links.get(community[neighbor], 0) + weights[edge]
+
+            # best community without the node, own community on ties
+            own = community[node]
+            totals[own] -= strength[node]
+            factor = resolution * strength[node] / two_m
+            best, best_score = own, links.get(own, 0) - factor * totals[own]
+            for (other, link) in links.items():
+                if link - factor * totals[other] > best_score + TOLERANCE:
+                    best, best_score = other, link - factor * totals[other]
+            totals[best] += strength[node]
+
+            if best != own:
+                community[node] = best
+                moved.update(indices[indptr[node]:indptr[node + 1]])
+
+        if not moved:
+            break
+        pending = sorted(moved)
+
+    return np.array(community, dtype = np.int64)
+
+def aggregate(matrix, community, count):
+    # community x community matrix of summed weights, internal weights on the diagonal
+    nodes = matrix.shape[0]
+    membership = sparse.csr_matrix((np.ones(nodes), (np.arange(nodes), community)), shape = (nodes, count))
+    return (membership.T @ matrix @ membership).tocsr()
+
+def split_disconnected(graph, community):
+    # connected components of the communities - edges inside communities only
+    inside = community[graph['source']] == community[graph['target']]
+    parts = dict(names = graph['names'], source = graph['source'][inside], target = graph['target'][inside])
+    return metrics.components(parts)
+
+def number_communities(community):
+    # renumber by decreasing size, then by first node
+    labels, first, community, sizes = np.unique(community, return_index = True, return_inverse = True,
+                                                return_counts = True)
+    order = np.lexsort((first, -sizes))
+    rank = np.empty(len(labels), dtype = np.int64)
+    rank[order] = np.arange(len(labels))
+    return rank[community.reshape(-1)]
+
+def louvain(graph, resolution = 1.0, seed = SEED):
+    # community of every node
+    matrix = metrics.adjacency(graph).astype(np.float64)
+    rng = np.random.default_rng(seed)
+    membership = np.arange(matrix.shape[0])
+
+    while matrix.shape[0] > 0:
+        labels, community = np.unique(move_nodes(matrix, resolution, rng), return_inverse = True)
+        if len(labels) == matrix.shape[0]:
+            break
+        membership = community.reshape(-1)[membership]
+        matrix = aggregate(matrix, community.reshape(-1), len(labels))
+
+    membership = refine(metrics.adjacency(graph).astype(np.float64).tocsr(), membership, resolution, rng)
+    return number_communities(split_disconnected(graph, membership))
+
+def detect_communities(graph, resolution = 1.0, seed = SEED):
+    # sets community attribute of the graph nodes
+    graph['attributes']['community'] = louvain(graph, resolution, seed)
+    return graph
+
+def normalized_mutual_information(first, second):
+    # agreement of two node labelings, 1 for identical partitions
+    first = np.unique(first, return_inverse = True)[1].reshape(-1)
+    second = np.unique(second, return_inverse = True)[1].reshape(-1)
+    nodes = len(first)
+    if nodes == 0:
+        return 1.0
+
+    joint = np.unique(first * (second.max() + 1) + second, return_counts = True)[1] / nodes
+    first_p = np.bincount(first) / nodes
+    second_p = np.bincount(second) / nodes
+    entropy = lambda p : -(p * np.log(p)).sum()
+    mutual = entropy(first_p) + entropy(second_p) - entropy(joint)
+    total = entropy(first_p) + entropy(second_p)
+    return 2 * mutual / total if (total > 0) else 1.0
@@ -0,0 +1,117 @@
+import hashlib
+import numpy as np
+from array import array
+
+'''
+Columnar binary format of the cleaned papers dataset.
+
+Dataset is a NumPy .npz archive with integer encoded columns:
+    types       = paper type codes, names in type_names
+    years       = paper years (0 if missing)
+    docs        = document codes, names in doc_names
+    title_keys  = codes of lowercase paper titles, equal for papers with the same title
+    titles      = UTF-8 encoded titles separated by null characters
+    author_ptr  = offsets of paper authors in author_ids - CSR paper -> author incidence
+    author_ids  = author codes, names in author_names
+
+Name tables are stored as null separated UTF-8 strings.
+'''
+
+SEPARATOR = "\0"
+
+def init_dataset():
+    return dict(types = array('i'), years = array('i'), docs = array('i'), title_keys = array('i'),
+                titles = bytearray(), author_ptr = array('q', [0]), author_ids = array('i'),
+                type_codes = dict(), doc_codes = dict(), title_codes = dict(), author_codes = dict())
+
+def encode(codes, value):
+    # get value code, new values get the next free code
+    code = codes.get(value)
+    if code == None:
+        code = codes[value] = len(codes)
+    return code
+
+def parse_year(year):
+    try:
+        return int(float(year))
+    except ValueError:
+        return 0
+
+def add_paper(dataset, line):
+    # line - Type, Year, Title, Authors, Document Name
+    ptype, year, title, authors, docname = line
+
+    dataset['types'].append(encode(dataset['type_codes'], ptype))
+    dataset['years'].append(parse_year(year))
+    dataset['docs'].append(encode(dataset['doc_codes'], docname))
+    dataset['title_keys'].append(encode(dataset['title_codes'], title.lower()))
+
+    if len(dataset['author_ptr']) > 1:
+        dataset['titles'] += SEPARATOR.encode()
+    dataset['titles'] += title.encode()
+
+    # papers without resolved authors have an empty author list, not an author named ""
+    for author in authors.split(", "):
+        if author != "":
+            dataset['author_ids'].append(encode(dataset['author_codes'], author))
+    dataset['author_ptr'].append(len(dataset['author_ids']))
+
+def pack_names(codes):
+    # names ordered by their codes
+    return np.frombuffer(SEPARATOR.join(codes).encode(), dtype = np.uint8)
+
+def unpack_names(data):
+    return data.tobytes().decode().split(SEPARATOR)
+
+def save_dataset(dataset, path):
+    with open(path, "wb") as file:
+        np.savez(file,
+                 types = np.frombuffer(dataset['types'], dtype = np.int32),
+                 years = np.frombuffer(dataset['years'], dtype = np.int32),
+                 docs = np.frombuffer(dataset['docs'], dtype = np.int32),
+                 title_keys = np.frombuffer(dataset['title_keys'], dtype = np.int32),
+                 titles = np.frombuffer(bytes(dataset['titles']), dtype = np.uint8),
+                 author_ptr = np.frombuffer(dataset['author_ptr'], dtype = np.int64),
+                 author_ids = np.frombuffer(dataset['author_ids'], dtype = np.int32),
+                 type_names = pack_names(dataset['type_codes']),
+                 doc_names = pack_names(dataset['doc_codes']),
+                 author_names = pack_names(dataset['author_codes']))
+
+def load_dataset(path):
+    with np.load(path) as data:
+        dataset = {key : data[key] for key in data.files}
+
+    for key in ("type_names", "doc_names", "author_names"):
+        dataset[key] = unpack_names(dataset[key])
+
+    dataset['papers'] = len(dataset['types'])
+    return dataset
+
+def paper_titles(dataset):
+    # titles are decoded only when needed
+    return unpack_names(dataset['titles']) if dataset['papers'] > 0 else []
+
+def paper_authors(dataset):
+    # author name lists of all papers
+    names = dataset['author_names']
+    ids = dataset['author_ids'].tolist()
+    ptr = dataset['author_ptr'].tolist()
+
+    for paper in range(dataset['papers']):
+        yield [names[author] for author in ids[ptr[paper]:ptr[paper + 1]]]
+
+def prefix_digest(dataset, papers):
+    # digest of the first papers, unchanged while new papers are only appended to the dataset
+    digest = hashlib.sha256()
+    end = dataset['author_ptr'][papers]
+    for (key, count) in (("types", papers), ("years", papers), ("docs", papers), ("title_keys", papers),
+                         ("author_ptr", papers + 1), ("author_ids", end)):
+        digest.update(dataset[key][:count].tobytes())
+
+    # codes are given in order of first appearance, so the first papers use a prefix of every name table
+    for (key, codes) in (("type_names", "types"), ("doc_names", "docs"), ("author_names", "author_ids")):
+        used = dataset[codes][:(end if (codes == "author_ids") else papers)]
+        used = int(used.max()) + 1 if len(used) > 0 else 0
+        digest.update(SEPARATOR.join(dataset[key][:used]).encode())
+
+    return digest.hexdigest()
@@ -0,0 +1,63 @@
+import math
+from collections import Counter
+from difflib import SequenceMatcher
+
+'''
+Blocking index for fuzzy string matching.
+
+Every key is split into character n-grams and indexed in n-gram buckets.
+A query is compared only with the keys that share the most n-grams with it
+instead of with every indexed key.
+'''
+
+NGRAM_SIZE = 3 # number of characters in n-gram
+MIN_SHARED = 2 # minimum number of n-grams candidate must share with the query
+
+def ngrams(text, size = NGRAM_SIZE):
+    # padded n-grams - "ana" -> {"  a", " an", "ana", "na ", "a  "}
+    text = " " * (size - 1) + text + " " * (size - 1)
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+def build_index(keys):
+    # n-gram -> list of key ids containing it
+    index = dict()
+    for (key_id, key) in enumerate(keys):
+        for gram in ngrams(key):
+            index.setdefault(gram, []).append(key_id)
+
+    return index
+
+def candidates(index, text, limit):
+    # count shared n-grams for every key in the query n-gram buckets
+    shared = Counter()
+    for gram in ngrams(text):
+        shared.update(index.get(gram, ()))
+
+    return [key_id for (key_id, count) in shared.most_common(limit) if count >= MIN_SHARED]
+
+def similarity(first, second):
+    return SequenceMatcher(None, first, second).ratio()
+
+def substitution(letter, other, substitutes):
+    if letter == other:
+        return 0
+    if substitutes == None or (letter + other) in substitutes:
+        return 1
+    return math.inf
+
+def edit_distance(first, second, indel = 1, substitutes = None):
+    # optimal string alignment (Damerau) distance - substitutions and transpositions
+    # of adjacent characters cost 1, insertions and deletions cost indel,
+    # if substitutes are given (set of "ab" character pairs) only these letters can be substituted
+    before = None
+    previous = [j * indel for j in range(len(second) + 1)]
+    for i in range(1, len(first) + 1):
+        current = [i * indel] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            current[j] = min(previous[j] + indel, current[j - 1] + indel,
+                             previous[j - 1] + substitution(first[i - 1], second[j - 1], substitutes))
+            if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        before, previous = previous, current
+
+    return previous[-1]
@@ -0,0 +1,182 @@
+import argparse
+import random
+import xlsxwriter
+from pathlib import Path
+
+FILE_DIR = Path(__file__).parent
+
+'''
+Synthetic dataset generator.
+
+Generates author and Scopus paper workbooks in the same column layout as
+UB_cs_authors.xlsx and UB_cs_papers_scopus.xlsx. Generation is seeded, so the
+same arguments always produce the same dataset.
+
+Generated papers can be controlled with:
+    authors_mean = mean number of authors per paper (geometric distribution)
+    authors_max = maximum number of authors per paper
+    ub_share = share of UB employees among paper authors
+    name_formats = weights of author name formats in the authors column
+    diacritics = probability of writing a name with diacritical marks
+    duplicates = probability of a duplicate paper entry
+'''
+
+# faculty -> department labels, as in UB_cs_authors.xlsx
+FACULTIES = {
+    "matematicki fakultet" : ["katedra za racunarstvo i informatiku"],
+    "elektrotehnicki fakultet" : ["katedra za racunarsku tehniku i informatiku"],
+    "fakultet organizacionih nauka" : ["Katedra za informacione sisteme",
+                                       "Katedra za softversko inzenjerstvo",
+                                       "Katedra za informacione tehnologije"]
+}
+
+AUTHORS_HEADER = ["Ime", "Prezime", "Srednje ime", "Odsek", "Fakultet"]
+PAPERS_HEADER = ["UB zaposleni", "Naslov", "Godina", "Autori", "Broj citiranja", "Tip rada",
+                 "Cite factor 2017", "SJIR", "SNIP", "Ime dokumenta"]
+
+# paper types with weights, last types are skipped by the cleaner
+PAPER_TYPES = {"Article" : 40, "Conference Paper" : 45, "Article in Press" : 3, "Review" : 3,
+               "Book Chapter" : 4, "Editorial" : 2, "Letter" : 1, "Erratum" : 1, "Note" : 1}
+
+# name format -> weight, format arguments: {0} first name, {1} first letter of name, {2} last name, {3} middle name
+NAME_FORMATS = {
+    "{2}, {1}." : 70,     # Lastname, N.
+    "{2}, {1}.{3}." : 15, # Lastname, N.M.
+    "{2}, {0}" : 10,      # Lastname, Name
+    "{2}, {0} {3}." : 5   # Lastname, Name M.
+}
+
+# name syllables, diacritics are added separately
+NAME_PARTS = ["mi", "lo", "dra", "ga", "na", "ve", "sna", "jo", "va", "ni", "ko", "la", "ra", "de", "ja",
+              "ma", "ri", "sa", "to", "bo", "ne", "zo", "da", "ce", "je", "li", "ka", "po", "vi", "sta"]
+LASTNAME_SUFFIXES = ["vic", "kovic", "jevic", "ic", "ski", "ovic", "enovic"]
+DIACRITICS = {"c" : "čć", "s" : "š", "z" : "ž", "dj" : "đ"}
+
+TITLE_WORDS = ["analysis", "network", "model", "learning", "system", "parallel", "graph", "data", "approach",
+               "evaluation", "software", "algorithm", "distributed", "semantic", "automated", "verification",
+               "performance", "architecture", "framework", "optimization", "mining", "security", "web"]
+
+def random_name(rng, parts):
+    return "".join(rng.choice(NAME_PARTS) for _ in range(parts)).title()
+
+def generate_authors(rng, count):
+    authors = []
+    used = set()
+    departments = [(faculty, department) for (faculty, departments) in FACULTIES.items()
+                                         for department in departments]
+
+    while len(authors) < count:
+        name = random_name(rng, rng.randint(2, 3))
+        lastname = random_name(rng, rng.randint(1, 2)) + rng.choice(LASTNAME_SUFFIXES)
+        if (name, lastname) in used:
+            continue
+        used.add((name, lastname))
+
+        middlename = random_name(rng, 1)[0] if (rng.random() < 0.3) else ""
+        faculty, department = rng.choice(departments)
+        authors.append([name, lastname, middlename, department, faculty])
+
+    return authors
+
+def add_diacritics(rng, name):
+    for (letter, marks) in DIACRITICS.items():
+        name = name.replace(letter, rng.choice(marks))
+    return name
+
+def format_author(rng, author, formats, weights, diacritics):
+    name, lastname, middlename = author[0], author[1], author[2] or random_name(rng, 1)[0]
+    format = rng.choices(formats, weights)[0]
+    fullname = format.format(name, name[0], lastname, middlename)
+
+    if rng.random() < diacritics:
+        fullname = add_diacritics(rng, fullname)
+    return fullname
+
+def write_authors(path, authors):
+    wb = xlsxwriter.Workbook(path, {'constant_memory' : True})
+
+    # one worksheet per faculty
+    for faculty in FACULTIES:
+        sheet = wb.add_worksheet(faculty)
+        sheet.write_row(0, 0, AUTHORS_HEADER)
+        row = 1
+        for author in authors:
+            if author[4] == faculty:
+                sheet.write_row(row, 0, author)
+                row += 1
+
+    wb.close()
+
+def write_papers(path, rng, authors, papers, authors_mean = 4, authors_max = 50, ub_share = 0.4,
+                 name_formats = NAME_FORMATS, diacritics = 0.5, duplicates = 0.05):
+    wb = xlsxwriter.Workbook(path, {'constant_memory' : True})
+    sheet = wb.add_worksheet("Radovi")
+    sheet.write_row(0, 0, PAPERS_HEADER)
+
+    types = list(PAPER_TYPES)
+    type_weights = list(PAPER_TYPES.values())
+    formats = list(name_formats)
+    format_weights = list(name_formats.values())
+    documents = ["Journal of " + " ".join(rng.sample(TITLE_WORDS, 2)).title() + " " + str(i)
+                 for i in range(max(1, papers // 20))]
+    externals = generate_authors(rng, max(10, len(authors) * 5))
+
+    previous = None
+    for row in range(1, papers + 1):
+        # duplicate entry of the previous paper listed for another UB author
+        if previous != None and rng.random() < duplicates:
+            sheet.write_row(row, 0, previous)
+            continue
+
+        # number of authors from geometric distribution with given mean
+        count = 1
+        while count < authors_max and rng.random() > 1 / authors_mean:
+            count += 1
+
+        paper_authors = [rng.choice(authors) if (rng.random() < ub_share) else rng.choice(externals)
+                         for _ in range(count)]
+        main_author = rng.choice(authors)
+        paper_authors[rng.randrange(count)] = main_author
+
+        line = ["{0} {1}".format(main_author[1], main_author[0]),                      # UB zaposleni
+                " ".join(rng.choices(TITLE_WORDS, k = rng.randint(4, 10))).capitalize(), # Naslov
+                str(rng.randint(1990, 2020)),                                          # Godina
+                " and ".join(format_author(rng, author, formats, format_weights, diacritics)
+                             for author in paper_authors),                             # Autori
+                str(rng.randint(0, 100)),                                              # Broj citiranja
+                rng.choices(types, type_weights)[0],                                   # Tip rada
+                "N/A", "N/A", "N/A",                                                   # Indicators
+                rng.choice(documents)]                                                 # Ime dokumenta
+
+        sheet.write_row(row, 0, line)
+        previous = line
+
+    wb.close()
+
+def generate(directory, papers, authors = None, seed = 0, **options):
+    # authors scale with papers, bundled dataset has about 10 papers per author
+    authors = authors or max(20, papers // 10)
+    rng = random.Random(seed)
+    directory.mkdir(parents = True, exist_ok = True)
+
+    author_list = generate_authors(rng, authors)
+    write_authors(directory/"UB_cs_authors.xlsx", author_list)
+    write_papers(directory/"UB_cs_papers_scopus.xlsx", rng, author_list, papers, **options)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Generates synthetic author and Scopus paper workbooks.")
+    parser.add_argument("directory", type = Path, help = "output directory")
+    parser.add_argument("-p", "--papers", type = int, default = 10000, help = "number of papers (default: %(default)s)")
+    parser.add_argument("-a", "--authors", type = int, help = "number of UB authors (default: papers / 10)")
+    parser.add_argument("-s", "--seed", type = int, default = 0, help = "random seed (default: %(default)s)")
+    parser.add_argument("--authors-mean", type = float, default = 4,
+                        help = "mean number of authors per paper (default: %(default)s)")
+    parser.add_argument("--authors-max", type = int, default = 50,
+                        help = "maximum number of authors per paper (default: %(default)s)")
+    parser.add_argument("--diacritics", type = float, default = 0.5,
+                        help = "probability of names with diacritical marks (default: %(default)s)")
+    args = parser.parse_args()
+
+    generate(args.directory, args.papers, args.authors, args.seed, authors_mean = args.authors_mean,
+             authors_max = args.authors_max, diacritics = args.diacritics)
+    print("Synthetic dataset written to: " + str(args.directory))
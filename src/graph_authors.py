@@ -1,16 +1,39 @@
-import networkx as nx
-import xlrd
+import argparse
+import json
+import numpy as np
+import pickle
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import arraygraph
+import community
+import dataset
+import instrument
+import layout
+import loader
+
 FILE_DIR = Path(__file__).parent
 
 EXCEL_AUTHORS = (FILE_DIR/"../data/UB_cs_authors.xlsx").resolve()
-EXCEL_PAPERS = (FILE_DIR/"../data/UB_cs_papers_cleaned.xlsx").resolve()
+DATASET_PAPERS = (FILE_DIR/"../data/UB_cs_papers_cleaned.npz").resolve()
+
+# binary graphs read by the analysis stages
+GRAPH_STORE = (FILE_DIR/"../results/authors_graph.npz").resolve()
+STATE_OUTPUT = (FILE_DIR/"../results/authors_graph.state").resolve() # papers already in the binary graph
+SUBGRAPH_STORE = (FILE_DIR/"../results/authors_graph_{0}.npz").resolve()
+HYPERGRAPH_STORE = (FILE_DIR/"../results/authors_hypergraph.npz").resolve()
+SNAPSHOT_STORE = (FILE_DIR/"../results/authors_snapshot_{0}.npz").resolve()
 
+# GEXF graphs for Gephi
 GRAPH_OUTPUT = (FILE_DIR/"../results/authors_graph.gexf").resolve()
-ETF_OUTPUT = (FILE_DIR/"../results/authors_graph_etf.gexf").resolve()
-MATF_OUTPUT = (FILE_DIR/"../results/authors_graph_matf.gexf").resolve()
-FON_OUTPUT = (FILE_DIR/"../results/authors_graph_fon.gexf").resolve()
+SUBGRAPH_OUTPUT = (FILE_DIR/"../results/authors_graph_{0}.gexf").resolve()
+HYPERGRAPH_OUTPUT = (FILE_DIR/"../results/authors_hypergraph.gexf").resolve()
+SNAPSHOT_OUTPUT = (FILE_DIR/"../results/authors_snapshot_{0}.gexf").resolve()
+
+# images of laid out graphs
+GRAPH_IMAGE = (FILE_DIR/"../results/authors_graph.png").resolve()
+SUBGRAPH_IMAGE = (FILE_DIR/"../results/authors_graph_{0}.png").resolve()
+SNAPSHOT_IMAGE = (FILE_DIR/"../results/authors_snapshot_{0}.png").resolve()
 
 '''
 Coauthorship network graph information:
@@ -19,12 +42,15 @@ Nodes - specific authors.
 Attributes:
     count = number of papers author published
     module = author's faculty and department label
+    community = community found by modularity optimization, computed separately for every written graph
 
 Edges - at least one co-authored scientific paper
 Attributes:
     weight = number of scientific papers written together
 '''
-author_graph = None
+author_arrays = None # author graph in array form, node ids are author ids
+resolution = 1.0 # community detection resolution, higher values give smaller communities
+layout_iterations = None # ForceAtlas2 iterations of graph layouts, graphs are not laid out if None
 
 faculty_departments = {
     "matematicki fakultet" : {
@@ -40,91 +66,380 @@ faculty_departments = {
     }
 }
 
+# subgraph groupings - group name -> set of modules, subgraph files are named by the lowercase group name
+FACULTY_GROUPS = {
+    "ETF" : {"ETF_RTI"},
+    "MATF" : {"MATF_RTI"},
+    "FON" : {"FON_IT", "FON_IS", "FON_SI"}
+}
+DEPARTMENT_GROUPS = {module : {module} for departments in faculty_departments.values()
+                                       for module in departments.values()}
+GROUPINGS = {"faculty" : FACULTY_GROUPS, "department" : DEPARTMENT_GROUPS}
+
 def init_nodes():
-    global author_graph
-    wb = xlrd.open_workbook(EXCEL_AUTHORS, on_demand = True)
+    global author_arrays
+    author_arrays = author_nodes()
+
+def author_nodes():
+    # graph without edges with all authors from excel file
+    names = []
+    modules = []
+    node_index = dict()
 
     # initialize author graph nodes from excel file
-    for sheet in wb.sheets():
-        for row in range(1, sheet.nrows):
-            name = sheet.cell_value(row, 0).title()
-            lastname = sheet.cell_value(row, 1).title()
-            author = name + " " + lastname
+    for (name, lastname, middlename, department, faculty) in loader.load_authors(EXCEL_AUTHORS):
+        author = name.title() + " " + lastname.title()
+        module = faculty_departments[faculty][department]
+
+        if author in node_index:
+            modules[node_index[author]] = module
+            continue
+
+        node_index[author] = len(names)
+        names.append(author)
+        modules.append(module)
+
+    return arraygraph.init_graph(names, dict(count = [0] * len(names), module = modules))
+
+def map_authors(graph, papers):
+    # graph node id of every dataset paper author, authors not in the graph are added as new nodes
+    names = graph['names']
+    modules = graph['attributes']['module']
+    node_index = {name : node for (node, name) in enumerate(names)}
 
-            faculty = sheet.cell_value(row, 4)
-            department = sheet.cell_value(row, 3)
-            module = faculty_departments[faculty][department]
+    for name in papers['author_names']:
+        if name not in node_index:
+            node_index[name] = len(names)
+            names.append(name)
+            modules.append(None)
+    author_nodes = np.array([node_index[name] for name in papers['author_names']], dtype = np.int64)
+    return author_nodes[papers['author_ids']]
 
-            author_graph.add_node(author)
-            author_graph.nodes[author]['count'] = 0
-            author_graph.nodes[author]['module'] = module
+def paper_rows(papers, start = 0):
+    # Check duplicate papers - rows of papers from start that are the first paper with their title,
+    # title codes are given in order of first appearance so earlier titles have lower codes
+    title_keys = papers['title_keys']
+    titles = int(title_keys[:start].max()) + 1 if (start > 0) else 0
+    keys, first = np.unique(title_keys[start:], return_index = True)
+    return np.sort(first[keys >= titles]) + start
 
-    wb.release_resources()
-    del wb
+def paper_counts(papers, authors, rows, nodes):
+    # number of papers of every node in the given rows
+    selected = np.zeros(papers['papers'], dtype = bool)
+    selected[rows] = True
+    selected = np.repeat(selected, np.diff(papers['author_ptr']))
+    return np.bincount(authors[selected], minlength = nodes)
 
-def init_edges(authors):
-    global author_graph
-    authors = authors.split(", ")
+def init_edges(papers, start = 0):
+    # add papers from start to the graph
+    global author_arrays
+    authors = map_authors(author_arrays, papers)
+    rows = paper_rows(papers, start)
+    instrument.count("papers_added", len(rows))
+    instrument.count("duplicates_skipped", papers['papers'] - start - len(rows))
 
     # add/update an edge for each pair of authors
-    for i in range(0, len(authors)):
-        for j in range(i + 1, len(authors)):
-            if author_graph.has_edge(authors[i], authors[j]):
-                author_graph[authors[i]][authors[j]]['weight'] += 1 # update existing edge weight
-            else:
-                author_graph.add_edge(authors[i], authors[j], weight = 1) # add new edge
+    first, second = arraygraph.incidence_pairs(papers['author_ptr'], authors, rows)
+    edges = len(author_arrays['source'])
+    arraygraph.add_pairs(author_arrays, first, second)
+    instrument.count("author_pairs", len(first))
+    instrument.count("edges_created", len(author_arrays['source']) - edges)
+
+    # update author paper counts
+    counts = np.zeros(len(author_arrays['names']), dtype = np.int64)
+    counts[:len(author_arrays['attributes']['count'])] = author_arrays['attributes']['count']
+    author_arrays['attributes']['count'] = counts + paper_counts(papers, authors, rows, len(counts))
+
+def graph_state(papers):
+    # graph can be updated while the authors and the already added papers are unchanged
+    return dict(authors = loader.file_hash(EXCEL_AUTHORS), papers = papers['papers'],
+                digest = dataset.prefix_digest(papers, papers['papers']))
+
+def load_state(papers):
+    if not (STATE_OUTPUT.exists() and GRAPH_STORE.exists()):
+        print("No previous authors graph, generating whole graph")
+        return None
 
-        # update author paper count
-        author_graph.nodes[authors[i]]['count'] += 1
+    with open(STATE_OUTPUT, "rb") as file:
+        state = pickle.load(file)
 
-def create_graph():
-    global author_graph
-    author_graph = nx.Graph()
-    paper_set = set()
+    if state['authors'] != loader.file_hash(EXCEL_AUTHORS):
+        print("Authors changed, generating whole graph")
+        return None
+    if state['papers'] > papers['papers'] or state['digest'] != dataset.prefix_digest(papers, state['papers']):
+        print("Cleaned papers changed, generating whole graph")
+        return None
 
+    return state
+
+def layout_graph(graph, image):
+    # node positions and image with nodes sized by paper count and colored by module
+    if layout_iterations == None:
+        graph.pop('positions', None) # positions of previous nodes
+        return []
+
+    graph['positions'] = layout.forceatlas2(graph, layout_iterations)
+    layout.render(graph, graph['positions'], image, graph['attributes']['count'], graph['attributes']['module'])
+    return [image]
+
+def save_graph(papers, gexf):
+    community.detect_communities(author_arrays, resolution)
+    for path in layout_graph(author_arrays, GRAPH_IMAGE):
+        print("Authors graph image written to: " + str(path))
+    arraygraph.save_graph(author_arrays, GRAPH_STORE)
+    print("Authors graph written to: " + str(GRAPH_STORE))
+
+    with open(STATE_OUTPUT, "wb") as file:
+        pickle.dump(graph_state(papers), file)
+
+    if gexf:
+        arraygraph.write_gexf(author_arrays, GRAPH_OUTPUT)
+        print("Authors graph written to: " + str(GRAPH_OUTPUT))
+
+@instrument.stage("create_graph")
+def create_graph(gexf = True):
     print("Initializing authors graph nodes: " + str(EXCEL_AUTHORS))
     init_nodes()
 
-    wb = xlrd.open_workbook(EXCEL_PAPERS, on_demand = True)
-    sheet = wb.sheet_by_index(0)
+    papers = loader.load_dataset(DATASET_PAPERS)
+
+    print("Initializing authors graph edges: " + str(DATASET_PAPERS))
+    init_edges(papers)
+    print("Authors graph generated.")
 
-    print("Initializing authors graph edges: " + str(EXCEL_PAPERS))
-    for row in range(1, sheet.nrows):
-        line = [sheet.cell_value(row, 0), # Type
-                sheet.cell_value(row, 1), # Year
-                sheet.cell_value(row, 2), # Title
-                sheet.cell_value(row, 3), # Authors
-                sheet.cell_value(row, 4)] # Document Name
+    save_graph(papers, gexf)
 
-        # Check duplicate papers
-        if line[2].lower() in paper_set:
-            continue
+@instrument.stage("update_graph")
+def update_graph(gexf = True):
+    # add only papers cleaned since the graph was generated, the result equals a whole new graph
+    global author_arrays
+    papers = loader.load_dataset(DATASET_PAPERS)
+    state = load_state(papers)
+    if state == None:
+        create_graph(gexf)
+        return
+
+    print("Reading authors graph: " + str(GRAPH_STORE))
+    author_arrays = arraygraph.load_graph(GRAPH_STORE)
+
+    print("Adding {0} new papers: {1}".format(papers['papers'] - state['papers'], DATASET_PAPERS))
+    init_edges(papers, state['papers'])
+    print("Authors graph updated.")
+
+    save_graph(papers, gexf)
+
+def read_groups(grouping):
+    # built-in grouping name or JSON file with group name -> list of modules
+    if grouping in GROUPINGS:
+        return GROUPINGS[grouping]
+
+    with open(grouping, encoding = "utf-8") as file:
+        return {name : set(modules) for (name, modules) in json.load(file).items()}
+
+def group_layers(groups):
+    # split groups to layers of groups with disjoint modules, every layer is partitioned in one pass
+    layers = []
+    for (name, modules) in groups.items():
+        for layer in layers:
+            if not any(modules & other for other in layer.values()):
+                layer[name] = modules
+                break
         else:
-            paper_set.add(line[2].lower())
+            layers.append({name : modules})
 
-        init_edges(line[3])
-    print("Authors graph generated.")
+    return layers
+
+def output_path(template, name):
+    return Path(str(template).format(name))
+
+def write_graph(graph, store, output = None, image = None):
+    # returns written files
+    community.detect_communities(graph, resolution)
+    images = layout_graph(graph, image)
+    arraygraph.save_graph(graph, store)
+    if output == None:
+        return images + [store]
+
+    arraygraph.write_gexf(graph, output)
+    return images + [store, output]
+
+@instrument.stage("create_subgraphs")
+def create_subgraphs(groups = FACULTY_GROUPS, gexf = True, workers = None):
+    # module index - module code of every node
+    module_codes = dict()
+    node_modules = np.array([module_codes.setdefault(module, len(module_codes))
+                             for module in author_arrays['attributes']['module']], dtype = np.int64)
+
+    with ThreadPoolExecutor(workers) as pool:
+        writes = []
+        for layer in group_layers(groups):
+            print("\nGenerating authors subgraphs: " + ", ".join(layer))
 
-    nx.write_gexf(author_graph, GRAPH_OUTPUT, prettyprint = True)
-    print("Authors graph written to: " + str(GRAPH_OUTPUT))
+            # group of every module, then of every node
+            module_groups = np.full(len(module_codes), -1, dtype = np.int64)
+            for (group, modules) in enumerate(layer.values()):
+                for module in modules:
+                    if module in module_codes:
+                        module_groups[module_codes[module]] = group
 
-    wb.release_resources()
-    del wb
+            subgraphs = arraygraph.partition(author_arrays, module_groups[node_modules], len(layer))
+            instrument.count("subgraphs", len(subgraphs))
+            instrument.count("subgraph_edges", sum(len(subgraph['source']) for subgraph in subgraphs))
+            for (name, subgraph) in zip(layer, subgraphs):
+                store = output_path(SUBGRAPH_STORE, name.lower())
+                output = output_path(SUBGRAPH_OUTPUT, name.lower()) if gexf else None
+                image = output_path(SUBGRAPH_IMAGE, name.lower())
+                writes.append((name, pool.submit(write_graph, subgraph, store, output, image)))
 
-def create_subgraphs():
-    global author_graph
+        # outputs are written concurrently, errors are raised here
+        for (name, write) in writes:
+            for path in write.result():
+                print(name + " authors subgraph writen to: " + str(path))
 
-    faculties = ["ETF", "MATF", "FON"]
-    modules = [{"ETF_RTI"}, {"MATF_RTI"}, {"FON_IT", "FON_IS", "FON_SI"}]
-    outputs = [ETF_OUTPUT, MATF_OUTPUT, FON_OUTPUT]
+'''
+Hypergraph - papers are kept as hyperedges of their authors instead of all author pairs,
+so memory and build time are proportional to paper authors. Pair weights are derived on demand
+with the count or Newman weighting scheme, papers with more than cap authors add no pair weights.
+GEXF of the author pairs is written only with gexf - it projects every paper with k authors
+to k * (k - 1) / 2 pairs, which the hypergraph is meant to avoid.
+'''
+@instrument.stage("create_hypergraph")
+def create_hypergraph(weighting = "count", cap = None, gexf = False):
+    papers = loader.load_dataset(DATASET_PAPERS)
+    print("Initializing authors hypergraph: " + str(DATASET_PAPERS))
+    graph = author_nodes()
+    authors = map_authors(graph, papers)
+    rows = paper_rows(papers)
+
+    arraygraph.init_hyperedges(graph, papers['author_ptr'], authors, rows, weighting, cap)
+    graph['attributes']['count'] = paper_counts(papers, authors, rows, len(graph['names']))
+    print("Authors hypergraph generated: {0} papers, {1} paper authors".format(len(rows),
+                                                                              len(graph['hyperedge_nodes'])))
+
+    arraygraph.save_graph(graph, HYPERGRAPH_STORE)
+    print("Authors hypergraph written to: " + str(HYPERGRAPH_STORE))
+
+    # GEXF needs author pairs, quadratic in the number of authors of a paper
+    if gexf:
+        arraygraph.project_hyperedges(graph)
+        arraygraph.write_gexf(graph, HYPERGRAPH_OUTPUT)
+        print("Authors hypergraph pairs written to: " + str(HYPERGRAPH_OUTPUT))
+
+'''
+Temporal snapshots - graph of papers published until every year (cumulative) or in the last window years.
+Every snapshot is derived from the previous one by adding the papers of its year and, for windows,
+retracting the papers of the year that left the window. Papers without a year are not in snapshots.
+
+Snapshots contain authors with papers in the snapshot. Additional attributes:
+    first_year = year of the author's first paper (nodes) or of the first co-authored paper (edges)
+'''
+@instrument.stage("create_snapshots")
+def create_snapshots(window = None, gexf = True, workers = None):
+    papers = loader.load_dataset(DATASET_PAPERS)
+    print("\nInitializing authors graph snapshots: " + str(DATASET_PAPERS))
+    graph = author_nodes()
+    authors = map_authors(graph, papers)
+    nodes = len(graph['names'])
+    ptr = papers['author_ptr']
+
+    # papers with years ordered by year
+    rows = paper_rows(papers)
+    rows = rows[papers['years'][rows] > 0]
+    rows = rows[np.argsort(papers['years'][rows], kind = "stable")]
+    years = papers['years'][rows]
+    if len(rows) == 0:
+        print("No papers with years, no snapshots generated")
+        return
+
+    counts = np.zeros(nodes, dtype = np.int64)
+    node_years = np.zeros(nodes, dtype = np.int64)
+    edge_codes = np.zeros(0, dtype = np.int64) # all edges added so far, sorted
+    edge_years = np.zeros(0, dtype = np.int64)
+
+    with ThreadPoolExecutor(workers) as pool:
+        writes = []
+        for year in range(int(years[0]), int(years[-1]) + 1):
+            # add papers of the year
+            added = rows[np.searchsorted(years, year):np.searchsorted(years, year, side = "right")]
+            first, second = arraygraph.incidence_pairs(ptr, authors, added)
+            arraygraph.add_pairs(graph, first, second)
+            counts += paper_counts(papers, authors, added, nodes)
+            node_years[(node_years == 0) & (counts > 0)] = year
+
+            # first year of new edges
+            codes = np.unique(arraygraph.pair_codes(first, second, nodes))
+            codes = codes[~np.isin(codes, edge_codes, assume_unique = True)]
+            edge_codes = np.concatenate([edge_codes, codes])
+            edge_years = np.concatenate([edge_years, np.full(len(codes), year, dtype = np.int64)])
+            order = np.argsort(edge_codes, kind = "stable")
+            edge_codes, edge_years = edge_codes[order], edge_years[order]
+
+            # retract papers of the year that left the window
+            if window != None:
+                retracted = rows[np.searchsorted(years, year - window):
+                                 np.searchsorted(years, year - window, side = "right")]
+                first, second = arraygraph.incidence_pairs(ptr, authors, retracted)
+                arraygraph.add_edges(graph, first, second, -np.ones(len(first), dtype = np.int64))
+                counts -= paper_counts(papers, authors, retracted, nodes)
+
+            # snapshot of authors with papers in the snapshot
+            graph['attributes']['count'] = counts
+            graph['attributes']['first_year'] = node_years
+            codes = arraygraph.pair_codes(graph['source'], graph['target'], nodes)
+            graph['edge_attributes']['first_year'] = edge_years[np.searchsorted(edge_codes, codes)]
+            snapshot = arraygraph.subgraph(graph, np.flatnonzero(counts > 0))
+
+            store = output_path(SNAPSHOT_STORE, year)
+            output = output_path(SNAPSHOT_OUTPUT, year) if gexf else None
+            image = output_path(SNAPSHOT_IMAGE, year)
+            writes.append((year, pool.submit(write_graph, snapshot, store, output, image)))
+
+        for (year, write) in writes:
+            for path in write.result():
+                print("Authors graph snapshot {0} written to: {1}".format(year, path))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Generates coauthorship network graphs.")
+    parser.add_argument("--no-gexf", action = "store_true", help = "write only binary graphs, skip GEXF export")
+    parser.add_argument("-g", "--groups", default = "faculty",
+                        help = "subgraph grouping: faculty, department or JSON file with group name -> "
+                               "list of modules (default: %(default)s)")
+    parser.add_argument("-w", "--workers", type = int, help = "number of concurrent subgraph writers")
+    parser.add_argument("-i", "--incremental", action = "store_true",
+                        help = "add only papers cleaned since the last run to the existing graph")
+    parser.add_argument("-t", "--temporal", action = "store_true",
+                        help = "also write cumulative graph snapshots for every year")
+    parser.add_argument("--window", type = int, metavar = "YEARS",
+                        help = "snapshots of papers in the last YEARS years instead of cumulative ones")
+    parser.add_argument("-H", "--hypergraph", action = "store_true",
+                        help = "write only the hypergraph of papers and their authors instead of author pairs")
+    parser.add_argument("--weighting", choices = list(arraygraph.WEIGHTINGS), default = "count",
+                        help = "hypergraph pair weighting scheme (default: %(default)s)")
+    parser.add_argument("--cap", type = int, help = "papers with more authors add no hypergraph pair weights")
+    parser.add_argument("--pairs-gexf", action = "store_true",
+                        help = "write GEXF of the hypergraph author pairs, k^2 pairs for a paper with k authors")
+    parser.add_argument("-r", "--resolution", type = float, default = resolution,
+                        help = "community detection resolution (default: %(default)s)")
+    parser.add_argument("-l", "--layout", action = "store_true",
+                        help = "lay out graphs with ForceAtlas2, write node positions and PNG images")
+    parser.add_argument("--iterations", type = int, default = layout.ITERATIONS,
+                        help = "layout iterations (default: %(default)s)")
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+    resolution = args.resolution
+    layout_iterations = args.iterations if args.layout else None
+    instrument.start(args.metrics, args.profile)
+
+    if args.hypergraph:
+        create_hypergraph(args.weighting, args.cap, args.pairs_gexf)
+    else:
+        if args.incremental:
+            update_graph(not args.no_gexf)
+        else:
+            create_graph(not args.no_gexf)
+        create_subgraphs(read_groups(args.groups), not args.no_gexf, args.workers)
 
-    for i in range(len(faculties)):
-        print("\nGenerating " + faculties[i] + " authors subgraph")
-        nodes = [node for (node, attr) in author_graph.nodes(data = True)
-                                       if attr['module'] in modules[i]]
-        subgraph = author_graph.subgraph(nodes)
-        nx.write_gexf(subgraph, outputs[i], prettyprint = True)
-        print(faculties[i] + " authors subgraph writen to: " + str(outputs[i]))
+        if args.temporal or args.window:
+            create_snapshots(args.window, not args.no_gexf, args.workers)
 
-create_graph()
-create_subgraphs()
+    instrument.finish(args.metrics, args.profile)
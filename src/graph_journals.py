@@ -1,13 +1,25 @@
-import networkx as nx
-import xlrd
+import argparse
+import numpy as np
+import pickle
 from pathlib import Path
 
+import arraygraph
+import community
+import dataset
+import instrument
+import layout
+import loader
+
 FILE_DIR = Path(__file__).parent
 
 EXCEL_AUTHORS = (FILE_DIR/"../data/UB_cs_authors.xlsx").resolve()
-EXCEL_PAPERS = (FILE_DIR/"../data/UB_cs_papers_cleaned.xlsx").resolve()
+DATASET_PAPERS = (FILE_DIR/"../data/UB_cs_papers_cleaned.npz").resolve()
 
+GRAPH_STORE = (FILE_DIR/"../results/journals_graph.npz").resolve()
+STATE_OUTPUT = (FILE_DIR/"../results/journals_graph.state").resolve() # papers and incidence of the binary graph
 GRAPH_OUTPUT = (FILE_DIR/"../results/journals_graph.gexf").resolve()
+AUTHORS_OUTPUT = (FILE_DIR/"../results/journal_authors_graph.gexf").resolve()
+GRAPH_IMAGE = (FILE_DIR/"../results/journals_graph.png").resolve()
 
 PAPER_TYPES = {"Article", "Article in Press"}
 
@@ -17,88 +29,212 @@ Journals network graph information:
 Nodes - specific journals.
 Attributes:
     count = number of papers published in the journal
+    community = community found by modularity optimization
 
 Edges - at least one author that published in both journals.
 Attributes:
     weight = number of authors that published in both journals
+
+Graph is the journal x journal projection of the sparse journal x author incidence matrix.
+On request the author x author projection is written too - authors linked by the number of journals they both published in.
 '''
-journal_graph = None
+journal_arrays = None # journals graph in array form
+resolution = 1.0 # community detection resolution, higher values give smaller communities
+layout_iterations = None # ForceAtlas2 iterations of the graph layout, graph is not laid out if None
 
-database = dict() # authors with lists of journals in which they published
+database = dict() # author ids
+journals = [] # journal names, journal ids are their list indexes
+incidence = None # journal x author sparse matrix, nonzero if author published in journal
+delta = None # incidence entries of the added papers
 
 def init_database():
     global database
-    wb = xlrd.open_workbook(EXCEL_AUTHORS, on_demand = True)
-
-    # read and insert all authors from excel file to database
-    for sheet in wb.sheets():
-        for row in range(1, sheet.nrows):
-            name = sheet.cell_value(row, 0).title()
-            lastname = sheet.cell_value(row, 1).title()
-            fullname = name + " " + lastname
-
-            database[fullname] = set() # init author entry with empty journal set
-
-    wb.release_resources()
-    del wb
-
-def init_nodes():
-    global journal_graph
-    wb = xlrd.open_workbook(EXCEL_PAPERS, on_demand = True)
-    sheet = wb.sheet_by_index(0)
-
-    # initialize journal graph nodes from excel file
-    for row in range(1, sheet.nrows):
-        ptype = sheet.cell_value(row, 0)
-        authors = sheet.cell_value(row, 3)
-        journal = sheet.cell_value(row, 4).title()
-
-        # check paper type
-        if ptype not in PAPER_TYPES:
-            continue
-
-        # init/update graph node
-        if journal_graph.has_node(journal):
-            journal_graph.nodes[journal]['count'] += 1; # update journal paper count
-        else:
-            journal_graph.add_node(journal)
-            journal_graph.nodes[journal]['count'] = 1;
-
-        # update author/journals database
-        for author in authors.split(', '):
-            database[author].add(journal)
-
-    wb.release_resources()
-    del wb
-
-def init_edges(journals):
-    global journal_graph
-
-    # add/update an edge for each pair of journals
-    for i in range(0, len(journals)):
-        for j in range(i + 1, len(journals)):
-            if journal_graph.has_edge(journals[i], journals[j]):
-                journal_graph[journals[i]][journals[j]]['weight'] += 1 # update existing edge weight
-            else:
-                journal_graph.add_edge(journals[i], journals[j], weight = 1) # add new edge
-
-def create_graph():
+    # insert all authors from excel file to database
+    for (name, lastname, middlename, department, faculty) in loader.load_authors(EXCEL_AUTHORS):
+        fullname = name.title() + " " + lastname.title()
+
+        database.setdefault(fullname, len(database)) # init author entry with author id
+
+def init_nodes(papers, start = 0):
+    # add papers from start to the graph nodes and the author/journals incidence
+    global journal_arrays
+    global incidence
+    global delta
+
+    # check paper type
+    type_codes = [code for (code, ptype) in enumerate(papers['type_names']) if ptype in PAPER_TYPES]
+    selected = np.zeros(papers['papers'], dtype = bool)
+    selected[start:] = np.isin(papers['types'][start:], type_codes)
+    paper_docs = papers['docs'][selected]
+    instrument.count("papers_added", len(paper_docs))
+    instrument.count("rows_rejected_type", papers['papers'] - start - len(paper_docs))
+
+    # journal ids in order of first publication, documents are checked in order of first appearance
+    journal_index = {journal : node for (node, journal) in enumerate(journals)}
+    doc_journals = np.full(len(papers['doc_names']), -1, dtype = np.int64)
+    used, first = np.unique(paper_docs, return_index = True)
+    for doc in paper_docs[np.sort(first)].tolist():
+        journal = papers['doc_names'][doc].title()
+        if journal not in journal_index:
+            journal_index[journal] = len(journals)
+            journals.append(journal)
+        doc_journals[doc] = journal_index[journal]
+
+    # journal paper counts
+    paper_journals = doc_journals[paper_docs]
+    counts = np.zeros(len(journals), dtype = np.int64)
+    counts[:len(journal_arrays['attributes']['count'])] = journal_arrays['attributes']['count']
+    journal_arrays['names'] = journals
+    journal_arrays['attributes']['count'] = counts + np.bincount(paper_journals, minlength = len(journals))
+
+    # author/journals incidence of selected papers
+    for name in papers['author_names']:
+        database.setdefault(name, len(database))
+    author_nodes = np.array([database[name] for name in papers['author_names']], dtype = np.int64)
+    paper_counts = np.diff(papers['author_ptr'])
+    rows = np.repeat(paper_journals, paper_counts[selected])
+    cols = author_nodes[papers['author_ids'][np.repeat(selected, paper_counts)]]
+    shape = (len(journals), len(database))
+    incidence.resize(shape)
+    delta = arraygraph.new_entries(incidence, arraygraph.incidence_matrix(rows, cols, shape))
+    instrument.count("incidence_entries", delta.nnz)
+
+def init_edges():
+    global journal_arrays
+    global incidence
+
+    # journal x journal projection - number of authors that published in both journals,
+    # only pairs of journals with new authors change
+    edges = len(journal_arrays['source'])
+    arraygraph.add_edges(journal_arrays, *arraygraph.projection_delta(incidence, delta))
+    instrument.count("edges_created", len(journal_arrays['source']) - edges)
+    incidence = (incidence + delta).tocsr()
+
+def author_projection():
+    # author x author projection - number of journals both authors published in
+    authors = sorted(database, key = database.get)
+    return arraygraph.project_graph(authors, dict(), incidence.T.tocsr())
+
+def graph_state(papers):
+    # graph can be updated while the authors and the already added papers are unchanged
+    return dict(authors = loader.file_hash(EXCEL_AUTHORS), papers = papers['papers'],
+                digest = dataset.prefix_digest(papers, papers['papers']),
+                database = sorted(database, key = database.get), incidence = incidence)
+
+def load_state(papers):
+    if not (STATE_OUTPUT.exists() and GRAPH_STORE.exists()):
+        print("No previous journals graph, generating whole graph")
+        return None
+
+    with open(STATE_OUTPUT, "rb") as file:
+        state = pickle.load(file)
+
+    if state['authors'] != loader.file_hash(EXCEL_AUTHORS):
+        print("Authors changed, generating whole graph")
+        return None
+    if state['papers'] > papers['papers'] or state['digest'] != dataset.prefix_digest(papers, state['papers']):
+        print("Cleaned papers changed, generating whole graph")
+        return None
+
+    return state
+
+def save_graph(papers, authors, gexf):
+    community.detect_communities(journal_arrays, resolution)
+    if layout_iterations == None:
+        journal_arrays.pop('positions', None) # positions of previous journals
+    else:
+        # journals sized by paper count and colored by community
+        journal_arrays['positions'] = layout.forceatlas2(journal_arrays, layout_iterations)
+        layout.render(journal_arrays, journal_arrays['positions'], GRAPH_IMAGE,
+                      journal_arrays['attributes']['count'], journal_arrays['attributes']['community'])
+        print("Journals graph image written to: " + str(GRAPH_IMAGE))
+    arraygraph.save_graph(journal_arrays, GRAPH_STORE)
+    print("Journals graph written to: " + str(GRAPH_STORE))
+
+    with open(STATE_OUTPUT, "wb") as file:
+        pickle.dump(graph_state(papers), file)
+
+    if gexf:
+        arraygraph.write_gexf(journal_arrays, GRAPH_OUTPUT)
+        print("Journals graph written to: " + str(GRAPH_OUTPUT))
+
+    if authors:
+        arraygraph.write_gexf(author_projection(), AUTHORS_OUTPUT)
+        print("Authors/journals graph written to: " + str(AUTHORS_OUTPUT))
+
+@instrument.stage("journals_create_graph")
+def create_graph(authors = False, gexf = True):
     global database
-    global journal_graph
-    journal_graph = nx.Graph()
+    global journals
+    global journal_arrays
+    global incidence
+    database = dict()
+    journals = []
+    journal_arrays = arraygraph.init_graph(journals, dict(count = []))
+    incidence = arraygraph.incidence_matrix([], [], (0, 0))
 
     print("Initializing author/journals database: " + str(EXCEL_AUTHORS))
     init_database()
 
-    print("Initializing journals graph nodes: " + str(EXCEL_PAPERS))
-    init_nodes()
+    papers = loader.load_dataset(DATASET_PAPERS)
 
-    print("Initializing journals graph edges")
-    for author in database:
-        init_edges(list(database[author]))
+    print("Initializing journals graph nodes: " + str(DATASET_PAPERS))
+    init_nodes(papers)
 
+    print("Initializing journals graph edges")
+    init_edges()
     print("Journals graph generated.")
-    nx.write_gexf(journal_graph, GRAPH_OUTPUT, prettyprint = True)
-    print("Journals graph written to: " + str(GRAPH_OUTPUT))
 
-create_graph()
+    save_graph(papers, authors, gexf)
+
+@instrument.stage("journals_update_graph")
+def update_graph(authors = False, gexf = True):
+    # add only papers cleaned since the graph was generated, the result equals a whole new graph
+    global database
+    global journals
+    global journal_arrays
+    global incidence
+    papers = loader.load_dataset(DATASET_PAPERS)
+    state = load_state(papers)
+    if state == None:
+        create_graph(authors, gexf)
+        return
+
+    print("Reading journals graph: " + str(GRAPH_STORE))
+    journal_arrays = arraygraph.load_graph(GRAPH_STORE)
+    journals = journal_arrays['names']
+    database = {name : author for (author, name) in enumerate(state['database'])}
+    incidence = state['incidence']
+
+    print("Adding {0} new papers: {1}".format(papers['papers'] - state['papers'], DATASET_PAPERS))
+    init_nodes(papers, state['papers'])
+    init_edges()
+    print("Journals graph updated.")
+
+    save_graph(papers, authors, gexf)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Generates journals network graph.")
+    parser.add_argument("-a", "--authors", action = "store_true",
+                        help = "also write graph of authors linked by journals they both published in")
+    parser.add_argument("--no-gexf", action = "store_true", help = "write only binary graph, skip GEXF export")
+    parser.add_argument("-i", "--incremental", action = "store_true",
+                        help = "add only papers cleaned since the last run to the existing graph")
+    parser.add_argument("-r", "--resolution", type = float, default = resolution,
+                        help = "community detection resolution (default: %(default)s)")
+    parser.add_argument("-l", "--layout", action = "store_true",
+                        help = "lay out the graph with ForceAtlas2, write node positions and PNG image")
+    parser.add_argument("--iterations", type = int, default = layout.ITERATIONS,
+                        help = "layout iterations (default: %(default)s)")
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+    resolution = args.resolution
+    layout_iterations = args.iterations if args.layout else None
+    instrument.start(args.metrics, args.profile)
+
+    if args.incremental:
+        update_graph(args.authors, not args.no_gexf)
+    else:
+        create_graph(args.authors, not args.no_gexf)
+
+    instrument.finish(args.metrics, args.profile)
@@ -0,0 +1,209 @@
+import json
+import os
+import resource
+import signal
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+'''
+Stage instrumentation of the pipeline scripts.
+
+Instrumentation is off until enabled (--metrics and --profile options of the scripts), stages and
+counters cost a function call otherwise. Every run of a stage function records:
+    stage        = stage name, nested stages are named by their path as "update_graph/create_graph"
+    wall_seconds = elapsed time
+    cpu_seconds  = CPU time of the process and of its worker processes that finished during the stage
+    peak_rss_bytes = peak resident set size during the stage, the kernel peak is reset at every stage
+                     start where Linux allows it (/proc/self/clear_refs), otherwise peak of the process so far
+    counters     = domain counters added with count(name, value) to the innermost running stage
+
+Metrics are written as JSON, or in Prometheus text format if the file name ends with .prom:
+    pipeline_stage_wall_seconds{stage="clean"} 1.234
+    pipeline_stage_cpu_seconds{stage="clean"} 1.201
+    pipeline_stage_peak_rss_bytes{stage="clean"} 123456789
+    pipeline_stage_counter_total{stage="clean",counter="rows_read"} 5000
+
+Sampling profiler - the main thread stack is sampled every PROFILE_INTERVAL seconds of CPU time and
+written in collapsed stack format (one "frame;frame;frame count" line per stack, read by flame graph
+tools), stacks are rooted at the running stage. Threads and worker processes are not sampled.
+'''
+
+PROFILE_INTERVAL = 0.005 # seconds of CPU time between profiler samples
+PROFILE_TOP = 10 # number of hottest functions printed after profiling
+
+enabled = False
+stages = [] # finished stage records, in order of completion
+active = [] # running stage records, innermost last
+detached = dict() # counters added outside of stages - in worker processes
+samples = None # collapsed stack -> number of samples, None if not profiling
+
+def enable():
+    global enabled
+    enabled = True
+
+def reset_peak():
+    # start a new kernel peak of resident memory, not supported outside of Linux
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        pass
+
+def peak_rss():
+    # peak resident set size in bytes since the last reset
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if (sys.platform == "darwin") else rss * 1024
+
+def update_peaks():
+    # running stages include the peak of the nested stages
+    peak = peak_rss()
+    for record in active:
+        record['peak_rss_bytes'] = max(record['peak_rss_bytes'], peak)
+
+def cpu_time():
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+@contextmanager
+def stage(name):
+    # records the block or the decorated function as a stage
+    if not enabled:
+        yield None
+        return
+
+    update_peaks()
+    path = (active[-1]['stage'] + "/" + name) if active else name
+    record = dict(stage = path, wall_seconds = 0.0, cpu_seconds = 0.0, peak_rss_bytes = 0, counters = dict())
+    active.append(record)
+    reset_peak()
+    wall = time.perf_counter()
+    cpu = cpu_time()
+    try:
+        yield record
+    finally:
+        record['wall_seconds'] = time.perf_counter() - wall
+        record['cpu_seconds'] = cpu_time() - cpu
+        update_peaks()
+        active.pop()
+        stages.append(record)
+
+def count(name, value = 1):
+    if not enabled:
+        return
+
+    counters = active[-1]['counters'] if active else detached
+    counters[name] = counters.get(name, 0) + int(value)
+
+def init_worker():
+    # worker processes count outside of the stages copied from the parent process
+    active.clear()
+    detached.clear()
+
+def take_counters():
+    # counters of the worker process since the last call, added to the parent stage with add_counters
+    counters = dict(detached)
+    detached.clear()
+    return counters
+
+def add_counters(counters):
+    for (name, value) in counters.items():
+        count(name, value)
+
+def label(value):
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def prometheus_text():
+    lines = []
+    for (key, kind, help) in (("wall_seconds", "gauge", "Elapsed time of the pipeline stage."),
+                              ("cpu_seconds", "gauge", "CPU time of the pipeline stage and its worker processes."),
+                              ("peak_rss_bytes", "gauge", "Peak resident set size during the pipeline stage.")):
+        lines.append("# HELP pipeline_stage_{0} {1}".format(key, help))
+        lines.append("# TYPE pipeline_stage_{0} {1}".format(key, kind))
+        for record in stages:
+            lines.append("pipeline_stage_{0}{{stage={1}}} {2}".format(key, label(record['stage']), record[key]))
+
+    lines.append("# HELP pipeline_stage_counter_total Domain counters of the pipeline stage.")
+    lines.append("# TYPE pipeline_stage_counter_total counter")
+    for record in stages:
+        for (name, value) in record['counters'].items():
+            lines.append("pipeline_stage_counter_total{{stage={0},counter={1}}} {2}".format(label(record['stage']),
+                                                                                          label(name), value))
+    return "\n".join(lines) + "\n"
+
+def write_metrics(path):
+    path = Path(path)
+    with open(path, "w", encoding = "utf-8") as file:
+        if path.suffix == ".prom":
+            file.write(prometheus_text())
+        else:
+            json.dump(dict(script = Path(sys.argv[0]).name, stages = stages), file, indent = 2)
+
+def sample(signum, frame):
+    stack = []
+    while frame != None:
+        code = frame.f_code
+        stack.append("{0} ({1}:{2})".format(code.co_name, Path(code.co_filename).name, code.co_firstlineno))
+        frame = frame.f_back
+    if active:
+        stack.append(active[-1]['stage'])
+
+    key = ";".join(reversed(stack))
+    samples[key] = samples.get(key, 0) + 1
+
+def start_profiler(interval = PROFILE_INTERVAL):
+    global samples
+    samples = dict()
+    signal.signal(signal.SIGPROF, sample)
+    signal.setitimer(signal.ITIMER_PROF, interval, interval)
+
+def stop_profiler():
+    signal.setitimer(signal.ITIMER_PROF, 0, 0)
+    signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+def hot_functions(top = PROFILE_TOP):
+    # (function, samples in the function itself) of the most sampled functions
+    functions = dict()
+    for (stack, count) in samples.items():
+        function = stack.rsplit(";", 1)[-1]
+        functions[function] = functions.get(function, 0) + count
+    return sorted(functions.items(), key = lambda item : -item[1])[:top]
+
+def write_profile(path):
+    with open(path, "w", encoding = "utf-8") as file:
+        for (stack, count) in sorted(samples.items()):
+            file.write("{0} {1}\n".format(stack, count))
+
+def add_arguments(parser):
+    parser.add_argument("--metrics", type = Path, metavar = "PATH",
+                        help = "write stage metrics to PATH, JSON or Prometheus text if PATH ends with .prom")
+    parser.add_argument("--profile", type = Path, metavar = "PATH",
+                        help = "sample the running functions and write collapsed stacks to PATH")
+
+def start(metrics = None, profile = None):
+    if metrics != None or profile != None:
+        enable()
+    if profile != None:
+        start_profiler()
+
+def finish(metrics = None, profile = None):
+    if profile != None:
+        stop_profiler()
+        write_profile(profile)
+        total = sum(samples.values())
+        print("\nProfile of {0} samples written to: {1}".format(total, profile))
+        for (function, count) in hot_functions():
+            print("  {0:6.1%}  {1}".format(count / total, function))
+
+    if metrics != None:
+        write_metrics(metrics)
+        print("Stage metrics written to: " + str(metrics))
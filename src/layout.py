@@ -0,0 +1,262 @@
+import numpy as np
+import struct
+import zlib
+
+import metrics
+
+'''
+Headless ForceAtlas2 layout and PNG rendering of array graphs.
+
+Layout follows ForceAtlas2 with its default settings - node mass is degree + 1:
+    repulsion  = SCALING * mass_i * mass_j / distance between all node pairs
+    attraction = weight * distance along edges
+    gravity    = GRAVITY * mass towards the origin
+and the adaptive global and per node speeds of the Gephi implementation.
+
+Repulsion is approximated with a Barnes-Hut quadtree, so an iteration costs O(n log n).
+Quadtree levels are built from the node cell coordinates - cell key is (x << level) | y -
+with cell masses and centers of mass accumulated by bincount. All nodes of a chunk descend the
+tree together: (node, cell) pairs that are far enough (cell size / distance < THETA) add cell
+repulsion, the others are replaced by pairs of the node and cell children on the next level.
+
+Images are rendered with NumPy into an RGB raster and written as PNG with zlib:
+nodes are sized by the size attribute and colored by the color attribute, edges are drawn
+in gray with width depending on their weight.
+'''
+
+ITERATIONS = 100 # layout iterations
+SCALING = 2.0 # repulsion scaling ratio
+GRAVITY = 1.0
+THETA = 1.2 # Barnes-Hut accuracy, larger values approximate more
+JITTER_TOLERANCE = 1.0
+MAX_DEPTH = 20 # quadtree levels, cells of the last level are not split further
+CHUNK_NODES = 4096 # nodes descending the quadtree together
+SEED = 0 # random seed of the initial positions
+
+IMAGE_SIZE = 2000 # image width and height in pixels
+NODE_SIZES = (4, 24) # smallest and largest node diameter in pixels
+EDGE_COLOR = np.array([190, 190, 190], dtype = np.uint8)
+BACKGROUND = np.array([255, 255, 255], dtype = np.uint8)
+PALETTE = np.array([[31, 119, 180], [255, 127, 14], [44, 160, 44], [214, 39, 40], [148, 103, 189],
+                    [140, 86, 75], [227, 119, 194], [127, 127, 127], [188, 189, 34], [23, 190, 207]], dtype = np.uint8)
+
+def build_tree(x, y, mass):
+    # quadtree levels - (sorted cell keys, cell of every node, cell mass, center of mass x, y, cell size)
+    span = max(x.max() - x.min(), y.max() - y.min(), 1e-9) * (1 + 1e-9)
+    cells = 1 << MAX_DEPTH
+    ix = np.minimum(((x - x.min()) / span * cells).astype(np.int64), cells - 1)
+    iy = np.minimum(((y - y.min()) / span * cells).astype(np.int64), cells - 1)
+
+    levels = []
+    for level in range(1, MAX_DEPTH + 1):
+        shift = MAX_DEPTH - level
+        keys, inverse = np.unique(((ix >> shift) << level) | (iy >> shift), return_inverse = True)
+        inverse = inverse.reshape(-1)
+        cell_mass = np.bincount(inverse, weights = mass)
+        center_x = np.bincount(inverse, weights = mass * x) / cell_mass
+        center_y = np.bincount(inverse, weights = mass * y) / cell_mass
+        levels.append((keys, inverse, cell_mass, center_x, center_y, span / (1 << level)))
+
+        # every node has its own cell
+        if len(keys) == len(x):
+            break
+
+    return levels
+
+def cell_forces(nodes, dx, dy, node_mass, cell_mass, count, start):
+    # repulsion of cells on the nodes, summed per node of the chunk
+    distance2 = dx * dx + dy * dy
+    valid = distance2 > 0
+    factor = np.zeros(len(distance2))
+    factor[valid] = SCALING * node_mass[valid] * cell_mass[valid] / distance2[valid]
+    return (np.bincount(nodes - start, weights = factor * dx, minlength = count),
+            np.bincount(nodes - start, weights = factor * dy, minlength = count))
+
+def repulsion(x, y, mass):
+    levels = build_tree(x, y, mass)
+    force_x = np.zeros(len(x))
+    force_y = np.zeros(len(x))
+
+    for start in range(0, len(x), CHUNK_NODES):
+        count = min(CHUNK_NODES, len(x) - start)
+        first = levels[0][0]
+        nodes = np.repeat(np.arange(start, start + count), len(first))
+        cells = np.tile(np.arange(len(first)), count)
+
+        for (level, (keys, inverse, cell_mass, center_x, center_y, size)) in enumerate(levels):
+            own = inverse[nodes] == cells
+            dx = x[nodes] - center_x[cells]
+            dy = y[nodes] - center_y[cells]
+            last = level == len(levels) - 1
+            accept = ~own & ((size * size < THETA * THETA * (dx * dx + dy * dy)) | last)
+
+            forces = cell_forces(nodes[accept], dx[accept], dy[accept], mass[nodes[accept]],
+                                 cell_mass[cells[accept]], count, start)
+            force_x[start:start + count] += forces[0]
+            force_y[start:start + count] += forces[1]
+
+            if last:
+                # other nodes in the node's own cell, the node is taken out of the cell mass
+                nodes, cells = nodes[own], cells[own]
+                rest = cell_mass[cells] - mass[nodes]
+                shared = rest > 1e-12
+                nodes, cells, rest = nodes[shared], cells[shared], rest[shared]
+                rest_x = (cell_mass[cells] * center_x[cells] - mass[nodes] * x[nodes]) / rest
+                rest_y = (cell_mass[cells] * center_y[cells] - mass[nodes] * y[nodes]) / rest
+                forces = cell_forces(nodes, x[nodes] - rest_x, y[nodes] - rest_y, mass[nodes], rest, count, start)
+                force_x[start:start + count] += forces[0]
+                force_y[start:start + count] += forces[1]
+                break
+
+            # open near cells and cells containing the node - pairs of the node and existing children,
+            # levels[level] holds the cells of tree depth level + 1
+            nodes, parents = nodes[~accept], keys[cells[~accept]]
+            child_keys = levels[level + 1][0]
+            depth = level + 1
+            parent_x, parent_y = parents >> depth, parents & ((1 << depth) - 1)
+            children = np.stack([((2 * parent_x + a) << (depth + 1)) | (2 * parent_y + b)
+                                 for a in (0, 1) for b in (0, 1)], axis = 1).reshape(-1)
+            nodes = np.repeat(nodes, 4)
+            cells = np.minimum(np.searchsorted(child_keys, children), len(child_keys) - 1)
+            found = child_keys[cells] == children
+            nodes, cells = nodes[found], cells[found]
+
+    return force_x, force_y
+
+def forceatlas2(graph, iterations = ITERATIONS, seed = SEED):
+    # (n, 2) array of node positions
+    nodes = len(graph['names'])
+    if nodes == 0:
+        return np.zeros((0, 2))
+
+    source, target = graph['source'], graph['target']
+    weight = graph['weight'].astype(np.float64)
+    mass = metrics.degrees(metrics.adjacency(graph)).astype(np.float64) + 1
+
+    rng = np.random.default_rng(seed)
+    x, y = rng.uniform(-1, 1, (2, nodes)) * np.sqrt(nodes) * 10
+    old_x, old_y = np.zeros(nodes), np.zeros(nodes)
+    speed, speed_efficiency = 1.0, 1.0
+
+    for iteration in range(iterations):
+        force_x, force_y = repulsion(x, y, mass) if (nodes > 1) else (np.zeros(nodes), np.zeros(nodes))
+
+        # attraction along edges
+        dx, dy = (x[source] - x[target]) * weight, (y[source] - y[target]) * weight
+        force_x += np.bincount(target, weights = dx, minlength = nodes)
+        force_x -= np.bincount(source, weights = dx, minlength = nodes)
+        force_y += np.bincount(target, weights = dy, minlength = nodes)
+        force_y -= np.bincount(source, weights = dy, minlength = nodes)
+
+        # gravity towards the origin
+        distance = np.sqrt(x * x + y * y)
+        pull = np.divide(GRAVITY * mass, distance, out = np.zeros(nodes), where = distance > 0)
+        force_x -= x * pull
+        force_y -= y * pull
+
+        # adaptive speed - swinging nodes slow down, nodes moving consistently speed up
+        swinging = mass * np.sqrt((old_x - force_x) ** 2 + (old_y - force_y) ** 2)
+        traction = mass * np.sqrt((old_x + force_x) ** 2 + (old_y + force_y) ** 2) / 2
+        total_swinging, total_traction = swinging.sum(), traction.sum()
+
+        estimated_jitter = 0.05 * np.sqrt(nodes)
+        jitter = JITTER_TOLERANCE * max(np.sqrt(estimated_jitter),
+                                        min(10, estimated_jitter * total_traction / nodes ** 2))
+        if total_traction > 0 and total_swinging / total_traction > 2:
+            if speed_efficiency > 0.05:
+                speed_efficiency *= 0.5
+            jitter = max(jitter, JITTER_TOLERANCE)
+
+        target_speed = jitter * speed_efficiency * total_traction / total_swinging if (total_swinging > 0) else speed
+        if total_swinging > jitter * total_traction:
+            if speed_efficiency > 0.05:
+                speed_efficiency *= 0.7
+        elif speed < 1000:
+            speed_efficiency *= 1.3
+        speed += min(target_speed - speed, 0.5 * speed)
+
+        factor = speed / (1 + np.sqrt(speed * swinging))
+        x += force_x * factor
+        y += force_y * factor
+        old_x, old_y = force_x, force_y
+
+    return np.stack([x, y], axis = 1)
+
+def node_sizes(values):
+    # diameters in pixels scaled linearly between NODE_SIZES
+    values = np.asarray(values, dtype = np.float64)
+    low, high = values.min(initial = 0), values.max(initial = 0)
+    scale = (values - low) / (high - low) if (high > low) else np.zeros(len(values))
+    return NODE_SIZES[0] + scale * (NODE_SIZES[1] - NODE_SIZES[0])
+
+def node_colors(values):
+    # palette color of every distinct value, values in sorted order
+    labels = np.unique(np.array([str(value) for value in values], dtype = object), return_inverse = True)[1]
+    return PALETTE[labels.reshape(-1) % len(PALETTE)]
+
+def png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+def write_png(image, path):
+    # 8 bit RGB image, every row starts with filter type 0
+    height, width = image.shape[:2]
+    rows = np.concatenate([np.zeros((height, 1), dtype = np.uint8), image.reshape(height, -1)], axis = 1)
+    with open(path, "wb") as file:
+        file.write(b"\x89PNG\r\n\x1a\n")
+        file.write(png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        file.write(png_chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)))
+        file.write(png_chunk(b"IEND", b""))
+
+def draw_edges(image, px, py, graph):
+    # edges as sampled points, one point per pixel of edge length, heavier edges are wider
+    size = image.shape[0]
+    width = np.minimum(1 + np.log2(graph['weight'].astype(np.float64)), 4).astype(np.int64)
+    for start in range(0, len(graph['source']), CHUNK_NODES):
+        source, target = graph['source'][start:start + CHUNK_NODES], graph['target'][start:start + CHUNK_NODES]
+        steps = np.maximum(np.ceil(np.hypot(px[target] - px[source], py[target] - py[source])), 1).astype(np.int64)
+        edges = np.repeat(np.arange(len(source)), steps + 1)
+        t = (np.arange(len(edges)) - np.repeat(np.cumsum(steps + 1) - steps - 1, steps + 1)) / steps[edges]
+        ex = px[source][edges] + t * (px[target] - px[source])[edges]
+        ey = py[source][edges] + t * (py[target] - py[source])[edges]
+        edge_width = width[start:start + CHUNK_NODES][edges]
+
+        for offset in range(width.max(initial = 1)):
+            wide = edge_width > offset
+            cols = np.clip(np.round(ex[wide] + offset).astype(np.int64), 0, size - 1)
+            rows = np.clip(np.round(ey[wide]).astype(np.int64), 0, size - 1)
+            image[rows, cols] = EDGE_COLOR
+
+def draw_nodes(image, px, py, diameters, colors):
+    # filled circles, larger nodes first so smaller ones stay visible
+    size = image.shape[0]
+    radii = np.maximum(np.round(diameters / 2).astype(np.int64), 1)
+    for radius in np.unique(radii)[::-1].tolist():
+        offsets = np.arange(-radius, radius + 1)
+        ox, oy = np.meshgrid(offsets, offsets)
+        disk = ox * ox + oy * oy <= radius * radius
+        ox, oy = ox[disk], oy[disk]
+
+        nodes = np.flatnonzero(radii == radius)
+        for start in range(0, len(nodes), CHUNK_NODES):
+            chunk = nodes[start:start + CHUNK_NODES]
+            cols = np.clip(np.round(px[chunk])[:, None].astype(np.int64) + ox, 0, size - 1)
+            rows = np.clip(np.round(py[chunk])[:, None].astype(np.int64) + oy, 0, size - 1)
+            image[rows, cols] = colors[chunk][:, None]
+
+def render(graph, positions, path, sizes, colors, image_size = IMAGE_SIZE):
+    # PNG image of the graph - sizes and colors are attribute values of the nodes
+    image = np.empty((image_size, image_size, 3), dtype = np.uint8)
+    image[:] = BACKGROUND
+    diameters = node_sizes(sizes)
+    if len(positions) > 0:
+        # fit positions into the image with a margin of the largest node
+        margin = NODE_SIZES[1]
+        low = positions.min(axis = 0)
+        span = max((positions.max(axis = 0) - low).max(), 1e-9)
+        scaled = margin + (positions - low) / span * (image_size - 2 * margin)
+        px, py = scaled[:, 0], image_size - 1 - scaled[:, 1]
+
+        draw_edges(image, px, py, graph)
+        draw_nodes(image, px, py, diameters, node_colors(colors))
+
+    write_png(image, path)
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import pickle
+import xlrd
+from pathlib import Path
+
+import arraygraph
+import dataset
+import readers
+
+FILE_DIR = Path(__file__).parent
+
+CACHE_DIR = (FILE_DIR/"../data/cache").resolve()
+
+'''
+Shared loader of pipeline input files.
+
+Every input file is parsed once into plain Python structures that all pipeline stages share:
+    authors workbook = list of (name, lastname, middlename, department, faculty) rows of all sheets
+    papers export    = stream of the header and paper rows as returned by readers.read_papers
+    cleaned dataset  = dict of NumPy arrays as returned by dataset.load_dataset
+    binary graphs    = array graphs as returned by arraygraph.load_graph
+
+Parsed files are kept in memory for the lifetime of the process and the workbooks are also
+cached on disk in CACHE_DIR, keyed by the SHA-256 hash of the file content. Repeat runs on
+unchanged inputs read the cache instead of decoding Excel files. Paper rows are cached as a
+full pickled copy of the export, which takes about as much disk space as the decoded rows,
+so exports larger than PAPERS_CACHE_SIZE are cached only on request. Loaded objects are
+shared and must not be modified.
+'''
+
+HASH_BLOCK = 1 << 20 # file hashing block size in bytes
+CHUNK_SIZE = 5000 # number of paper rows in a single cached chunk
+PAPERS_CACHE_SIZE = 256 << 20 # larger papers exports are cached only on request, in bytes
+
+loaded = dict() # (kind, path) -> (content hash, parsed file)
+
+def file_hash(path, size = None):
+    # content hash of the whole file or of its first size bytes
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while size == None or file.tell() < size:
+            block = file.read(HASH_BLOCK if (size == None) else min(HASH_BLOCK, size - file.tell()))
+            if not block:
+                break
+            digest.update(block)
+
+    return digest.hexdigest()
+
+def cache_path(path, kind, digest):
+    return CACHE_DIR/"{0}.{1}.{2}.pickle".format(Path(path).name, kind, digest[:16])
+
+def clear_stale(path, kind, digest):
+    # remove caches of previous file versions
+    current = cache_path(path, kind, digest)
+    for cache in CACHE_DIR.glob("{0}.{1}.*.pickle".format(Path(path).name, kind)):
+        if cache != current:
+            cache.unlink()
+
+def write_cache(cache, value):
+    # write to a temporary file first so interrupted runs never leave a partial cache,
+    # temporary files are per process as concurrent pipeline stages can cache the same file
+    CACHE_DIR.mkdir(parents = True, exist_ok = True)
+    temp = cache.with_suffix(".{0}.tmp".format(os.getpid()))
+    with open(temp, "wb") as file:
+        pickle.dump(value, file, pickle.HIGHEST_PROTOCOL)
+    os.replace(temp, cache)
+
+def load(path, kind, parse, disk = True):
+    # parsed file from memory, disk cache or parse function, in that order
+    digest = file_hash(path)
+    entry = loaded.get((kind, str(path)))
+    if entry != None and entry[0] == digest:
+        return entry[1]
+
+    cache = cache_path(path, kind, digest)
+    if disk and cache.exists():
+        with open(cache, "rb") as file:
+            value = pickle.load(file)
+    else:
+        value = parse(path)
+        if disk:
+            write_cache(cache, value)
+            clear_stale(path, kind, digest)
+
+    loaded[(kind, str(path))] = (digest, value)
+    return value
+
+def read_authors(path):
+    wb = xlrd.open_workbook(path, on_demand = True)
+    authors = []
+
+    for sheet in wb.sheets():
+        for row in range(1, sheet.nrows):
+            authors.append(tuple(sheet.cell_value(row, col) for col in range(5)))
+
+    wb.release_resources()
+    del wb
+    return authors
+
+def load_authors(path):
+    # rows - (name, lastname, middlename, department, faculty)
+    return load(path, "authors", read_authors)
+
+def load_dataset(path):
+    # binary dataset is not cached on disk again
+    return load(path, "dataset", dataset.load_dataset, disk = False)
+
+def load_graph(path):
+    return load(path, "graph", arraygraph.load_graph, disk = False)
+
+def sheet_name(path):
+    return load(path, "sheet", readers.sheet_name)
+
+def read_chunks(cache):
+    with open(cache, "rb") as file:
+        while True:
+            try:
+                yield from pickle.load(file)
+            except EOFError:
+                return
+
+def cache_rows(path, cache):
+    # stream rows from the reader while writing them to the cache in chunks
+    CACHE_DIR.mkdir(parents = True, exist_ok = True)
+    temp = cache.with_suffix(".{0}.tmp".format(os.getpid())) # per process, see write_cache
+    rows = readers.read_papers(path)
+    complete = False
+
+    try:
+        with open(temp, "wb") as file:
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) == CHUNK_SIZE:
+                    pickle.dump(chunk, file, pickle.HIGHEST_PROTOCOL)
+                    yield from chunk
+                    chunk = []
+
+            pickle.dump(chunk, file, pickle.HIGHEST_PROTOCOL)
+            yield from chunk
+        complete = True
+    finally:
+        # cache is kept only if the whole export was read
+        if complete:
+            os.replace(temp, cache)
+        elif temp.exists():
+            temp.unlink()
+
+def load_papers(path, cache = None):
+    # papers are streamed, not kept in memory - header first, then paper rows,
+    # the row cache is a pickled copy of the whole export, written by default only for smaller exports
+    digest = file_hash(path)
+    rows = cache_path(path, "papers", digest)
+    if rows.exists():
+        yield from read_chunks(rows)
+        return
+
+    if cache == None:
+        cache = os.path.getsize(path) <= PAPERS_CACHE_SIZE
+    if cache:
+        yield from cache_rows(path, rows)
+    else:
+        yield from readers.read_papers(path)
+    clear_stale(path, "papers", digest)
@@ -0,0 +1,93 @@
+import numpy as np
+from scipy import sparse
+
+'''
+Graph metrics computed on the CSR adjacency matrix of an array graph.
+
+Every metric is computed for all nodes at once with vectorized NumPy/SciPy operations:
+    degree = number of neighbors
+    weighted_degree = sum of edge weights
+    degree_histogram = number of nodes with each degree
+    component = connected component id, components are numbered by their first node
+    clustering = local clustering coefficient (unweighted, as in NetworkX)
+'''
+
+CLUSTERING_ROWS = 4096 # number of adjacency rows multiplied at once when counting triangles
+
+def adjacency(graph):
+    # symmetric nodes x nodes CSR matrix of edge weights
+    nodes = len(graph['names'])
+    rows = np.concatenate([graph['source'], graph['target']])
+    cols = np.concatenate([graph['target'], graph['source']])
+    weights = np.concatenate([graph['weight'], graph['weight']])
+    return sparse.csr_matrix((weights, (rows, cols)), shape = (nodes, nodes))
+
+def degrees(matrix):
+    return np.diff(matrix.indptr)
+
+def weighted_degrees(matrix):
+    return np.asarray(matrix.sum(axis = 1)).ravel()
+
+def degree_histogram(degree):
+    # number of nodes with degree equal to the index
+    return np.bincount(degree)
+
+def components(graph):
+    # union-find with all edges hooked at once - every root is hooked to the smallest root
+    # of its neighbors, then paths are compressed by pointer jumping until no root changes
+    parent = np.arange(len(graph['names']))
+    source, target = graph['source'], graph['target']
+
+    while True:
+        roots_s, roots_t = parent[source], parent[target]
+        hooks = roots_s != roots_t
+        if not hooks.any():
+            break
+
+        low = np.minimum(roots_s[hooks], roots_t[hooks])
+        high = np.maximum(roots_s[hooks], roots_t[hooks])
+        np.minimum.at(parent, high, low)
+
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+    # number components by their first node
+    roots, component = np.unique(parent, return_inverse = True)
+    return component.reshape(-1)
+
+def component_sizes(component):
+    return np.bincount(component)
+
+def clustering(matrix):
+    # local clustering coefficient - closed paths of length 2 through the node (twice the triangles)
+    # over ordered pairs of its neighbors
+    binary = matrix.copy()
+    binary.data = np.ones(len(binary.data), dtype = np.int64)
+    binary.setdiag(0)
+    binary.eliminate_zeros()
+
+    triangles = np.zeros(binary.shape[0], dtype = np.int64)
+    for start in range(0, binary.shape[0], CLUSTERING_ROWS):
+        rows = binary[start:start + CLUSTERING_ROWS]
+        triangles[start:start + rows.shape[0]] = np.asarray((rows @ binary).multiply(rows).sum(axis = 1)).ravel()
+
+    degree = degrees(binary)
+    pairs = degree * (degree - 1)
+    return np.divide(triangles, pairs, out = np.zeros(len(degree)), where = pairs > 0)
+
+def graph_metrics(graph):
+    matrix = adjacency(graph)
+    degree = degrees(matrix)
+    component = components(graph)
+    local_clustering = clustering(matrix)
+
+    return dict(degree = degree,
+                weighted_degree = weighted_degrees(matrix),
+                degree_histogram = degree_histogram(degree),
+                component = component,
+                component_sizes = component_sizes(component),
+                clustering = local_clustering,
+                average_clustering = local_clustering.mean() if (len(local_clustering) > 0) else 0)
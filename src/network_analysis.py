@@ -1,15 +1,22 @@
-import xlrd
-import xlsxwriter
-import networkx as nx
+import argparse
+import numpy as np
 from pathlib import Path
 
+import centrality
+import community
+import instrument
+import loader
+import metrics
+import report
+
 FILE_DIR = Path(__file__).parent
 
-EXCEL_PAPERS = (FILE_DIR/"../data/UB_cs_papers_cleaned.xlsx").resolve()
-GRAPH_INPUT = (FILE_DIR/"../results/authors_graph.gexf").resolve()
-ETF_INPUT = (FILE_DIR/"../results/authors_graph_etf.gexf").resolve()
-MATF_INPUT = (FILE_DIR/"../results/authors_graph_matf.gexf").resolve()
-FON_INPUT = (FILE_DIR/"../results/authors_graph_fon.gexf").resolve()
+DATASET_PAPERS = (FILE_DIR/"../data/UB_cs_papers_cleaned.npz").resolve()
+GRAPH_INPUT = (FILE_DIR/"../results/authors_graph.npz").resolve()
+ETF_INPUT = (FILE_DIR/"../results/authors_graph_etf.npz").resolve()
+MATF_INPUT = (FILE_DIR/"../results/authors_graph_matf.npz").resolve()
+FON_INPUT = (FILE_DIR/"../results/authors_graph_fon.npz").resolve()
+JOURNALS_INPUT = (FILE_DIR/"../results/journals_graph.npz").resolve()
 
 EXCEL_AUTHORS = (FILE_DIR/"../results/analysis_authors.xlsx").resolve()
 EXCEL_MODULES = (FILE_DIR/"../results/analysis_modules.xlsx").resolve()
@@ -26,6 +33,10 @@ PAPER_TYPE_PRIORITY = {
     "Book Chapter" : 4
 }
 
+MODULES = ['ETF_RTI', 'MATF_RTI', 'FON_SI', 'FON_IT', 'FON_IS']
+FACULTIES = ["ETF", "MATF", "FON"]
+UNKNOWN_MODULE = "unknown" # module of coauthors missing from the authors workbook
+
 """
 Coauthorship network graphs analysis.
 
@@ -35,13 +46,44 @@ For each graph the following information about the nodes is listed:
 - Total number of scientific papers published
 - Total number of co authorships
 - Average number of coauthors per paper
-
-From this the average number of coauthors per paper and author for the whole graph is calculated.
-Results are written to the separate worksheets for each graph inside the Excel file.
+- Number of distinct coauthors, connected component and local clustering coefficient
+- Betweenness, closeness and eccentricity
+- Community found by modularity optimization
+
+From this the average number of coauthors per paper and author, average clustering coefficient,
+number of connected components, size of the largest component, diameter and average path length
+for the whole graph are calculated. Centralities are exact unless a number of sampled BFS sources is
+given, then the betweenness error bound of every author and the largest bound are written as well. Communities are compared with modules by
+the number of communities, modularity and normalized mutual information of the two partitions.
+Results are written to the separate worksheets for each graph inside the Excel file,
+degree distributions and component sizes of all graphs to two additional worksheets
+and the number of authors of every module in every community to the last worksheet.
 """
-def authors_analysis():
+def graph_communities(graph):
+    # communities written by the graph scripts, graphs written before community detection are partitioned here
+    if 'community' in graph['attributes']:
+        return np.asarray(graph['attributes']['community'], dtype = np.int64)
+    return community.louvain(graph)
+
+def author_rows(graph, nodes, columns):
+    # node table rows in node order, generated while they are written
+    (modules, counts, weighted_degrees, degrees, components, clustering,
+     betweenness, betweenness_errors, closeness, eccentricity, communities) = columns
+    for node in nodes:
+        papers = int(counts[node])
+        coauthors = weighted_degrees[node]
+        avg_coauths = (coauthors / papers) if (papers > 0) else 0
+
+        yield [graph['names'][node], modules[node], papers, coauthors, "{:.2f}".format(avg_coauths),
+               degrees[node], components[node], "{:.4f}".format(clustering[node]),
+               "{:.2f}".format(betweenness[node]), "{:.2f}".format(betweenness_errors[node]),
+               "{:.4f}".format(closeness[node]), eccentricity[node],
+               int(communities[node])]
+
+@instrument.stage("authors_analysis")
+def authors_analysis(samples = None, processes = 1, backend = "xlsx"):
     print("\nInitializing co-authorship network graphs analysis")
-    wb = xlsxwriter.Workbook(EXCEL_AUTHORS)
+    output = report.open_report(EXCEL_AUTHORS, backend)
 
     # column arguments - header , width, format
     column_args = [
@@ -50,59 +92,209 @@ def authors_analysis():
         ["Broj radova", 12, {'align' : "center"}],
         ["Broj koautora", 14, {'align' : "center"}],
         ["Prosečan broj koautora po radu", 28, {'align' : "center"}],
+        ["Broj različitih koautora", 22, {'align' : "center"}],
+        ["Komponenta", 12, {'align' : "center"}],
+        ["Koeficijent klasterovanja", 24, {'align' : "center"}],
+        ["Betweenness", 14, {'align' : "center"}],
+        ["Greška betweenness", 20, {'align' : "center"}],
+        ["Closeness", 12, {'align' : "center"}],
+        ["Ekscentricitet", 14, {'align' : "center"}],
+        ["Zajednica", 12, {'align' : "center"}]
+    ]
+    summary_args = [
         ["Prosečan broj koautora po radu za {}", 36, {'align' : "center"}],
-        ["Prosečan broj koautora po autoru za {}", 38, {'align' : "center"}]
+        ["Prosečan broj koautora po autoru za {}", 38, {'align' : "center"}],
+        ["Prosečan koeficijent klasterovanja za {}", 38, {'align' : "center"}],
+        ["Broj komponenti za {}", 22, {'align' : "center"}],
+        ["Najveća komponenta za {}", 24, {'align' : "center"}],
+        ["Dijametar za {}", 16, {'align' : "center"}],
+        ["Prosečna dužina puta za {}", 26, {'align' : "center"}],
+        ["Greška betweenness za {}", 24, {'align' : "center"}],
+        ["Broj zajednica za {}", 20, {'align' : "center"}],
+        ["Modularnost za {}", 18, {'align' : "center"}],
+        ["NMI zajednica i modula za {}", 28, {'align' : "center"}]
     ]
     sheet_names = ["UB", "ETF", "MATF", "FON"]
     graph_files = [GRAPH_INPUT, ETF_INPUT, MATF_INPUT, FON_INPUT]
+    graph_metrics = []
+    graph_modules = [] # (communities, modules) of every graph
 
     for i in range(len(graph_files)):
         print("Reading graph file: " + str(graph_files[i]))
-        graph = nx.read_gexf(graph_files[i])
-        sheet = wb.add_worksheet(sheet_names[i])
-
-        # set column headers, widths and formats
-        for col in range (0, len(column_args)):
-            header = column_args[col][0].format(sheet_names[i]) # update last headers with sheet name
-            width = column_args[col][1]
-            cell_format =  wb.add_format(column_args[col][2])
-
-            sheet.write(0, col, header)
-            sheet.set_column(col, col, width, cell_format) # set width and format
+        graph = loader.load_graph(graph_files[i])
 
         # sort authors by paper count
-        nodes = sorted(graph.nodes(data = True),
-                       key = lambda node : node[1]['count'], reverse = True)
-
+        counts = list(graph['attributes']['count'])
+        modules = [module if (module != None) else UNKNOWN_MODULE for module in graph['attributes']['module']]
+        graph_metrics.append(metrics.graph_metrics(graph))
+        weighted_degrees = graph_metrics[i]['weighted_degree'].tolist()
+        paths = centrality.centralities(graph, samples, processes)
+        instrument.count("graph_nodes", len(graph['names']))
+        instrument.count("graph_edges", len(graph['source']))
+        instrument.count("bfs_sources", paths['sources'])
+        communities = graph_communities(graph)
+        graph_modules.append((communities, modules))
+        nodes = sorted(range(len(graph['names'])), key = lambda node : counts[node], reverse = True)
+
+        # average number of coauthors per paper and per author in the graph
         avg_coauths_paper = 0
         avg_coauths_author = 0
-        for j in range(0, len(nodes)):
-            node = nodes[j]
-            author = node[0]
-            module = node[1]['module']
-            papers = node[1]['count']
-            coauthors = graph.degree(author, weight = 'weight')
-            avg_coauths = (coauthors / papers) if (papers > 0) else 0
+        for node in nodes:
+            papers = int(counts[node])
+            avg_coauths_paper += (weighted_degrees[node] / papers) if (papers > 0) else 0
+            avg_coauths_author += weighted_degrees[node]
+        avg_coauths_paper /= len(nodes)
+        avg_coauths_author /= len(nodes)
 
-            avg_coauths_paper += avg_coauths
-            avg_coauths_author += coauthors
+        summary = [avg_coauths_paper, avg_coauths_author,
+                   # clustering and components of the graph
+                   graph_metrics[i]['average_clustering'], len(graph_metrics[i]['component_sizes']),
+                   graph_metrics[i]['component_sizes'].max(initial = 0),
+                   # shortest paths of the graph, diameter is a lower bound for sampled sources
+                   paths['diameter'], paths['average_path_length'], paths['betweenness_error'],
+                   # communities compared with modules
+                   int(communities.max(initial = -1)) + 1, community.modularity(graph, communities),
+                   community.normalized_mutual_information(communities, modules)]
+
+        # update summary headers with sheet name
+        summary_columns = [[header.format(sheet_names[i]), width, properties]
+                           for (header, width, properties) in summary_args]
+        columns = (modules, counts, weighted_degrees, graph_metrics[i]['degree'].tolist(),
+                   graph_metrics[i]['component'].tolist(), graph_metrics[i]['clustering'].tolist(),
+                   paths['betweenness'].tolist(), paths['betweenness_errors'].tolist(),
+                   paths['closeness'].tolist(), paths['eccentricity'].tolist(),
+                   communities)
+        rows = author_rows(graph, nodes, columns)
+        report.write_sheet(output, sheet_names[i],
+                           [report.table(sheet_names[i], column_args, rows, summary = list(zip(summary_columns, summary)))])
 
-            row = [author, module, papers, coauthors, "{:.2f}".format(avg_coauths)]
-            sheet.write_row(j + 1, 0, row)
+        print("Node information succesfully written to worksheet: " + sheet_names[i])
 
-        # calculate average number of coauthors per paper in the graph
-        avg_coauths_paper /= len(nodes)
-        sheet.write(1, len(column_args) - 2, avg_coauths_paper)
+    # degree distributions and component sizes, two columns for each graph
+    distributions = [("Distribucija stepena", "Stepen", "degree_histogram"),
+                     ("Povezane komponente", "Komponenta", "component_sizes")]
+    for (sheet_name, header, key) in distributions:
+        tables = []
+        for i in range(len(graph_files)):
+            columns = [[header + " ({})".format(sheet_names[i]), 16, {'align' : "center"}],
+                       ["Broj autora", 16, {'align' : "center"}]]
+            rows = ([value, count] for (value, count) in enumerate(graph_metrics[i][key].tolist()))
+            tables.append(report.table("{0} ({1})".format(sheet_name, sheet_names[i]), columns, rows, col = i * 3))
+        report.write_sheet(output, sheet_name, tables)
+
+        print("Graph metrics succesfully written to worksheet: " + sheet_name)
+
+    # number of authors of every module in every community, one block of columns for each graph
+    module_names = sorted(set(graph_modules[0][1]))
+    tables = []
+    col = 0
+    for i in range(len(graph_files)):
+        (communities, modules) = graph_modules[i]
+        module_codes = np.array([module_names.index(module) for module in modules], dtype = np.int64)
+        count = int(communities.max(initial = -1)) + 1
+        table = np.zeros((count, len(module_names)), dtype = np.int64)
+        np.add.at(table, (communities, module_codes), 1)
 
-        # calculate average number of coauthors per author in the graph
-        avg_coauths_author /= len(nodes)
-        sheet.write(1, len(column_args) - 1, avg_coauths_author)
+        headers = ["Zajednica ({})".format(sheet_names[i]), "Broj autora"] + module_names + ["Dominantni modul"]
+        columns = [[header, 16, {'align' : "center"}] for header in headers]
+        rows = [[row, int(table[row].sum())] + table[row].tolist() + [module_names[table[row].argmax()]]
+                for row in range(count)]
+        tables.append(report.table("Zajednice i moduli ({})".format(sheet_names[i]), columns, rows, col = col))
+        col += len(module_names) + 4
+    report.write_sheet(output, "Zajednice i moduli", tables)
 
-        print("Node information succesfully written to worksheet: " + sheet_names[i])
+    print("Communities succesfully written to worksheet: Zajednice i moduli")
 
-    print("Analysis results written to Excel file: " + str(EXCEL_AUTHORS))
-    wb.close()
-    del wb
+    print("Analysis results written to: " + str(report.close_report(output)))
+
+"""
+Fused aggregation of the papers dataset shared by the modules and journals analysis.
+
+Papers are scanned once as the array of paper authors - every paper author is mapped to its module
+and faculty code, distinct (paper, module) and (paper, faculty) pairs are found with a single unique
+and all count tables are accumulated with bincount:
+    module_counts, faculty_counts = papers, articles and conference papers of every module/faculty
+    module_years, faculty_years = papers of every module/faculty per year, years in year_names
+    doc_types = papers of every document per paper type, doc_authors = paper authors of every document
+Documents are identified by their title cased names (doc_titles) in order of first appearance,
+papers without a document name are not counted.
+"""
+@instrument.stage("aggregate_papers")
+def aggregate_papers():
+    graph = loader.load_graph(GRAPH_INPUT)
+    papers = loader.load_dataset(DATASET_PAPERS)
+    print("Reading papers dataset: " + str(DATASET_PAPERS))
+
+    # author -> module -> faculty codes
+    module_codes = {module : code for (code, module) in enumerate(MODULES)}
+    faculty_codes = {faculty : code for (code, faculty) in enumerate(FACULTIES)}
+    author_modules = dict(zip(graph['names'], graph['attributes']['module']))
+    author_module = np.array([module_codes.get(author_modules.get(author), -1) for author in papers['author_names']],
+                             dtype = np.int64)
+    module_faculty = np.array([faculty_codes[module[:module.find('_')]] for module in MODULES], dtype = np.int64)
+
+    # paper type flags and year codes
+    types = papers['types'].astype(np.int64)
+    type_names = papers['type_names']
+    articles = np.isin(types, [code for (code, ptype) in enumerate(type_names) if ptype in ARTICLE_TYPES])
+    conferences = np.isin(types, [code for (code, ptype) in enumerate(type_names) if ptype in CONFERENCE_TYPES])
+    year_names, year_codes = np.unique(papers['years'], return_inverse = True)
+    year_codes = year_codes.reshape(-1)
+
+    # paper and module of every paper author, authors of unknown modules are not counted
+    author_counts = np.diff(papers['author_ptr'])
+    author_papers = np.repeat(np.arange(papers['papers']), author_counts)
+    author_groups = author_module[papers['author_ids']]
+    known = author_groups >= 0
+    author_papers, author_groups = author_papers[known], author_groups[known]
+    instrument.count("papers", papers['papers'])
+    instrument.count("paper_authors", len(author_groups))
+
+    tables = dict(year_names = [str(year) for year in year_names.tolist()], type_names = type_names)
+    for (key, groups, count) in (("module", author_groups, len(MODULES)),
+                                 ("faculty", module_faculty[author_groups], len(FACULTIES))):
+        # every paper is counted once per module/faculty
+        pairs = np.unique(author_papers * count + groups)
+        paper, group = pairs // count, pairs % count
+
+        tables[key + "_counts"] = np.stack([np.bincount(group, minlength = count),
+                                            np.bincount(group[articles[paper]], minlength = count),
+                                            np.bincount(group[conferences[paper]], minlength = count)], axis = 1)
+        tables[key + "_years"] = np.bincount(group * len(year_names) + year_codes[paper],
+                                             minlength = count * len(year_names)).reshape(count, len(year_names))
+
+    # document of every paper, documents numbered in order of first appearance
+    name_codes = dict()
+    doc_names = np.array([name_codes.setdefault(name.title(), len(name_codes)) for name in papers['doc_names']],
+                         dtype = np.int64)
+    paper_names = doc_names[papers['docs']]
+    selected = paper_names != name_codes.get("", -1)
+    names, first = np.unique(paper_names[selected], return_index = True)
+    names = names[np.argsort(first)]
+    rank = np.zeros(len(name_codes), dtype = np.int64)
+    rank[names] = np.arange(len(names))
+    paper_docs = rank[paper_names[selected]]
+
+    titles = list(name_codes)
+    tables['doc_titles'] = [titles[name] for name in names.tolist()]
+    tables['doc_types'] = np.bincount(paper_docs * len(type_names) + types[selected],
+                                      minlength = len(names) * len(type_names)).reshape(len(names), len(type_names))
+    tables['doc_authors'] = np.bincount(paper_docs, weights = author_counts[selected],
+                                        minlength = len(names)).astype(np.int64)
+    return tables
+
+def count_database(names, counts, years, year_names):
+    # count tables of modules/faculties as name -> papers, articles, conferences and papers per year
+    database = dict()
+    for (code, name) in enumerate(names):
+        database[name] = {
+            "papers" : int(counts[code, 0]),
+            "articles" : int(counts[code, 1]),
+            "conferences" : int(counts[code, 2]),
+            "years" : {year_names[year] : int(years[code, year]) for year in np.flatnonzero(years[code]).tolist()}
+        }
+
+    return database
 
 """
 Analysis of scientific production per module - department and faculty.
@@ -114,85 +306,20 @@ Results are writtent to the following tables in Excel file:
 
 - Tables with number of papers published per year for each module.
 """
-def modules_analysis():
+@instrument.stage("modules_analysis")
+def modules_analysis(tables = None, backend = "xlsx"):
     print("\nInitializing modules scientific production analysis")
+    if tables == None:
+        tables = aggregate_papers()
 
-    # Initialize module/faculty databases
-    modules = ['ETF_RTI', 'MATF_RTI', 'FON_SI', 'FON_IT', 'FON_IS']
-    database_m = dict()
-    for module in modules:
-        database_m[module] = {
-            "papers" : 0,
-            "articles" : 0,
-            "conferences" : 0,
-            "years" : dict()
-        }
-
-    faculties = ["ETF", "MATF", "FON"]
-    database_f = dict()
-    for faculty in faculties:
-        database_f[faculty] = {
-            "papers" : 0,
-            "articles" : 0,
-            "conferences" : 0,
-            "years" : dict()
-        }
-
-    # Input
-    graph = nx.read_gexf(GRAPH_INPUT)
-    wb = xlrd.open_workbook(EXCEL_PAPERS, on_demand = True)
-    sheet = wb.sheet_by_index(0)
-
-    print("Reading papers data file: " + str(EXCEL_PAPERS))
-    for row in range(1, sheet.nrows):
-        ptype = sheet.cell_value(row, 0)
-        year = sheet.cell_value(row, 1)
-        authors = sheet.cell_value(row, 3).split(", ")
-
-        # get authors modules/faculties
-        module_set = set()
-        faculty_set = set()
-        for author in authors:
-            module = graph.nodes[author]['module']
-            module_set.add(module)
-
-            faculty = module[:module.find('_')] # trim department suffix from module name
-            faculty_set.add(faculty)
-
-        # update module paper counts
-        for module in module_set:
-            database_m[module]['papers'] += 1
-
-            if ptype in ARTICLE_TYPES:
-                database_m[module]['articles'] += 1
-
-            if ptype in CONFERENCE_TYPES:
-                database_m[module]['conferences'] += 1
-
-            # add\update module paper count per year
-            database_m[module]['years'][year] = database_m[module]['years'].get(year, 0) + 1
-
-        # update faculty paper counts
-        for faculty in faculty_set:
-            database_f[faculty]['papers'] += 1
-
-            if ptype in ARTICLE_TYPES:
-                database_f[faculty]['articles'] += 1
-
-            if ptype in CONFERENCE_TYPES:
-                database_f[faculty]['conferences'] += 1
-
-            # add\update faculty paper count per year
-            database_f[faculty]['years'][year] = database_f[faculty]['years'].get(year, 0) + 1
-
-    wb.release_resources()
-    del wb
+    # module/faculty databases
+    database_m = count_database(MODULES, tables['module_counts'], tables['module_years'], tables['year_names'])
+    database_f = count_database(FACULTIES, tables['faculty_counts'], tables['faculty_years'], tables['year_names'])
 
     # Output
-    wb = xlsxwriter.Workbook(EXCEL_MODULES)
+    output = report.open_report(EXCEL_MODULES, backend)
 
     # Module tables
-    sheet = wb.add_worksheet("Naučna produkcija po modulima")
     column_args = [
         ["{}", 10, None],
         ["Broj radova", 12, {'align' : "center"}],
@@ -203,78 +330,48 @@ def modules_analysis():
     table_type = ["Katedra", "Fakultet"]
     table_pos = [0, 5] # deptartment/faculty table position in Excel file
 
+    sheet_name = "Naučna produkcija po modulima"
+    tables = []
     for i in range(0, len(table_db)):
-        # set column headers, widths and formats
-        for j in range (0, len(column_args)):
-            col = j + table_pos[i]
-            header = column_args[j][0].format(table_type[i])
-            width = column_args[j][1]
-            cell_format = wb.add_format(column_args[j][2])
-
-            sheet.write(0, col, header)
-            sheet.set_column(col, col, width, cell_format)
+        # update first header with table type
+        columns = [[header.format(table_type[i]), width, properties] for (header, width, properties) in column_args]
 
         # sort database by paper count
         items = sorted(table_db[i].items(),
                        key = lambda item : item[1]['papers'], reverse = True)
-
-        row = 1 # skip header row
-        for data in items:
-            module = data[0]
-            papers = data[1]['papers']
-            articles = data[1]['articles']
-            conferences = data[1]['conferences']
-
-            sheet.write_row(row, table_pos[i], [module, papers, articles, conferences])
-            row += 1
+        rows = [[module, data['papers'], data['articles'], data['conferences']] for (module, data) in items]
+        tables.append(report.table("{0} ({1})".format(sheet_name, table_type[i]), columns, rows, col = table_pos[i]))
+    report.write_sheet(output, sheet_name, tables)
     print("Module tables created.")
 
     # Year tables
-    sheet = wb.add_worksheet("Naučna produkcija po godinama")
     column_args = [
         ["Godina", 11, {'align' : "right"}],
         ["Broj radova", 13, {'align' : "left"}]
     ]
-    table_db = [database_m, database_f]
     table_pos = [0, 11] # deptartment/faculty table position
 
+    sheet_name = "Naučna produkcija po godinama"
+    tables = []
     for i in range(0, len(table_db)):
         sub_pos = table_pos[i] # year/count subtable position
 
         for key in table_db[i].keys():
-            # set column headers, widths and formats
-            for j in range (0, len(column_args)):
-                col = j + sub_pos
-                header = column_args[j][0]
-                width = column_args[j][1]
-                cell_format = wb.add_format(column_args[j][2])
-
-                sheet.write(1, col, header)
-                sheet.set_column(col, col, width, cell_format)
-
-            # merge header cells (row1, col1, row2, col2)
-            sheet.merge_range(0, sub_pos, 0, sub_pos + 1,
-                              str(key), wb.add_format({'align' : "center"}))
-
             # dict containing year info
             years_dict = table_db[i][key]['years']
             # sort years by paper count
             items = sorted(years_dict.items(),
                            key = lambda item : (item[1], item[0]), reverse = True)
+            rows = [[year, count] for (year, count) in items]
 
-            row = 2 # skip two header rows
-            for data in items:
-                year = data[0]
-                count = data[1]
-                sheet.write_row(row, sub_pos, [year, count])
-                row += 1
-
+            # module name is merged above the year/count headers
+            tables.append(report.table("{0} ({1})".format(sheet_name, key), column_args, rows,
+                                       title = str(key), col = sub_pos))
             sub_pos += 2 # position of next year/count subtable
+    report.write_sheet(output, sheet_name, tables)
     print("Year tables created.")
 
-    print("Analysis results written to Excel file: " + str(EXCEL_MODULES))
-    wb.close()
-    del wb
+    print("Analysis results written to: " + str(report.close_report(output)))
 
 """
 Analysis of scientific paper publishing in journals and at conferences.
@@ -288,39 +385,29 @@ For each journal/conference the following information is listed:
 
 Additionally average number of authors per paper is calculated for each publishing type.
 Results are written to the separate worksheets for each publishing type inside the Excel file.
+
+Journals graph metrics - degree, weighted degree, connected component and local clustering
+coefficient of every journal - are written to an additional worksheet.
 """
-def journals_analysis():
+@instrument.stage("journals_analysis")
+def journals_analysis(tables = None, backend = "xlsx"):
     print("\nInitializing journal/conference publishing analysis")
-    database = dict() # document database
-
-    # Input
-    wb = xlrd.open_workbook(EXCEL_PAPERS, on_demand = True)
-    sheet = wb.sheet_by_index(0)
-
-    print("Reading papers data file: " + str(EXCEL_PAPERS))
-    for row in range(1, sheet.nrows):
-        ptype = sheet.cell_value(row, 0)
-        authors = sheet.cell_value(row, 3).split(", ")
-        docname = sheet.cell_value(row, 4).title()
-
-        if docname == "":
-            continue
-
-        # get document database entry, or initialize it with empty dict
-        doc_entry = database.get(docname, {'types' : dict(), 'papers' : 0, 'authors' : 0})
-        doc_entry['types'][ptype] = doc_entry['types'].get(ptype, 0) + 1
-        doc_entry['papers'] += 1
-        doc_entry['authors'] += len(authors)
-        database[docname] = doc_entry
-
-    wb.release_resources()
-    del wb
+    if tables == None:
+        tables = aggregate_papers()
+
+    # document database
+    database = dict()
+    type_names = tables['type_names']
+    for (doc, docname) in enumerate(tables['doc_titles']):
+        doc_types = tables['doc_types'][doc]
+        database[docname] = {
+            'types' : {type_names[ptype] : int(doc_types[ptype]) for ptype in np.flatnonzero(doc_types).tolist()},
+            'papers' : int(doc_types.sum()),
+            'authors' : int(tables['doc_authors'][doc])
+        }
 
     # Output
-    wb = xlsxwriter.Workbook(EXCEL_JOURNALS)
-    sheet_d = wb.add_worksheet("Sva dokumenta")
-    sheet_j = wb.add_worksheet("Časopisi")
-    sheet_c = wb.add_worksheet("Konferencije")
+    output = report.open_report(EXCEL_JOURNALS, backend)
 
     # sort documents by paper count
     doc_list = sorted(database.items(),
@@ -328,9 +415,10 @@ def journals_analysis():
 
     total_papers_d = total_papers_c = total_papers_j = 0
     total_authors_d = total_authors_c = total_authors_j = 0
-    row_d = row_c = row_j = 1
+    lines_d, lines_j, lines_c = [], [], []
 
     print("Creating publishing data tables.")
+    instrument.count("documents", len(doc_list))
     for doc_entry in doc_list:
         name = doc_entry[0]
         types = doc_entry[1]['types']
@@ -347,22 +435,19 @@ def journals_analysis():
         line = [name, doctype, papers, authors, "{:.2f}".format(avg_authors)]
 
         # documents sheet
-        sheet_d.write_row(row_d, 0, line)
-        row_d += 1
+        lines_d.append(line)
         total_papers_d += papers
         total_authors_d += authors
 
         # conferences sheet
         if doctype in CONFERENCE_TYPES:
-            sheet_c.write_row(row_c, 0, line)
-            row_c += 1
+            lines_c.append(line)
             total_papers_c += papers
             total_authors_c += authors
 
         # journals sheet
         elif doctype in ARTICLE_TYPES:
-            sheet_j.write_row(row_j, 0, line)
-            row_j += 1
+            lines_j.append(line)
             total_papers_j += papers
             total_authors_j += authors
 
@@ -384,26 +469,72 @@ def journals_analysis():
     first_column = ["Dokument", "Časopis", "Konferencija"]
     last_column  = ["svim radovima", "časopisima", "konferencijama"]
 
-    sheets = [sheet_d, sheet_j, sheet_c]
+    sheet_names = ["Sva dokumenta", "Časopisi", "Konferencije"]
+    sheet_lines = [lines_d, lines_j, lines_c]
     averages = [document_avg, journal_avg, conference_avg]
 
-    for i in range(0, len(sheets)):
-        # set column headers, widths and formats
-        for col in range (0, len(column_args)):
-            header = column_args[col][0].format(first_column[i], last_column[i])
-            width = column_args[col][1]
-            cell_format = wb.add_format(column_args[col][2])
+    for i in range(0, len(sheet_names)):
+        columns = [[header.format(first_column[i], last_column[i]), width, properties]
+                   for (header, width, properties) in column_args]
 
-            sheets[i].write(0, col, header)
-            sheets[i].set_column(col, col, width, cell_format)
+        # total average is written next to the first document
+        summary = [(columns[-1], averages[i])]
+        report.write_sheet(output, sheet_names[i],
+                           [report.table(sheet_names[i], columns[:-1], sheet_lines[i], summary = summary)])
 
-        # write total average
-        sheets[i].write(1, len(column_args) - 1, averages[i])
+    # journals graph metrics
+    print("Reading graph file: " + str(JOURNALS_INPUT))
+    graph = loader.load_graph(JOURNALS_INPUT)
+    graph_metrics = metrics.graph_metrics(graph)
 
-    print("Analysis results written to Excel file: " + str(EXCEL_JOURNALS))
-    wb.close()
-    del wb
+    column_args = [
+        ["Časopis", 55, {'align' : "left"}],
+        ["Broj radova", 15, {'align' : "center"}],
+        ["Broj povezanih časopisa", 22, {'align' : "center"}],
+        ["Broj zajedničkih autora", 22, {'align' : "center"}],
+        ["Komponenta", 12, {'align' : "center"}],
+        ["Koeficijent klasterovanja", 24, {'align' : "center"}],
+        ["Zajednica", 12, {'align' : "center"}]
+    ]
+    summary_args = [
+        ["Prosečan koeficijent klasterovanja", 34, {'align' : "center"}],
+        ["Broj komponenti", 16, {'align' : "center"}],
+        ["Najveća komponenta", 20, {'align' : "center"}],
+        ["Broj zajednica", 16, {'align' : "center"}],
+        ["Modularnost", 14, {'align' : "center"}]
+    ]
 
-authors_analysis()
-modules_analysis()
-journals_analysis()
+    # sort journals by paper count
+    counts = list(graph['attributes']['count'])
+    columns = [graph_metrics[key].tolist() for key in ("degree", "weighted_degree", "component", "clustering")]
+    communities = graph_communities(graph)
+    nodes = sorted(range(len(graph['names'])), key = lambda node : counts[node], reverse = True)
+    rows = ([graph['names'][node], int(counts[node])] + [column[node] for column in columns[:3]]
+            + ["{:.4f}".format(columns[3][node]), int(communities[node])] for node in nodes)
+
+    summary = [graph_metrics['average_clustering'], len(graph_metrics['component_sizes']),
+               graph_metrics['component_sizes'].max(initial = 0),
+               int(communities.max(initial = -1)) + 1, community.modularity(graph, communities)]
+    report.write_sheet(output, "Graf časopisa",
+                       [report.table("Graf časopisa", column_args, rows, summary = list(zip(summary_args, summary)))])
+
+    print("Analysis results written to: " + str(report.close_report(output)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Analyzes coauthorship and journal networks.")
+    parser.add_argument("-k", "--samples", type = int,
+                        help = "approximate centralities from this many sampled BFS sources (default: exact)")
+    parser.add_argument("-j", "--processes", type = int, default = 1,
+                        help = "number of processes computing centralities (default: %(default)s)")
+    parser.add_argument("-f", "--format", choices = report.BACKENDS, default = "xlsx",
+                        help = "report format - Excel workbooks, CSV file directories or JSON lines files "
+                               "(default: %(default)s)")
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    instrument.start(args.metrics, args.profile)
+    authors_analysis(args.samples, args.processes, args.format)
+    tables = aggregate_papers()
+    modules_analysis(tables, args.format)
+    journals_analysis(tables, args.format)
+    instrument.finish(args.metrics, args.profile)
@@ -0,0 +1,203 @@
+import argparse
+import ast
+import hashlib
+import os
+import pickle
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import cleaner
+import graph_authors
+import graph_journals
+import loader
+import network_analysis
+
+FILE_DIR = Path(__file__).parent
+
+STATE_OUTPUT = (FILE_DIR/"../results/pipeline.state").resolve() # fingerprints of the last successful stage runs
+
+'''
+Pipeline runner - runs the pipeline scripts in the order of their dependencies:
+
+    clean -> authors_graph  -> analysis
+          -> journals_graph ->
+
+Stages - (stage name, script, dependencies, input files, output files).
+A stage is fingerprinted by the SHA-256 hashes of its script with the local modules it imports and of its
+input files, inputs written by earlier stages are hashed after those stages finish. A stage is skipped while
+its fingerprint and the hashes of its outputs equal the ones of its last successful run. Binary outputs
+are written deterministically, so a re-run stage with unchanged outputs doesn't re-run the later stages.
+
+Every stage runs as a separate process as soon as its dependencies finish - the graph scripts run
+concurrently and cleaning and analysis use all cores. Output of a stage is printed when it finishes,
+stages depending on a failed stage are not run.
+'''
+
+SUBGRAPHS = [graph_authors.output_path(template, name.lower())
+             for name in graph_authors.FACULTY_GROUPS
+             for template in (graph_authors.SUBGRAPH_STORE, graph_authors.SUBGRAPH_OUTPUT)]
+
+STAGES = [
+    ("clean", "cleaner.py", [],
+     [cleaner.EXCEL_AUTHORS, cleaner.EXCEL_PAPERS],
+     [cleaner.EXCEL_OUTPUT, cleaner.DATASET_OUTPUT]),
+    ("authors_graph", "graph_authors.py", ["clean"],
+     [graph_authors.EXCEL_AUTHORS, graph_authors.DATASET_PAPERS],
+     [graph_authors.GRAPH_STORE, graph_authors.GRAPH_OUTPUT] + SUBGRAPHS),
+    ("journals_graph", "graph_journals.py", ["clean"],
+     [graph_journals.EXCEL_AUTHORS, graph_journals.DATASET_PAPERS],
+     [graph_journals.GRAPH_STORE, graph_journals.GRAPH_OUTPUT]),
+    ("analysis", "network_analysis.py", ["authors_graph", "journals_graph"],
+     [network_analysis.DATASET_PAPERS, network_analysis.GRAPH_INPUT, network_analysis.ETF_INPUT,
+      network_analysis.MATF_INPUT, network_analysis.FON_INPUT, network_analysis.JOURNALS_INPUT],
+     [network_analysis.EXCEL_AUTHORS, network_analysis.EXCEL_MODULES, network_analysis.EXCEL_JOURNALS])
+]
+
+# scripts with a number of processes option, outputs don't depend on it so it is not fingerprinted
+PROCESS_OPTIONS = {"clean" : "-j", "analysis" : "-j"}
+
+def code_files(script):
+    # script and the local modules it imports, directly or through other modules
+    files = []
+    pending = [FILE_DIR/script]
+    while pending:
+        path = pending.pop()
+        if path in files:
+            continue
+        files.append(path)
+
+        for node in ast.walk(ast.parse(path.read_text(encoding = "utf-8"))):
+            if isinstance(node, ast.Import):
+                modules = [FILE_DIR/(alias.name + ".py") for alias in node.names]
+                pending.extend(module for module in modules if module.exists())
+
+    return sorted(files)
+
+def hash_files(paths):
+    # content hash of every file, None for missing files
+    return {str(path) : (loader.file_hash(path) if Path(path).exists() else None) for path in paths}
+
+def fingerprint(stage):
+    (name, script, dependencies, inputs, outputs) = stage
+    digest = hashlib.sha256()
+    for (path, value) in sorted(hash_files(code_files(script) + inputs).items()):
+        digest.update("{0} {1}\n".format(Path(path).name, value).encode())
+    return digest.hexdigest()
+
+def load_state():
+    if not STATE_OUTPUT.exists():
+        return dict()
+
+    with open(STATE_OUTPUT, "rb") as file:
+        return pickle.load(file)
+
+def save_state(state):
+    with open(STATE_OUTPUT, "wb") as file:
+        pickle.dump(state, file)
+
+def up_to_date(state, stage, digest):
+    # same inputs as the last run and outputs not changed since
+    (name, script, dependencies, inputs, outputs) = stage
+    if name not in state or state[name]['fingerprint'] != digest:
+        return False
+
+    current = hash_files(outputs)
+    return None not in current.values() and current == state[name]['outputs']
+
+def run_stage(stage, processes):
+    # (return code, output, wall time) of the stage script
+    (name, script, dependencies, inputs, outputs) = stage
+    command = [sys.executable, str(FILE_DIR/script)]
+    if name in PROCESS_OPTIONS:
+        command += [PROCESS_OPTIONS[name], str(processes)]
+
+    wall = time.perf_counter()
+    result = subprocess.run(command, cwd = FILE_DIR, stdout = subprocess.PIPE, stderr = subprocess.STDOUT, text = True)
+    return result.returncode, result.stdout, time.perf_counter() - wall
+
+def plan(force = None):
+    # stages that would run - out of date, forced or depending on a stage that would run
+    state = load_state()
+    stale = set()
+    for stage in STAGES:
+        (name, script, dependencies, inputs, outputs) = stage
+        if any(dependency in stale for dependency in dependencies):
+            stale.add(name)
+            print("{0:16} would run after {1}".format(name, ", ".join(d for d in dependencies if d in stale)))
+        elif (force != None and (force == [] or name in force)) or not up_to_date(state, stage, fingerprint(stage)):
+            stale.add(name)
+            print("{0:16} would run".format(name))
+        else:
+            print("{0:16} up to date".format(name))
+
+def run_pipeline(processes = None, force = None):
+    # returns names of failed stages
+    processes = processes or os.cpu_count()
+    state = load_state()
+    finished = set() # stages that ran or were skipped
+    failed = []
+    started = set()
+    running = dict() # future -> (stage, fingerprint)
+
+    with ThreadPoolExecutor(len(STAGES)) as pool:
+        while True:
+            # start every stage with finished dependencies, skipped stages can make further stages ready
+            ready = True
+            while ready:
+                ready = False
+                for stage in STAGES:
+                    (name, script, dependencies, inputs, outputs) = stage
+                    if name in started or not all(dependency in finished for dependency in dependencies):
+                        continue
+
+                    started.add(name)
+                    digest = fingerprint(stage)
+                    forced = force != None and (force == [] or name in force)
+                    if not forced and up_to_date(state, stage, digest):
+                        print("Stage {0} is up to date, skipped".format(name))
+                        finished.add(name)
+                        ready = True
+                    else:
+                        print("Running stage {0}: {1}".format(name, script))
+                        running[pool.submit(run_stage, stage, processes)] = (stage, digest)
+
+            if not running:
+                break
+
+            done, pending = wait(running, return_when = FIRST_COMPLETED)
+            for future in done:
+                (stage, digest) = running.pop(future)
+                (name, script, dependencies, inputs, outputs) = stage
+                code, output, wall = future.result()
+                print("\n=== {0} ({1:.1f} s) ===\n{2}".format(name, wall, output.rstrip()))
+
+                if code != 0:
+                    print("Stage {0} failed with exit code {1}".format(name, code))
+                    state.pop(name, None)
+                    failed.append(name)
+                else:
+                    state[name] = dict(fingerprint = digest, outputs = hash_files(outputs))
+                    finished.add(name)
+                save_state(state)
+
+    skipped = [name for (name, *stage) in STAGES if name not in started]
+    if skipped:
+        print("Stages not run after failures: " + ", ".join(skipped))
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Runs the pipeline stages whose inputs changed since the last run.")
+    parser.add_argument("-j", "--processes", type = int, default = 0,
+                        help = "number of cleaning and analysis processes, 0 uses all cores (default: %(default)s)")
+    parser.add_argument("-f", "--force", nargs = "*", choices = [stage[0] for stage in STAGES], metavar = "STAGE",
+                        help = "run the given stages (all if none are given) even if they are up to date")
+    parser.add_argument("-n", "--dry-run", action = "store_true", help = "only print the stages that would run")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        plan(args.force)
+    else:
+        sys.exit(1 if run_pipeline(args.processes, args.force) else 0)
@@ -0,0 +1,257 @@
+import argparse
+import json
+import numpy as np
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import dataset
+import loader
+import metrics
+
+FILE_DIR = Path(__file__).parent
+
+DATASET_PAPERS = (FILE_DIR/"../data/UB_cs_papers_cleaned.npz").resolve()
+GRAPH_INPUT = (FILE_DIR/"../results/authors_graph.npz").resolve()
+JOURNALS_INPUT = (FILE_DIR/"../results/journals_graph.npz").resolve()
+
+'''
+Query service over the cleaned dataset and the authors and journals graphs.
+
+Inputs are loaded once and indexed in CSR form - key -> sorted array of values:
+    author_papers   = papers of every author
+    module_papers   = papers with at least one author of the module
+    year_papers     = papers published in the year
+    journal_authors = authors that published in the journal (document), author_journals the reverse
+    author_graph, journal_graph = CSR adjacency of the graphs, neighbors with edge weights
+Query results are kept in an LRU cache of CACHE_SIZE entries per query and must not be modified.
+
+Queries:
+    coauthors(author)               = coauthors and number of papers written together
+    papers(author, module, year)    = papers matching all given filters
+    journal_authors(journal)        = authors that published in the journal
+    shared_journals(first, second)  = journals both authors published in
+    related_journals(journal)       = journals linked in the journals graph and number of shared authors
+
+HTTP API - GET /<query>?<parameter>=<value>, responses are JSON objects with result or error:
+    /coauthors?author=
+    /papers?author=&module=&year=
+    /journal_authors?journal=
+    /shared_journals?first=&second=
+    /related_journals?journal=
+'''
+
+CACHE_SIZE = 4096 # cached results of every query
+HOST = "127.0.0.1"
+PORT = 8080
+UNKNOWN_MODULE = "unknown" # module of coauthors missing from the authors workbook
+
+index = None # loaded inputs and indexes
+
+def csr_index(keys, values, count):
+    # (ptr, values) - distinct values of every key sorted, values of key are values[ptr[key]:ptr[key + 1]]
+    values = np.asarray(values, dtype = np.int64)
+    width = values.max(initial = 0) + 1
+    pairs = np.unique(np.asarray(keys, dtype = np.int64) * width + values)
+    ptr = np.concatenate([[0], np.cumsum(np.bincount(pairs // width, minlength = count))])
+    return ptr, pairs % width
+
+def lookup(csr, key):
+    (ptr, values) = csr
+    return values[ptr[key]:ptr[key + 1]]
+
+def name_code(codes, name, kind):
+    if name not in codes:
+        raise KeyError("unknown {0}: {1}".format(kind, name))
+    return codes[name]
+
+def load_index():
+    global index
+    papers = loader.load_dataset(DATASET_PAPERS)
+    authors = loader.load_graph(GRAPH_INPUT)
+    journals = loader.load_graph(JOURNALS_INPUT)
+
+    # paper of every paper author
+    author_counts = np.diff(papers['author_ptr'])
+    entry_papers = np.repeat(np.arange(papers['papers']), author_counts)
+    entry_authors = papers['author_ids']
+    author_codes = {name : author for (author, name) in enumerate(papers['author_names'])}
+
+    # module of every dataset author, coauthors missing from the authors workbook are in UNKNOWN_MODULE
+    author_modules = dict(zip(authors['names'], authors['attributes']['module']))
+    author_modules = [author_modules.get(name) or UNKNOWN_MODULE for name in papers['author_names']]
+    module_names = sorted(set(author_modules))
+    module_codes = {module : code for (code, module) in enumerate(module_names)}
+    author_module = np.array([module_codes[module] for module in author_modules], dtype = np.int64)
+
+    # title cased document names as in the journals graph
+    journal_codes = dict()
+    doc_journals = np.array([journal_codes.setdefault(name.title(), len(journal_codes))
+                             for name in papers['doc_names']], dtype = np.int64)
+    entry_journals = doc_journals[papers['docs']][entry_papers]
+
+    # years in sorted order
+    year_order = np.argsort(papers['years'], kind = "stable")
+
+    index = dict(
+        papers = papers,
+        titles = dataset.paper_titles(papers),
+        author_names = papers['author_names'],
+        author_codes = author_codes,
+        module_codes = module_codes,
+        journal_names = list(journal_codes),
+        journal_codes = journal_codes,
+        author_papers = csr_index(entry_authors, entry_papers, len(author_codes)),
+        module_papers = csr_index(author_module[entry_authors], entry_papers, len(module_codes)),
+        year_papers = (papers['years'][year_order], year_order),
+        journal_authors = csr_index(entry_journals, entry_authors, len(journal_codes)),
+        author_journals = csr_index(entry_authors, entry_journals, len(author_codes)),
+        author_graph = metrics.adjacency(authors),
+        author_nodes = {name : node for (node, name) in enumerate(authors['names'])},
+        graph_authors = authors['names'],
+        journal_graph = metrics.adjacency(journals),
+        journal_nodes = {name : node for (node, name) in enumerate(journals['names'])},
+        graph_journals = journals['names']
+    )
+
+    # results of previous inputs
+    for query in QUERIES.values():
+        query.cache_clear()
+
+def neighbors(matrix, names, node):
+    # (name, weight) of node neighbors, heaviest first
+    start, end = matrix.indptr[node], matrix.indptr[node + 1]
+    pairs = zip([names[neighbor] for neighbor in matrix.indices[start:end].tolist()], matrix.data[start:end].tolist())
+    return sorted(pairs, key = lambda pair : (-pair[1], pair[0]))
+
+def paper_record(paper):
+    papers = index['papers']
+    ptr = papers['author_ptr']
+    return {
+        "title" : index['titles'][paper],
+        "year" : int(papers['years'][paper]),
+        "type" : papers['type_names'][papers['types'][paper]],
+        "document" : papers['doc_names'][papers['docs'][paper]],
+        "authors" : [index['author_names'][author]
+                     for author in papers['author_ids'][ptr[paper]:ptr[paper + 1]].tolist()]
+    }
+
+@lru_cache(maxsize = CACHE_SIZE)
+def coauthors(author):
+    node = name_code(index['author_nodes'], author, "author")
+    return [{"author" : name, "papers" : weight}
+            for (name, weight) in neighbors(index['author_graph'], index['graph_authors'], node)]
+
+@lru_cache(maxsize = CACHE_SIZE)
+def papers(author = None, module = None, year = None):
+    # papers matching all filters, in dataset order
+    selected = np.arange(index['papers']['papers'])
+    if author != None:
+        selected = lookup(index['author_papers'], name_code(index['author_codes'], author, "author"))
+    if module != None:
+        module_papers = lookup(index['module_papers'], name_code(index['module_codes'], module, "module"))
+        selected = np.intersect1d(selected, module_papers, assume_unique = True)
+    if year != None:
+        (years, order) = index['year_papers']
+        year_papers = np.sort(order[np.searchsorted(years, year):np.searchsorted(years, year, side = "right")])
+        selected = np.intersect1d(selected, year_papers, assume_unique = True)
+
+    return [paper_record(paper) for paper in selected.tolist()]
+
+@lru_cache(maxsize = CACHE_SIZE)
+def journal_authors(journal):
+    authors = lookup(index['journal_authors'], name_code(index['journal_codes'], journal, "journal"))
+    return sorted(index['author_names'][author] for author in authors.tolist())
+
+@lru_cache(maxsize = CACHE_SIZE)
+def shared_journals(first, second):
+    first = lookup(index['author_journals'], name_code(index['author_codes'], first, "author"))
+    second = lookup(index['author_journals'], name_code(index['author_codes'], second, "author"))
+    journals = np.intersect1d(first, second, assume_unique = True)
+    return sorted(index['journal_names'][journal] for journal in journals.tolist() if index['journal_names'][journal])
+
+@lru_cache(maxsize = CACHE_SIZE)
+def related_journals(journal):
+    node = name_code(index['journal_nodes'], journal, "journal")
+    return [{"journal" : name, "authors" : weight}
+            for (name, weight) in neighbors(index['journal_graph'], index['graph_journals'], node)]
+
+QUERIES = {
+    "coauthors" : coauthors,
+    "papers" : papers,
+    "journal_authors" : journal_authors,
+    "shared_journals" : shared_journals,
+    "related_journals" : related_journals
+}
+
+def run_query(name, parameters):
+    # JSON response and HTTP status of a query, unknown names and bad parameters are errors
+    if name not in QUERIES:
+        return {"error" : "unknown query: " + name}, 404
+
+    # parameters not given on the command line are None
+    parameters = {key : value for (key, value) in parameters.items() if value != None}
+    try:
+        if 'year' in parameters:
+            parameters['year'] = int(parameters['year'])
+        return {"result" : QUERIES[name](**parameters)}, 200
+    except KeyError as error:
+        return {"error" : error.args[0]}, 404
+    except (TypeError, ValueError) as error:
+        return {"error" : str(error)}, 400
+
+class QueryHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        parameters = {key : values[-1] for (key, values) in parse_qs(url.query).items()}
+        response, status = run_query(url.path.strip("/"), parameters)
+
+        body = json.dumps(response, ensure_ascii = False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # requests are not logged, dashboards poll constantly
+
+def serve(host = HOST, port = PORT):
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    print("Indexed {0} papers: {1}".format(index['papers']['papers'], DATASET_PAPERS))
+    print("Serving queries at: http://{0}:{1}/".format(host, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Queries the cleaned dataset and network graphs.")
+    commands = parser.add_subparsers(dest = "query", required = True)
+    command = commands.add_parser("coauthors", help = "coauthors of the author")
+    command.add_argument("author")
+    command = commands.add_parser("papers", help = "papers matching all given filters")
+    command.add_argument("-a", "--author")
+    command.add_argument("-m", "--module")
+    command.add_argument("-y", "--year", type = int)
+    command = commands.add_parser("journal_authors", help = "authors that published in the journal")
+    command.add_argument("journal")
+    command = commands.add_parser("shared_journals", help = "journals both authors published in")
+    command.add_argument("first")
+    command.add_argument("second")
+    command = commands.add_parser("related_journals", help = "journals with shared authors")
+    command.add_argument("journal")
+    command = commands.add_parser("serve", help = "serve queries over HTTP")
+    command.add_argument("--host", default = HOST, help = "(default: %(default)s)")
+    command.add_argument("--port", type = int, default = PORT, help = "(default: %(default)s)")
+    args = vars(parser.parse_args())
+
+    load_index()
+    query = args.pop("query")
+    if query == "serve":
+        serve(args['host'], args['port'])
+    else:
+        response, status = run_query(query, args)
+        print(json.dumps(response, ensure_ascii = False, indent = 2))
@@ -0,0 +1,300 @@
+import csv
+import os
+import re
+import tempfile
+import zipfile
+from array import array
+import xml.etree.ElementTree as ET
+from pathlib import PurePosixPath
+
+import instrument
+
+'''
+Streaming readers for Scopus paper exports.
+
+Rows are read one at a time and yielded as tuples, so memory use doesn't grow
+with the number of rows. The shared string table of Excel workbooks is needed for
+random access by the rows - tables up to SHARED_STRINGS_MEMORY bytes are kept in
+memory, larger tables are written to a temporary file and only their offsets
+(8 bytes per string) are kept in memory. Supported export formats:
+    .xlsx - Excel workbook (first worksheet)
+    .csv  - Scopus CSV export
+    .bib  - Scopus BibTeX export
+
+Paper rows are yielded in the cleaner line layout:
+    (Type, Main Author, Year, Title, Authors, Document Name)
+
+Malformed BibTeX entries (unclosed values, entries truncated by the end of the export)
+are skipped and counted as rejected rows.
+
+CSV and BibTeX exports can also be read from a byte offset of a row start, so rows
+appended to an export are read without reading the rows before them.
+'''
+
+NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# column headers of paper rows read from CSV/BibTeX exports
+PAPER_HEADER = ("Tip rada", "UB zaposleni", "Godina", "Naslov", "Autori", "Ime dokumenta")
+PAPER_SHEET = "Radovi"
+
+# paper columns in the Excel export - Type, Main Author, Year, Title, Authors, Document Name
+XLSX_COLUMNS = (5, 0, 2, 1, 3, 9)
+
+# paper columns in the Scopus CSV export, main author column is present only in UB exports
+CSV_COLUMNS = ("Document Type", "UB zaposleni", "Year", "Title", "Authors", "Source title")
+
+# paper fields in the Scopus BibTeX export, proceedings can be listed as booktitle instead of journal
+BIB_FIELDS = ("document_type", "ub_zaposleni", "year", "title", "author", "journal")
+BIB_DOCUMENT = "booktitle"
+
+SEEKABLE_FORMATS = (".csv", ".bib") # exports that can be read from a byte offset
+
+SHARED_STRINGS_MEMORY = 64 << 20 # uncompressed size of shared string tables kept in memory, in bytes
+
+BIB_FIELD = re.compile(r'\s*,?\s*([\w-]+)\s*=\s*')
+
+def column_index(ref):
+    # convert cell reference letters to zero based column index - "C12" -> 2
+    index = 0
+    for char in ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + (ord(char.upper()) - ord('A') + 1)
+    return index - 1
+
+def xlsx_sheet(archive, sheet = 0):
+    # find name and archive path of the worksheet
+    workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+    sheets = workbook.find(NS_MAIN + "sheets")
+    entry = sheets[sheet]
+
+    rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id") : rel.get("Target") for rel in rels.iter(NS_PKG_REL + "Relationship")}
+    target = targets[entry.get(NS_REL + "id")]
+    path = target.lstrip("/") if target.startswith("/") else str(PurePosixPath("xl")/target)
+
+    return entry.get("name"), path
+
+def shared_strings(archive):
+    # shared string table - concatenate rich text runs, skip phonetic runs
+    with archive.open("xl/sharedStrings.xml") as file:
+        for (event, elem) in ET.iterparse(file):
+            if elem.tag == NS_MAIN + "si":
+                texts = [child if (child.tag == NS_MAIN + "t") else child.find(NS_MAIN + "t")
+                         for child in elem if child.tag in (NS_MAIN + "t", NS_MAIN + "r")]
+                yield "".join(text.text or "" for text in texts if text is not None)
+                elem.clear()
+
+def xlsx_strings(archive, spill):
+    # lookup function of shared strings by index, large tables are indexed in the spill file
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return [].__getitem__
+    if archive.getinfo("xl/sharedStrings.xml").file_size <= SHARED_STRINGS_MEMORY:
+        return list(shared_strings(archive)).__getitem__
+
+    offsets = array("q", [0])
+    for text in shared_strings(archive):
+        spill.write(text.encode("utf-8"))
+        offsets.append(spill.tell())
+
+    def lookup(index):
+        spill.seek(offsets[index])
+        return spill.read(offsets[index + 1] - offsets[index]).decode("utf-8")
+
+    return lookup
+
+def xlsx_value(cell, strings):
+    ctype = cell.get("t", "n")
+
+    if ctype == "inlineStr":
+        return "".join(text.text or "" for text in cell.iter(NS_MAIN + "t"))
+
+    value = cell.find(NS_MAIN + "v")
+    if value is None or value.text is None:
+        return ""
+    if ctype == "s":
+        return strings(int(value.text))
+    if ctype == "n":
+        return float(value.text)
+    if ctype == "b":
+        return int(value.text)
+
+    return value.text # formula strings and errors
+
+def sheet_name(path):
+    if path.suffix.lower() == ".xlsx":
+        with zipfile.ZipFile(path) as archive:
+            return xlsx_sheet(archive)[0]
+    return PAPER_SHEET
+
+def read_xlsx(path, sheet = 0):
+    with zipfile.ZipFile(path) as archive, tempfile.TemporaryFile() as spill:
+        strings = xlsx_strings(archive, spill)
+        sheet_path = xlsx_sheet(archive, sheet)[1]
+
+        with archive.open(sheet_path) as file:
+            parent = None
+            for (event, elem) in ET.iterparse(file, events = ("start", "end")):
+                if event == "start":
+                    if elem.tag == NS_MAIN + "sheetData":
+                        parent = elem
+                    continue
+
+                if elem.tag != NS_MAIN + "row":
+                    continue
+
+                # read row cells, fill missing cells with empty strings
+                row = []
+                for cell in elem.iter(NS_MAIN + "c"):
+                    ref = cell.get("r")
+                    col = column_index(ref) if ref else len(row)
+                    row.extend([""] * (col - len(row)))
+                    row.append(xlsx_value(cell, strings))
+
+                yield tuple(row)
+
+                # free already read rows
+                parent.clear()
+
+def read_lines(file):
+    # binary lines are decoded one at a time, so the file position stays at the end of the read lines
+    for line in file:
+        yield line.decode("utf-8-sig")
+
+def read_csv(path, offset = 0):
+    # header row and rows from the byte offset, the reader reads only the lines of the rows it returns
+    with open(path, "rb") as file:
+        rows = csv.reader(read_lines(file))
+        header = next(rows, None)
+        if header == None:
+            return
+
+        yield tuple(header)
+        if offset > 0:
+            file.seek(offset)
+        for row in rows:
+            yield tuple(row)
+
+def bib_value(text, pos):
+    # read braced, quoted or bare field value starting at pos, None if the value is not closed
+    if pos >= len(text):
+        return None
+
+    if text[pos] == "{":
+        depth = 0
+        for end in range(pos, len(text)):
+            if text[end] == "{":
+                depth += 1
+            elif text[end] == "}":
+                depth -= 1
+                if depth == 0:
+                    return text[pos + 1:end].replace("{", "").replace("}", ""), end + 1
+        return None
+    elif text[pos] == '"':
+        end = text.find('"', pos + 1)
+        if end == -1:
+            return None
+        return text[pos + 1:end], end + 1
+
+    end = pos
+    while end < len(text) and text[end] not in ",}":
+        end += 1
+    return text[pos:end].strip(), end
+
+def bib_entry(text):
+    # parse entry "@type{key, field = {value}, ...}" to field dict, None for malformed entries
+    fields = dict()
+    pos = text.find(",") + 1
+    while True:
+        match = BIB_FIELD.match(text, pos)
+        if match == None:
+            break
+        value = bib_value(text, match.end())
+        if value == None:
+            return None
+        value, pos = value
+        fields[match.group(1).lower()] = " ".join(value.split())
+
+    return fields
+
+def read_bibtex(path, offset = 0):
+    with open(path, "rb") as file:
+        file.seek(offset)
+        entry = []
+        depth = 0
+
+        # collect lines of one entry until its braces are balanced
+        for line in read_lines(file):
+            if not entry and not line.lstrip().startswith("@"):
+                continue
+
+            # entry start before the braces of the previous entry are balanced - previous entry is malformed
+            if entry and line.startswith("@"):
+                yield None
+                entry = []
+                depth = 0
+
+            entry.append(line)
+            depth += line.count("{") - line.count("}")
+            if depth <= 0:
+                yield bib_entry("".join(entry))
+                entry = []
+                depth = 0
+
+        # entry truncated by the end of the export
+        if entry:
+            yield None
+
+def csv_authors(authors):
+    # "Schreck P.; Marinković V." -> "Schreck P. and Marinković V."
+    separator = ";" if (";" in authors) else ", "
+    names = [name.strip() for name in authors.split(separator)]
+
+    return " and ".join(name for name in names if name != "")
+
+def resume_offset(path):
+    # byte offset rows appended to the export can be read from - the end of the export if it ends
+    # with a line break, 0 for exports that can't be read from an offset
+    size = os.path.getsize(path)
+    if path.suffix.lower() not in SEEKABLE_FORMATS or size == 0:
+        return 0
+
+    with open(path, "rb") as file:
+        file.seek(size - 1)
+        return size if (file.read(1) == b"\n") else 0
+
+def read_papers(path, offset = 0):
+    # offset - byte offset of the first read row in CSV/BibTeX exports, header is always yielded
+    suffix = path.suffix.lower()
+
+    if suffix == ".xlsx":
+        if offset > 0:
+            raise ValueError("Excel exports can't be read from an offset: " + str(path))
+        for row in read_xlsx(path):
+            row = row + ("",) * (max(XLSX_COLUMNS) + 1 - len(row))
+            yield tuple(row[col] for col in XLSX_COLUMNS)
+
+    elif suffix == ".csv":
+        rows = read_csv(path, offset)
+        header = next(rows)
+        columns = [header.index(name) if (name in header) else None for name in CSV_COLUMNS]
+
+        yield PAPER_HEADER
+        for row in rows:
+            line = [row[col] if (col != None and col < len(row)) else "" for col in columns]
+            line[4] = csv_authors(line[4])
+            yield tuple(line)
+
+    elif suffix == ".bib":
+        yield PAPER_HEADER
+        for entry in read_bibtex(path, offset):
+            if entry == None:
+                instrument.count("rows_rejected_malformed")
+                continue
+            entry.setdefault(BIB_FIELDS[5], entry.get(BIB_DOCUMENT, ""))
+            yield tuple(entry.get(field, "") for field in BIB_FIELDS)
+
+    else:
+        raise ValueError("Unsupported papers file format: " + str(path))
@@ -0,0 +1,140 @@
+import csv
+import json
+import numpy as np
+import xlsxwriter
+from itertools import zip_longest
+from pathlib import Path
+
+'''
+Report writer shared by the analysis stages.
+
+Reports are written sheet by sheet from table definitions:
+    name    = table name, unique within the report
+    columns = list of [header, width, format properties] of the table columns
+    rows    = iterable of row value lists, rows are consumed once and never kept
+    title   = optional header merged above the column headers
+    summary = optional list of ([header, width, format properties], value) columns written
+              to the right of the table, with values in the first table row
+    col     = first column of the table, tables of a sheet are placed side by side
+
+Backends:
+    xlsx  = constant memory workbook, rows are flushed to disk as they are written and
+            format objects are created once for every distinct set of properties
+    csv   = directory with a CSV file for every table and its summary
+    jsonl = JSON lines file with an object for every table row, keyed by table and column headers
+'''
+
+BACKENDS = ["xlsx", "csv", "jsonl"]
+
+def output_path(path, backend):
+    # report location for the workbook path
+    path = Path(path)
+    if backend == "csv":
+        return path.with_suffix("")
+    return path.with_suffix("." + backend)
+
+def open_report(path, backend = "xlsx"):
+    path = output_path(path, backend)
+    report = dict(backend = backend, path = path)
+
+    if backend == "xlsx":
+        report['workbook'] = xlsxwriter.Workbook(path, {'constant_memory' : True})
+        report['formats'] = dict()
+    elif backend == "csv":
+        path.mkdir(parents = True, exist_ok = True)
+    else:
+        report['file'] = open(path, "w", encoding = "utf-8")
+
+    return report
+
+def table(name, columns, rows, title = None, summary = None, col = 0):
+    return dict(name = name, columns = columns, rows = rows, title = title, summary = summary or [], col = col)
+
+def cell_format(report, properties):
+    # format objects are shared by all columns with the same properties
+    if properties == None:
+        return None
+
+    key = tuple(sorted(properties.items()))
+    if key not in report['formats']:
+        report['formats'][key] = report['workbook'].add_format(properties)
+    return report['formats'][key]
+
+def table_columns(table):
+    return table['columns'] + [column for (column, value) in table['summary']]
+
+def sheet_rows(table):
+    # title, headers and table rows, summary values are appended to the first row
+    columns = table_columns(table)
+    if table['title'] != None:
+        yield ("title", table['title'])
+    yield ("row", [column[0] for column in columns])
+
+    summary = [value for (column, value) in table['summary']]
+    first = True
+    for row in table['rows']:
+        yield ("row", (list(row) + summary) if first else row)
+        first = False
+
+    if first and summary:
+        yield ("row", [""] * len(table['columns']) + summary)
+
+def write_xlsx(report, name, tables):
+    sheet = report['workbook'].add_worksheet(name)
+    for table in tables:
+        for (i, (header, width, properties)) in enumerate(table_columns(table)):
+            sheet.set_column(table['col'] + i, table['col'] + i, width, cell_format(report, properties))
+
+    # rows of all tables are written together, in row order
+    streams = [sheet_rows(table) for table in tables]
+    for (row, cells) in enumerate(zip_longest(*streams)):
+        for (table, cell) in zip(tables, cells):
+            if cell == None:
+                continue
+
+            (kind, values) = cell
+            if kind == "title":
+                last = table['col'] + len(table_columns(table)) - 1
+                sheet.merge_range(row, table['col'], row, last, values, cell_format(report, {'align' : "center"}))
+            else:
+                sheet.write_row(row, table['col'], values)
+
+def summary_table(table):
+    return dict(name = table['name'] + " - sažetak", columns = [column for (column, value) in table['summary']],
+                rows = [[value for (column, value) in table['summary']]])
+
+def write_csv(report, name, tables):
+    for table in tables:
+        for part in ([table, summary_table(table)] if table['summary'] else [table]):
+            with open(report['path']/(part['name'] + ".csv"), "w", encoding = "utf-8", newline = "") as file:
+                writer = csv.writer(file)
+                writer.writerow([column[0] for column in part['columns']])
+                writer.writerows(part['rows'])
+
+def plain(value):
+    # NumPy scalars as Python values
+    return value.item() if isinstance(value, np.generic) else value
+
+def write_jsonl(report, name, tables):
+    file = report['file']
+    for table in tables:
+        for part in ([table, summary_table(table)] if table['summary'] else [table]):
+            headers = [column[0] for column in part['columns']]
+            for row in part['rows']:
+                line = dict(sheet = name, table = part['name'])
+                line.update(zip(headers, map(plain, row)))
+                file.write(json.dumps(line, ensure_ascii = False) + "\n")
+
+WRITERS = {"xlsx" : write_xlsx, "csv" : write_csv, "jsonl" : write_jsonl}
+
+def write_sheet(report, name, tables):
+    WRITERS[report['backend']](report, name, tables)
+
+def close_report(report):
+    # returns the written report location
+    if report['backend'] == "xlsx":
+        report['workbook'].close()
+    elif report['backend'] == "jsonl":
+        report['file'].close()
+
+    return report['path']